@@ -22,7 +22,7 @@ from ambuda import checks, filters, queries
 from ambuda.consts import LOCALES
 from ambuda.mail import mailer
 from ambuda.utils import assets
-from ambuda.utils.json_serde import AmbudaJSONEncoder
+from ambuda.utils.json_serde import AmbudaJSONProvider
 from ambuda.utils.url_converters import ListConverter
 from ambuda.views.about import bp as about
 from ambuda.views.api import bp as api
@@ -96,6 +96,9 @@ def create_app(config_env: str):
         _initialize_sentry(config_spec.SENTRY_DSN)
 
     app = Flask(__name__)
+    # Set this before anything creates `app.jinja_env`, which uses it for the
+    # `tojson` filter.
+    app.json = AmbudaJSONProvider(app)
 
     # Config
     app.config.from_object(config_spec)
@@ -168,6 +171,4 @@ def create_app(config_env: str):
             "ambuda_locales": LOCALES,
         }
     )
-
-    app.json_encoder = AmbudaJSONEncoder
     return app
@@ -7,6 +7,7 @@ from flask_login import current_user
 
 import ambuda.database as db
 import ambuda.queries as q
+from ambuda.utils import content_versions
 
 
 class AmbudaIndexView(AdminIndexView):
@@ -50,12 +51,21 @@ class UserView(BaseView):
 class TextBlockView(BaseView):
     column_list = form_columns = ["text", "slug", "xml"]
 
+    def on_model_change(self, form, model, is_created):
+        content_versions.bump(self.session, db.Text, model.text.id)
+
+    def on_model_delete(self, model):
+        content_versions.bump(self.session, db.Text, model.text.id)
+
 
 class TextView(BaseView):
     column_list = form_columns = ["slug", "title"]
 
     form_widget_args = {"header": {"readonly": True}}
 
+    def on_model_change(self, form, model, is_created):
+        model.version = content_versions.next_version(self.session, db.Text)
+
 
 class ProjectView(BaseView):
     column_list = ["slug", "display_title", "creator"]
@@ -65,6 +75,9 @@ class ProjectView(BaseView):
 class DictionaryView(BaseView):
     column_list = form_columns = ["slug", "title"]
 
+    def on_model_change(self, form, model, is_created):
+        model.version = content_versions.next_version(self.session, db.Dictionary)
+
 
 class GenreView(ModeratorBaseView):
     pass
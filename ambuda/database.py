@@ -6,9 +6,11 @@ from ambuda.enums import SiteRole  # NOQA F401
 from ambuda.models.auth import *  # NOQA F401,F403
 from ambuda.models.base import Base  # NOQA F401,F403
 from ambuda.models.blog import *  # NOQA F401,F403
+from ambuda.models.compression import *  # NOQA F401,F403
 from ambuda.models.dictionaries import *  # NOQA F401,F403
 from ambuda.models.parse import *  # NOQA F401,F403
 from ambuda.models.proofing import *  # NOQA F401,F403
+from ambuda.models.search import *  # NOQA F401,F403
 from ambuda.models.site import *  # NOQA F401,F403
 from ambuda.models.talk import *  # NOQA F401,F403
 from ambuda.models.texts import *  # NOQA F401,F403
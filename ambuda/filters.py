@@ -3,9 +3,10 @@
 from datetime import datetime
 
 from dateutil.relativedelta import relativedelta
-from vidyut.lipi import transliterate, Scheme
 from markdown_it import MarkdownIt
 
+from ambuda.utils import lipi
+
 #: A markdown parser for user-generated text.
 #:
 #: - `js-default` is like Commonmark but it disables raw HTML.
@@ -22,17 +23,17 @@ MARKDOWN = MarkdownIt("js-default", {"typographer": True, "linkify": True}).enab
 
 def slp_to_devanagari(s: str) -> str:
     """SLP1 to Devanagari."""
-    return transliterate(s, Scheme.Slp1, Scheme.Devanagari)
+    return lipi.slp1_to_devanagari(s)
 
 
 def devanagari(s: str) -> str:
     """HK to Devanagari."""
-    return transliterate(s, Scheme.HarvardKyoto, Scheme.Devanagari)
+    return lipi.hk_to_devanagari(s)
 
 
 def roman(s: str) -> str:
     """HK to Roman."""
-    return transliterate(s, Scheme.HarvardKyoto, Scheme.Iast)
+    return lipi.hk_to_iast(s)
 
 
 def time_ago(dt: datetime, now=None) -> str:
@@ -0,0 +1,23 @@
+"""Models for compressed storage."""
+
+from sqlalchemy import Column, LargeBinary, String
+
+from ambuda.models.base import Base, pk
+
+
+class CompressionDictionary(Base):
+    """A preset dictionary for compressing one of our text columns.
+
+    Compressed values refer to their dictionary by ID, so we never modify or
+    delete a dictionary. For details, see `ambuda.utils.compression`.
+    """
+
+    __tablename__ = "compression_dictionaries"
+
+    #: Primary key.
+    id = pk()
+    #: The column this dictionary compresses, as a key of
+    #: `ambuda.utils.compression.CORPORA`.
+    corpus = Column(String, nullable=False)
+    #: The dictionary itself.
+    data = Column(LargeBinary, nullable=False)
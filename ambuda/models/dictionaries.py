@@ -1,7 +1,20 @@
-from sqlalchemy import Column, String
+from sqlalchemy import DDL, Column, Integer, String, event
 from sqlalchemy.orm import relationship
 
 from ambuda.models.base import Base, foreign_key, pk
+from ambuda.utils.compression import CompressedText
+
+#: Maps a dictionary entry ID (the rowid) to the plain English text of the
+#: entry's definitions. The porter tokenizer matches English words by stem, so
+#: "horses" finds "horse". We index `dictionary_id` too, so that we can filter
+#: by dictionary within the full-text query. For details, see
+#: `ambuda.utils.reverse_search`.
+CREATE_GLOSS_TABLE = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dictionary_gloss_search USING fts5("
+    "gloss, key UNINDEXED, dictionary_id, "
+    "tokenize = 'porter unicode61 remove_diacritics 2')"
+)
+DROP_GLOSS_TABLE = DDL("DROP TABLE IF EXISTS dictionary_gloss_search")
 
 
 class Dictionary(Base):
@@ -16,6 +29,10 @@ class Dictionary(Base):
     slug = Column(String, unique=True, nullable=False)
     #: Human-readable dictionary title.
     title = Column(String, nullable=False)
+    #: The version of this dictionary's content. Caches (ETags, etc.) key on
+    #: this value, so it must increase whenever the dictionary's content
+    #: changes.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     entries = relationship("DictionaryEntry", backref="dictionary", cascade="delete")
 
@@ -35,5 +52,38 @@ class DictionaryEntry(Base):
     #: A standardized lookup key for this entry.
     #: For the standardization logic, see `dict_utils.standardize_key`.
     key = Column(String, index=True, nullable=False)
-    #: XML payload. We convert this to HTML at serving time.
-    value = Column(String, nullable=False)
+    #: XML payload. We convert this to HTML at serving time. For how we store
+    #: it, see `ambuda.utils.compression`.
+    value = Column(CompressedText("dictionary_entries"), nullable=False)
+    #: (internal-only) Pre-rendered HTML for `value`. For details, see
+    #: `ambuda.utils.entry_cache`. We compress it like `value`.
+    html = Column(CompressedText("dictionary_entries_html"))
+    #: (internal-only) The version of our transform rules that `html` was
+    #: rendered with. If this doesn't match the current version, `html` is
+    #: stale.
+    html_version = Column(String)
+
+
+class GlossIndexedDictionary(Base):
+    """A dictionary in the reverse search index, and the content version we
+    indexed."""
+
+    __tablename__ = "gloss_indexed_dictionaries"
+
+    #: The dictionary's ID. (Not a foreign key: if a dictionary is deleted, the
+    #: indexer removes it from the index on its next run.)
+    dictionary_id = Column(Integer, primary_key=True, autoincrement=False)
+    #: The `Dictionary.version` that we indexed.
+    version = Column(Integer, nullable=False)
+
+
+event.listen(
+    GlossIndexedDictionary.__table__,
+    "after_create",
+    CREATE_GLOSS_TABLE.execute_if(dialect="sqlite"),
+)
+event.listen(
+    GlossIndexedDictionary.__table__,
+    "after_drop",
+    DROP_GLOSS_TABLE.execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,65 @@
+"""Models for full-text search over our texts.
+
+The search index itself is an SQLite FTS5 table, which SQLAlchemy can't
+declare as a model. So we create it alongside `SearchIndexedText` below. For
+details, see `ambuda.utils.search`.
+"""
+
+from sqlalchemy import DDL, Column, Integer, String, event
+
+from ambuda.models.base import Base, pk
+
+#: Maps a block ID (the rowid) to the block's plain text in SLP1. The trigram
+#: tokenizer lets us match any substring of 3+ characters, which suits
+#: Sanskrit's long compounds and sandhi. SLP1 is case-sensitive, so the index
+#: must be too. We index the block's text too, so that we can filter by text
+#: within the full-text query. (The tokenizer can't match IDs shorter than 3
+#: characters, so we store them as keys like "<12>".)
+CREATE_SEARCH_TABLE = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS text_block_search USING fts5("
+    "slp1, text_id, tokenize = 'trigram case_sensitive 1')"
+)
+DROP_SEARCH_TABLE = DDL("DROP TABLE IF EXISTS text_block_search")
+
+
+class SearchIndexedText(Base):
+    """A text in the search index, and the content version we indexed."""
+
+    __tablename__ = "search_indexed_texts"
+
+    #: The text's ID. (Not a foreign key: if a text is deleted, the indexer
+    #: removes it from the index on its next run.)
+    text_id = Column(Integer, primary_key=True, autoincrement=False)
+    #: The `Text.version` that we indexed.
+    version = Column(Integer, nullable=False)
+
+
+class TextBlockKey(Base):
+    """The key for one line of a block. For details, see
+    `ambuda.utils.block_keys`.
+
+    A block has one row per line, in order. Two lines may have the same key.
+    """
+
+    __tablename__ = "text_block_keys"
+
+    #: Primary key.
+    id = pk()
+    #: The text that contains the block. (Not a foreign key, as above.)
+    text_id = Column(Integer, index=True, nullable=False)
+    #: The block that contains the line. (Not a foreign key, as above.)
+    block_id = Column(Integer, nullable=False)
+    #: The line's key.
+    key = Column(String, index=True, nullable=False)
+
+
+event.listen(
+    SearchIndexedText.__table__,
+    "after_create",
+    CREATE_SEARCH_TABLE.execute_if(dialect="sqlite"),
+)
+event.listen(
+    SearchIndexedText.__table__,
+    "after_drop",
+    DROP_SEARCH_TABLE.execute_if(dialect="sqlite"),
+)
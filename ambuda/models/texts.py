@@ -7,11 +7,12 @@ We define texts with three different tables:
 - `TextBlock` is typically a verse or paragraph within a `TextSection`.
 """
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from sqlalchemy import Text as _Text
 from sqlalchemy.orm import relationship
 
 from ambuda.models.base import Base, foreign_key, pk
+from ambuda.utils.compression import CompressedText
 
 
 class Text(Base):
@@ -27,6 +28,9 @@ class Text(Base):
     title = Column(String, nullable=False)
     #: Metadata for this text, as a <teiHeader> element.
     header = Column(_Text)
+    #: The version of this text's content. Caches (ETags, etc.) key on this
+    #: value, so it must increase whenever the text's content changes.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     #: An ordered list of the sections contained within this text.
     sections = relationship("TextSection", backref="text", cascade="delete")
 
@@ -72,6 +76,10 @@ class TextBlock(Base):
     """
 
     __tablename__ = "text_blocks"
+    __table_args__ = (
+        # For fetching a section's blocks in order, one page at a time.
+        Index("ix_text_blocks_section_id_n", "section_id", "n"),
+    )
 
     #: Primary key.
     id = pk()
@@ -81,9 +89,16 @@ class TextBlock(Base):
     section_id = foreign_key("text_sections.id")
     #: Human-readable ID, which we display in the URL.
     slug = Column(String, index=True, nullable=False)
-    #: Raw XML content, which we translate into HTML at serving time.
-    xml = Column(_Text, nullable=False)
+    #: Raw XML content, which we translate into HTML at serving time. For how
+    #: we store it, see `ambuda.utils.compression`.
+    xml = Column(CompressedText("text_blocks"), nullable=False)
     #: (internal-only) Block A comes before block B iff A.n < B.n.
     n = Column(Integer, nullable=False)
+    #: (internal-only) Cached HTML for `xml`. For details, see
+    #: `ambuda.utils.block_cache`. We compress it like `xml`.
+    html = Column(CompressedText("text_blocks_html"))
+    #: (internal-only) The cache key that `html` was rendered with. If this
+    #: doesn't match the block's current cache key, `html` is stale.
+    html_key = Column(String)
 
     text = relationship("Text")
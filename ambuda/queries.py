@@ -5,12 +5,20 @@ For simple or adhoc queries, you can just write them in their corresponding view
 """
 
 import functools
+from collections.abc import Iterator
 
 from flask import current_app
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import load_only, scoped_session, selectinload, sessionmaker
+from sqlalchemy import Row, create_engine, select
+from sqlalchemy.orm import (
+    defer,
+    load_only,
+    scoped_session,
+    selectinload,
+    sessionmaker,
+)
 
 import ambuda.database as db
+from ambuda.utils import compression, dict_index, dict_registry
 
 # NOTE: this logic is copied from Flask-SQLAlchemy. We avoid Flask-SQLAlchemy
 # because we also need to access the database from a non-Flask context when
@@ -28,7 +36,9 @@ except ImportError:
 @functools.cache
 def get_engine():
     database_uri = current_app.config["SQLALCHEMY_DATABASE_URI"]
-    return create_engine(database_uri)
+    engine = create_engine(database_uri)
+    compression.attach(engine)
+    return engine
 
 
 # functools.cache makes this return value a singleton.
@@ -80,6 +90,16 @@ def text(slug: str) -> db.Text | None:
     return session.scalars(stmt).first()
 
 
+def text_without_sections(slug: str) -> db.Text | None:
+    """Return a text without loading its sections.
+
+    To get a text's sections, use `ambuda.utils.text_index` instead.
+    """
+    session = get_session()
+    stmt = select(db.Text).filter_by(slug=slug)
+    return session.scalars(stmt).first()
+
+
 def text_meta(slug: str) -> db.Text:
     """Return only specific fields from the given text."""
     # TODO: is this method even useful? Is there a performance penalty for
@@ -104,6 +124,56 @@ def text_section(text_id: int, slug: str) -> db.TextSection | None:
     return session.scalars(stmt).first()
 
 
+def section_blocks(
+    section_id: int, after: int | None = None, limit: int | None = None
+) -> Iterator[Row]:
+    """Yield the blocks in the given section, in order.
+
+    Unlike `TextSection.blocks`, this function returns lightweight rows with
+    only the columns that the reader needs, and it streams them from the
+    database in batches. Each row has the fields `id`, `slug`, `xml`, `n`,
+    `html`, and `html_key`.
+
+    To fetch a section one page at a time, pass the `n` of the last block you
+    have as `after`. (This is keyset pagination, so every page is as cheap as
+    the first.)
+
+    :param after: if set, yield only blocks with `n > after`.
+    :param limit: if set, yield at most this many blocks.
+    """
+    session = get_session()
+    b = db.TextBlock
+    stmt = (
+        select(b.id, b.slug, b.xml, b.n, b.html, b.html_key)
+        .filter_by(section_id=section_id)
+        .order_by(b.n)
+        .execution_options(yield_per=500)
+    )
+    if after is not None:
+        stmt = stmt.where(b.n > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    yield from session.execute(stmt)
+
+
+def sections_blocks(section_ids: list[int]) -> Iterator[Row]:
+    """Yield the blocks in the given sections, ordered by section ID and then
+    by `n`.
+
+    This is like `section_blocks`, but it fetches many sections with one
+    query. Each row has the fields `section_id`, `slug`, and `xml`.
+    """
+    session = get_session()
+    b = db.TextBlock
+    stmt = (
+        select(b.section_id, b.slug, b.xml)
+        .where(b.section_id.in_(section_ids))
+        .order_by(b.section_id, b.n)
+        .execution_options(yield_per=500)
+    )
+    yield from session.execute(stmt)
+
+
 def block(text_id: int, slug: str) -> db.TextBlock | None:
     session = get_session()
     stmt = select(db.TextBlock).filter_by(text_id=text_id, slug=slug)
@@ -125,23 +195,53 @@ def dict_entries(
     sources: list[str], keys: list[str]
 ) -> dict[str, list[db.DictionaryEntry]]:
     """
+    Entries usually have pre-rendered HTML (see `ambuda.utils.entry_cache`),
+    so we load `DictionaryEntry.value` only if it's accessed.
+
     :param sources: slugs of the dictionaries to query
     :param keys: the keys (dictionary entries) to query
     """
     session = get_session()
-    dicts = dictionaries()
-    source_ids = [d.id for d in dicts if d.slug in sources]
+    registry = dict_registry.get(session)
+    mapping = {s: [] for s in sources}
 
-    stmt = select(db.DictionaryEntry).filter(
-        (db.DictionaryEntry.dictionary_id.in_(source_ids))
-        & (db.DictionaryEntry.key.in_(keys))
-    )
-    rows = list(session.scalars(stmt).all())
+    # Find entry IDs with our key indexes, if we have them. Probe keys in
+    # sorted order so that entries come back in the same order as from the
+    # query below.
+    entry_ids = []
+    unindexed_ids = []
+    for d in registry.by_id.values():
+        if d.slug not in sources:
+            continue
+        index = dict_index.get(d.slug, d.version)
+        if index is None:
+            unindexed_ids.append(d.id)
+        else:
+            for key in sorted(set(keys)):
+                entry_ids.extend(index.ids(key))
+
+    rows = []
+    if entry_ids:
+        stmt = (
+            select(db.DictionaryEntry)
+            .filter(db.DictionaryEntry.id.in_(entry_ids))
+            .options(defer(db.DictionaryEntry.value))
+        )
+        by_id = {row.id: row for row in session.scalars(stmt)}
+        rows.extend(by_id[id] for id in entry_ids if id in by_id)
+    if unindexed_ids:
+        stmt = (
+            select(db.DictionaryEntry)
+            .filter(
+                (db.DictionaryEntry.dictionary_id.in_(unindexed_ids))
+                & (db.DictionaryEntry.key.in_(keys))
+            )
+            .options(defer(db.DictionaryEntry.value))
+        )
+        rows.extend(session.scalars(stmt).all())
 
-    dict_id_to_slug = {d.id: d.slug for d in dicts}
-    mapping = {s: [] for s in sources}
     for row in rows:
-        dict_slug = dict_id_to_slug[row.dictionary_id]
+        dict_slug = registry.by_id[row.dictionary_id].slug
         mapping[dict_slug].append(row)
     return mapping
 
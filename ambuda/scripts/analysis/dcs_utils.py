@@ -299,16 +299,6 @@ def parse_sections(text: str) -> list[Section]:
         yield Section(slug=section_slug, phrases=phrases)
 
 
-def make_block_key(raw: str) -> str:
-    # Keep letters, ignoring H due to common typos in the source text.
-    key = re.sub(r"([^a-zA-GI-Z])", "", raw)
-    # Normalize inconsistent anusvara/parasavarna usage
-    key = re.sub("[NYRnm]", "M", key)
-    # Normalize certain double consonants
-    key = re.sub("tt", "t", key)
-    return key
-
-
 def parse_file(path) -> Iterator[Section]:
     with open(path) as f:
         text = f.read()
@@ -5,6 +5,7 @@ from pathlib import Path
 
 import ambuda.scripts.analysis.dcs_utils as dcs
 from ambuda.scripts.analysis.ramayana import get_kanda_and_sarga, map_and_write
+from ambuda.utils import block_keys
 
 TITLE_MAP = {
     "MBh, 1": "1",
@@ -46,7 +47,7 @@ def iter_parsed_blocks() -> Iterator[tuple[str, str, str]]:
         kanda, sarga = get_kanda_and_sarga(TITLE_MAP, section)
         for block in section.phrases:
             key = dcs.iast_to_slp1(block.raw)
-            key = dcs.make_block_key(key)
+            key = block_keys.make_block_key(key)
             full_slug = f"{kanda}.{sarga}.{block.slug}"
             buf = []
             for token in block.tokens:
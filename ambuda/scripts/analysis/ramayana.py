@@ -1,16 +1,15 @@
 """Add the Ramayana parse data from DCS."""
 
-import xml.etree.ElementTree as ET
 from collections.abc import Iterator
 from pathlib import Path
 
-from indic_transliteration import sanscript
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 import ambuda.database as db
 import ambuda.scripts.analysis.dcs_utils as dcs
 from ambuda.seed.utils.data_utils import create_db
+from ambuda.utils import block_keys, search
 
 TITLE_MAP = {
     "Rām, Bā": "1",
@@ -47,7 +46,7 @@ def iter_parsed_blocks() -> Iterator[tuple[str, str, str]]:
         kanda, sarga = get_kanda_and_sarga(TITLE_MAP, section)
         for block in section.phrases:
             key = dcs.iast_to_slp1(block.raw)
-            key = dcs.make_block_key(key)
+            key = block_keys.make_block_key(key)
             full_slug = f"{kanda}.{sarga}.{block.slug}"
             buf = []
             for token in block.tokens:
@@ -59,19 +58,18 @@ def map_keys_to_slugs(text_slug):
     key_to_slug = {}
 
     engine = create_db()
+    # Line keys are stored with the search index, so make sure it's current.
+    search.update_index(engine, text_slugs=[text_slug])
     with Session(engine) as session:
-        stmt = select(db.Text).filter_by(slug=text_slug)
-        text = session.scalars(stmt).first()
-        stmt = select(db.TextBlock).filter_by(text_id=text.id)
-        blocks = list(session.scalars(stmt).all())
-        for b in blocks:
-            for line in ET.fromstring(b.xml).iter("l"):
-                raw_text = "".join(line.itertext())
-                raw_text = sanscript.transliterate(
-                    raw_text, sanscript.DEVANAGARI, sanscript.SLP1
-                )
-                block_key = dcs.make_block_key(raw_text)
-                key_to_slug.setdefault(block_key, []).append(b.slug)
+        stmt = (
+            select(db.TextBlockKey.key, db.TextBlock.slug)
+            .join(db.TextBlock, db.TextBlock.id == db.TextBlockKey.block_id)
+            .join(db.Text, db.Text.id == db.TextBlockKey.text_id)
+            .where(db.Text.slug == text_slug)
+            .order_by(db.TextBlock.id, db.TextBlockKey.id)
+        )
+        for block_key, block_slug in session.execute(stmt):
+            key_to_slug.setdefault(block_key, []).append(block_slug)
 
     assert key_to_slug
     return key_to_slug
@@ -0,0 +1,87 @@
+"""Compare database size and lookup latency with and without compression.
+
+We copy the database twice: once with every row stored as plain text, and once
+with every row compressed by `ambuda.utils.compression`. Then we time the reads
+that our reader and dictionary pages make.
+
+Usage::
+
+    python -m ambuda.scripts.benchmarks.compression [NUM_LOOKUPS]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.engine import make_url
+
+import ambuda.database as db
+from ambuda.utils import compression
+
+
+def _prepare(src: Path, dest: Path, compress: bool):
+    shutil.copyfile(src, dest)
+    engine = create_engine(f"sqlite:///{dest}")
+    compression.attach(engine)
+    with engine.begin() as conn:
+        for corpus in compression.CORPORA:
+            if compress:
+                compression.train_corpus(conn, corpus)
+            compression.rewrite_corpus(conn, corpus, compress_rows=compress)
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    return engine
+
+
+def _measure(engine, keys: list[str], section_ids: list[int]) -> tuple[float, float]:
+    """Return mean seconds per dictionary lookup and per section fetch."""
+    entries = select(db.DictionaryEntry.value)
+    blocks = select(db.TextBlock.xml).order_by(db.TextBlock.n)
+
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for key in keys:
+            conn.execute(entries.where(db.DictionaryEntry.key == key)).all()
+        entry_secs = (time.perf_counter() - start) / max(len(keys), 1)
+
+        start = time.perf_counter()
+        for id in section_ids:
+            conn.execute(blocks.where(db.TextBlock.section_id == id)).all()
+        section_secs = (time.perf_counter() - start) / max(len(section_ids), 1)
+    return entry_secs, section_secs
+
+
+def run(num_lookups: int):
+    url = make_url(os.environ["SQLALCHEMY_DATABASE_URI"])
+    src = Path(url.database)
+
+    with create_engine(url).connect() as conn:
+        keys = list(conn.execute(select(db.DictionaryEntry.key).distinct()).scalars())
+        section_ids = list(conn.execute(select(db.TextSection.id)).scalars())
+    rng = random.Random(0)
+    keys = rng.choices(keys, k=num_lookups) if keys else []
+    section_ids = rng.choices(section_ids, k=num_lookups) if section_ids else []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, compress in [("plain", False), ("compressed", True)]:
+            path = Path(tmp) / f"{name}.db"
+            engine = _prepare(src, path, compress)
+            # Warm the OS page cache so that both runs are comparable.
+            _measure(engine, keys, section_ids)
+            entry_secs, section_secs = _measure(engine, keys, section_ids)
+            size = path.stat().st_size
+            print(
+                f"{name:>10}: {size / 2**20:.1f} MiB, "
+                f"{entry_secs * 1e3:.3f} ms per entry lookup, "
+                f"{section_secs * 1e3:.3f} ms per section"
+            )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,63 @@
+"""Time how long we take to serialize a reader section to JSON.
+
+We compare our original approach (`json.dumps` with an encoder that calls
+`dataclasses.asdict`) against `json_serde.dumps` on a synthetic section.
+
+Usage::
+
+    python -m ambuda.scripts.benchmarks.json_serde [NUM_BLOCKS]
+"""
+
+import dataclasses
+import json
+import sys
+import time
+
+from ambuda.scripts.benchmarks.section_render import make_section
+from ambuda.utils import json_serde, xml
+from ambuda.views.reader.schema import Block, Section
+
+
+class _AsdictEncoder(json.JSONEncoder):
+    def default(self, o):
+        if dataclasses.is_dataclass(o):
+            return dataclasses.asdict(o)
+        return super().default(o)
+
+
+def _asdict(data):
+    return json.dumps(data, cls=_AsdictEncoder)
+
+
+def _best_time(fn, data, repeat: int = 20) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(num_blocks: int):
+    blobs = make_section(num_blocks)
+    blocks = [
+        Block(slug=f"1.1.{n}", mula=html)
+        for n, html in enumerate(xml.transform_text_blocks(blobs), 1)
+    ]
+    data = Section(
+        text_title="रामायणम्",
+        section_title="बालकाण्डः",
+        blocks=blocks,
+        prev_url="/texts/ramayanam/1.0",
+        next_url="/texts/ramayanam/1.2",
+    )
+    assert json.loads(_asdict(data)) == json.loads(json_serde.dumps(data))
+
+    backend = "orjson" if json_serde.orjson else "json"
+    for name, fn in [("asdict", _asdict), (f"dumps ({backend})", json_serde.dumps)]:
+        secs = _best_time(fn, data)
+        print(f"{name:>15}: {secs * 1e3:.3f} ms for {num_blocks} blocks")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
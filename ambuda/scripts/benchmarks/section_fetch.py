@@ -0,0 +1,87 @@
+"""Compare memory and time for two ways of fetching a section's blocks.
+
+- `orm`: load the `TextSection`, then lazy-load `TextSection.blocks` (our
+  original approach)
+- `lean`: `queries.section_blocks`, which streams plain rows
+
+Usage::
+
+    python -m ambuda.scripts.benchmarks.section_fetch [TEXT_SLUG] [SECTION_SLUG]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import ambuda
+import ambuda.queries as q
+
+NUM_RUNS = 20
+
+
+def _orm(text_id: int, section_slug: str):
+    section = q.text_section(text_id, section_slug)
+    return [(b.slug, b.xml, b.n) for b in section.blocks]
+
+
+def _lean(text_id: int, section_slug: str):
+    # The reader gets the section ID from `text_index`, so don't count that
+    # lookup here.
+    section_id = _section_ids[section_slug]
+    return [(r.slug, r.xml, r.n) for r in q.section_blocks(section_id)]
+
+
+_section_ids = {}
+
+
+def _measure(fn, *args) -> tuple[float, int, int]:
+    """Return mean time, mean allocated blocks, and peak bytes per call."""
+    elapsed = 0.0
+    num_blocks = 0
+    peak = 0
+    for _ in range(NUM_RUNS):
+        # Start each run with an empty identity map, as in a new request.
+        q.get_session_class().remove()
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        fn(*args)
+        elapsed += time.perf_counter() - start
+        after = tracemalloc.take_snapshot()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        stats = after.compare_to(before, "filename")
+        num_blocks += sum(s.count_diff for s in stats if s.count_diff > 0)
+    return elapsed / NUM_RUNS, num_blocks // NUM_RUNS, peak
+
+
+def run(text_slug: str, section_slug: str):
+    app = ambuda.create_app(os.environ["FLASK_ENV"])
+    with app.app_context():
+        text = q.text_without_sections(text_slug)
+        if text is None:
+            print(f"Unknown text: {text_slug}")
+            return
+        section = q.text_section(text.id, section_slug)
+        if section is None:
+            print(f"Unknown section: {section_slug}")
+            return
+        _section_ids[section_slug] = section.id
+        assert _orm(text.id, section_slug) == _lean(text.id, section_slug)
+
+        num_rows = len(_lean(text.id, section_slug))
+        print(f"{text_slug}/{section_slug}: {num_rows} blocks")
+        for name, fn in [("orm", _orm), ("lean", _lean)]:
+            secs, blocks, peak = _measure(fn, text.id, section_slug)
+            print(
+                f"{name:>5}: {secs * 1e3:.2f} ms, "
+                f"{blocks} live allocations, {peak / 1024:.0f} KiB peak"
+            )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:] or ["ramayanam", "1.1"]
+    run(*args)
@@ -0,0 +1,70 @@
+"""Time how long we take to render all blocks in a reader section.
+
+We compare three approaches on synthetic sections of various sizes:
+
+- `tree`: `xml.transform` on each block (our original approach)
+- `stream`: `xml.stream_transform` on each block
+- `batch`: `xml.transform_text_blocks` on the whole section
+
+Usage::
+
+    python -m ambuda.scripts.benchmarks.section_render
+"""
+
+import time
+from xml.etree import ElementTree as ET
+
+from ambuda.seed.utils.itihasa_utils import Line, Verse, get_verse_xml
+from ambuda.utils import xml
+
+SECTION_SIZES = [10, 100, 1000]
+
+#: Verse text to repeat across blocks.
+PADAS = [
+    "तपःस्वाध्यायनिरतं तपस्वी वाग्विदां वरम्",
+    "नारदं परिपप्रच्छ वाल्मीकिर्मुनिपुंगवम्",
+]
+
+
+def make_section(num_blocks: int) -> list[str]:
+    blobs = []
+    for n in range(1, num_blocks + 1):
+        lines = [Line(1, 1, n, pada, text) for pada, text in zip("ab", PADAS)]
+        verse = Verse(kanda=1, section=1, n=n, lines=lines)
+        blobs.append(get_verse_xml(verse, f"R.1.1.{n}"))
+    return blobs
+
+
+def _tree(blobs):
+    return [xml.transform(ET.fromstring(b), xml.tei_xml) for b in blobs]
+
+
+def _stream(blobs):
+    return [xml.transform_text_block(b) for b in blobs]
+
+
+def _batch(blobs):
+    return xml.transform_text_blocks(blobs)
+
+
+def _best_time(fn, blobs, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(blobs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run():
+    print(f"{'blocks':>6} {'tree':>10} {'stream':>10} {'batch':>10}")
+    for size in SECTION_SIZES:
+        blobs = make_section(size)
+        assert _tree(blobs) == _stream(blobs) == _batch(blobs)
+
+        cols = [_best_time(fn, blobs) for fn in (_tree, _stream, _batch)]
+        print(f"{size:>6}", *(f"{t * 1e3:>8.2f}ms" for t in cols))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,80 @@
+"""Compare our two XML-to-HTML engines on real data.
+
+This script loads blocks and dictionary entries from the development database,
+checks that `xml.transform` and `xml.stream_transform` produce identical output
+for each of them, then times both engines.
+
+Usage::
+
+    python -m ambuda.scripts.benchmarks.xml_engines [--limit N]
+"""
+
+import argparse
+import time
+from xml.etree import ElementTree as ET
+
+from sqlalchemy import select
+
+import ambuda.database as db
+from ambuda.seed.utils.data_utils import create_db
+from ambuda.utils import xml
+
+#: (label, model, parent column, parent slug, transform rules)
+CORPORA = [
+    ("Ramayana blocks", db.TextBlock, "text", "ramayanam", xml.tei_xml),
+    ("MW entries", db.DictionaryEntry, "dictionary", "mw", xml.mw_xml),
+]
+
+
+def _load_blobs(conn, model, parent: str, slug: str, limit: int) -> list[str]:
+    if parent == "text":
+        parent_id = select(db.Text.id).filter_by(slug=slug).scalar_subquery()
+        stmt = select(model.xml).filter_by(text_id=parent_id)
+    else:
+        parent_id = select(db.Dictionary.id).filter_by(slug=slug).scalar_subquery()
+        stmt = select(model.value).filter_by(dictionary_id=parent_id)
+    return list(conn.execute(stmt.limit(limit)).scalars())
+
+
+def _time(fn, blobs: list[str]) -> float:
+    start = time.perf_counter()
+    for blob in blobs:
+        fn(blob)
+    return time.perf_counter() - start
+
+
+def run(limit: int):
+    engine = create_db()
+    with engine.connect() as conn:
+        for label, model, parent, slug, rules in CORPORA:
+            blobs = _load_blobs(conn, model, parent, slug, limit)
+            if not blobs:
+                print(f"{label}: no data (is `{slug}` in the database?)")
+                continue
+
+            def tree(blob, rules=rules):
+                return xml.transform(ET.fromstring(blob), rules)
+
+            def stream(blob, rules=rules):
+                return xml.stream_transform(blob, rules)
+
+            for blob in blobs:
+                assert tree(blob) == stream(blob), blob
+
+            # Best of three runs for each engine.
+            t_tree = min(_time(tree, blobs) for _ in range(3))
+            t_stream = min(_time(stream, blobs) for _ in range(3))
+            n = len(blobs)
+            print(
+                f"{label} (n={n}): "
+                f"tree {t_tree / n * 1e6:.1f} us, "
+                f"stream {t_stream / n * 1e6:.1f} us, "
+                f"speedup {t_tree / t_stream:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=20_000)
+    args = parser.parse_args()
+    run(args.limit)
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session, load_only
 
 import ambuda.database as db
 from ambuda.seed.utils.data_utils import create_db
+from ambuda.utils import content_versions
 
 REPO = "https://github.com/ambuda-org/dcs.git"
 PROJECT_DIR = Path(__file__).resolve().parents[2]
@@ -93,6 +94,7 @@ def add_parse_data(text_slug: str, path: Path):
             session.add(
                 db.BlockParse(text_id=text.id, block_id=slug_id_map[slug], data=blob)
             )
+        content_versions.bump(session, db.Text, text.id)
         session.commit()
 
 
@@ -3,10 +3,11 @@
 
 import re
 import xml.etree.ElementTree as ET
+from typing import IO
 
 from ambuda.seed.utils import sandhi_utils
 from ambuda.seed.utils.cdsl_utils import create_from_scratch, iter_entries_as_xml
-from ambuda.seed.utils.data_utils import create_db, fetch_bytes, unzip_and_read
+from ambuda.seed.utils.data_utils import create_db, fetch_file, open_zip_member
 from ambuda.utils.dict_utils import standardize_key
 
 ZIP_URL = "https://www.sanskrit-lexicon.uni-koeln.de/scans/AP90Scan/2020/downloads/ap90xml.zip"
@@ -88,7 +89,7 @@ def _explode_entries(xml):
 
     # First, yield the full entry with all compounds.
     # Once our compound parsing has ~100% coverage, we can trim this down.
-    yield base_word, ET.tostring(body, encoding="utf-8")
+    yield base_word, ET.tostring(body, encoding="unicode")
 
     # Find elements after the "Comp." marker.
     comp_elements = None
@@ -109,11 +110,11 @@ def _explode_entries(xml):
 
     for compound, elems in _make_compounds(base_word, groups):
         body[:] = elems
-        yield compound, ET.tostring(body, encoding="utf-8")
+        yield compound, ET.tostring(body, encoding="unicode")
 
 
-def apte_generator(xml_blob: str):
-    for _, xml in iter_entries_as_xml(xml_blob):
+def apte_generator(xml_file: IO[bytes]):
+    for _, xml in iter_entries_as_xml(xml_file):
         _trim_b_whitespace(xml)
         _delete_malformed_pb_annotations(xml)
         _transform_line_breaks(xml)
@@ -130,16 +131,16 @@ def run():
     engine = create_db()
 
     print(f"Fetching {title} data from CDSL ...")
-    zip_bytes = fetch_bytes(ZIP_URL)
-    xml_blob = unzip_and_read(zip_bytes, "xml/ap90.xml")
+    zip_path = fetch_file(ZIP_URL)
 
     print(f"Adding {title} items to database ...")
-    create_from_scratch(
-        engine,
-        slug="apte",
-        title=title,
-        generator=apte_generator(xml_blob),
-    )
+    with open_zip_member(zip_path, "xml/ap90.xml") as xml_file:
+        create_from_scratch(
+            engine,
+            slug="apte",
+            title=title,
+            generator=apte_generator(xml_file),
+        )
 
     print("Done.")
     return True
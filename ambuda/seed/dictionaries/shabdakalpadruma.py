@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 """Add the Shabdakalpadruma to the database."""
 
+from typing import IO
+
 from ambuda.seed.utils.cdsl_utils import create_from_scratch, iter_entries_as_strings
-from ambuda.seed.utils.data_utils import create_db, fetch_bytes, unzip_and_read
+from ambuda.seed.utils.data_utils import create_db, fetch_file, open_zip_member
 from ambuda.utils.dict_utils import standardize_key
 
 ZIP_URL = (
@@ -10,8 +12,8 @@ ZIP_URL = (
 )
 
 
-def s_generator(xml_blob: str):
-    for key, value in iter_entries_as_strings(xml_blob):
+def s_generator(xml_file: IO[bytes]):
+    for key, value in iter_entries_as_strings(xml_file):
         key = standardize_key(key)
         yield key, value
 
@@ -23,16 +25,16 @@ def run():
     engine = create_db()
 
     print(f"Fetching {title} data from CDSL ...")
-    zip_bytes = fetch_bytes(ZIP_URL)
-    xml_blob = unzip_and_read(zip_bytes, "xml/skd.xml")
+    zip_path = fetch_file(ZIP_URL)
 
     print(f"Adding {title} items to database ...")
-    create_from_scratch(
-        engine,
-        slug="shabdakalpadruma",
-        title=title,
-        generator=s_generator(xml_blob),
-    )
+    with open_zip_member(zip_path, "xml/skd.xml") as xml_file:
+        create_from_scratch(
+            engine,
+            slug="shabdakalpadruma",
+            title=title,
+            generator=s_generator(xml_file),
+        )
 
     print("Done.")
     return True
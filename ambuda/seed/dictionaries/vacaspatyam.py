@@ -2,9 +2,10 @@
 """Add the Vacaspatyam to the database."""
 
 import re
+from typing import IO
 
 from ambuda.seed.utils.cdsl_utils import create_from_scratch, iter_entries_as_xml
-from ambuda.seed.utils.data_utils import create_db, fetch_bytes, unzip_and_read
+from ambuda.seed.utils.data_utils import create_db, fetch_file, open_zip_member
 from ambuda.utils.dict_utils import standardize_key
 
 ZIP_URL = (
@@ -52,8 +53,8 @@ def _make_text_blob(xml):
     return f"<body><s>{text}</s></body>"
 
 
-def v_generator(xml_blob: str):
-    for key, xml in iter_entries_as_xml(xml_blob):
+def v_generator(xml_file: IO[bytes]):
+    for key, xml in iter_entries_as_xml(xml_file):
         key = standardize_key(key)
         blob = _make_text_blob(xml)
         yield key, blob
@@ -66,16 +67,16 @@ def run():
     engine = create_db()
 
     print(f"Fetching {title} data from CDSL ...")
-    zip_bytes = fetch_bytes(ZIP_URL)
-    xml_blob = unzip_and_read(zip_bytes, "xml/vcp.xml")
+    zip_path = fetch_file(ZIP_URL)
 
     print(f"Adding {title} items to database ...")
-    create_from_scratch(
-        engine,
-        slug="vacaspatyam",
-        title=title,
-        generator=v_generator(xml_blob),
-    )
+    with open_zip_member(zip_path, "xml/vcp.xml") as xml_file:
+        create_from_scratch(
+            engine,
+            slug="vacaspatyam",
+            title=title,
+            generator=v_generator(xml_file),
+        )
 
     print("Done.")
     return True
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 import ambuda.database as db
 from ambuda.seed.utils.data_utils import create_db
+from ambuda.utils import content_versions
 from ambuda.utils.tei_parser import Document, parse_document
 
 
@@ -64,7 +65,12 @@ def fetch_latest_data():
 
 
 def _create_new_text(session, spec: Spec, document: Document):
-    text = db.Text(slug=spec.slug, title=spec.title, header=document.header)
+    text = db.Text(
+        slug=spec.slug,
+        title=spec.title,
+        header=document.header,
+        version=content_versions.next_version(session, db.Text),
+    )
     session.add(text)
     session.flush()
 
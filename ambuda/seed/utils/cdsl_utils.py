@@ -1,12 +1,18 @@
+import collections
 import io
 import itertools
 import logging
+import multiprocessing
+import os
+import time
+from typing import IO
 from xml.etree import ElementTree as ET
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
 import ambuda.database as db
+from ambuda.utils import content_versions, entry_cache, reverse_search
 
 #: The maximum number of entries to add to the dictionary at one time.
 #:
@@ -15,31 +21,58 @@ import ambuda.database as db
 BATCH_SIZE = 10000
 
 
-def iter_entries_as_xml(blob: str):
-    """Iterate over CDSL-style dictionary XML."""
+def iter_entries_as_xml(source: bytes | IO[bytes]):
+    """Iterate over CDSL-style dictionary XML.
+
+    We parse `source` incrementally and release each element once we're done
+    with it, so memory use stays flat however large the dictionary is.
+
+    :param source: the XML, or a binary file to read it from.
+    """
     tag_str = (
         "H1 H1A H1B H1C H1E H2 H2A H2B H2C H2E H3 H3A H3B H3C H3E H4 H4A H4B H4C H4E"
     )
     allowed_tags = set(tag_str.split())
 
-    for _, elem in ET.iterparse(io.BytesIO(blob), events=["end"]):
-        if elem.tag not in allowed_tags:
-            continue
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
 
-        # NOTE: `key` is not unique.
-        key = None
-        for child in elem.iter():
-            if child.tag == "key1":
-                key = child.text
-                break
-        yield key, elem
+    # The elements that are open at the current point in the parse.
+    stack = []
+    num_open_entries = 0
+    for event, elem in ET.iterparse(source, events=["start", "end"]):
+        if event == "start":
+            stack.append(elem)
+            num_open_entries += elem.tag in allowed_tags
+            continue
 
+        stack.pop()
+        if elem.tag in allowed_tags:
+            num_open_entries -= 1
+
+            # NOTE: `key` is not unique.
+            key = None
+            for child in elem.iter():
+                if child.tag == "key1":
+                    key = child.text
+                    break
+            yield key, elem
+
+        # Elements within an entry belong to that entry, so release them only
+        # with the entry itself.
+        if num_open_entries:
+            continue
+        # Otherwise, `elem` is a finished entry or something between entries.
+        # Detach it from its parent too, since the parent (e.g. the root)
+        # would otherwise keep every finished element alive.
         elem.clear()
+        if stack:
+            stack[-1].remove(elem)
 
 
-def iter_entries_as_strings(blob: str):
-    for key, elem in iter_entries_as_xml(blob):
-        value = ET.tostring(elem, encoding="utf-8")
+def iter_entries_as_strings(source: bytes | IO[bytes]):
+    for key, elem in iter_entries_as_xml(source):
+        value = ET.tostring(elem, encoding="unicode")
 
         assert key and value
         assert len(value) > 50, value
@@ -56,19 +89,19 @@ def create_dict(session, **kw):
 
 def delete_existing_dict(session, slug: str):
     """Delete an existing dictionary and all of its entries."""
-    stmt = select(db.Dictionary).filter_by(slug=slug)
-    dictionary = session.scalars(stmt).first()
-    if dictionary:
-        # Delete entries first to avoid slow relationship-based delete.
-        stmt = select(db.DictionaryEntry).filter_by(dictionary_id=dictionary.id)
-        entries = list(session.scalars(stmt).all())
-        for entry in entries:
-            session.delete(entry)
-        session.delete(dictionary)
+    stmt = select(db.Dictionary.id).filter_by(slug=slug)
+    dictionary_id = session.scalar(stmt)
+    if dictionary_id:
+        # Delete with bulk statements rather than through the ORM, which would
+        # load every entry just to delete it.
+        e = db.DictionaryEntry
+        session.execute(delete(e).where(e.dictionary_id == dictionary_id))
+        session.execute(delete(db.Dictionary).where(db.Dictionary.id == dictionary_id))
         session.commit()
 
 
 def batches(generator, n):
+    generator = iter(generator)
     while True:
         batch = list(itertools.islice(generator, n))
         if batch:
@@ -77,22 +110,91 @@ def batches(generator, n):
             return
 
 
-def create_from_scratch(engine, slug: str, title: str, generator):
+def _render_batch(task: tuple[str, list[dict]]) -> list[dict]:
+    slug, rows = task
+    return entry_cache.render_rows(slug, rows)
+
+
+def _init_forked_worker(engine):
+    # Forked workers inherit the parent's connection pool, including the
+    # connection it's inserting with, which they must not share.
+    # (`close=False` leaves the parent's connections alone.)
+    engine.dispose(close=False)
+
+
+def _iter_rendered(engine, slug: str, rows, processes: int):
+    """Render batches of new entries, in order.
+
+    Rendering an entry means parsing its XML and transforming it to HTML, which
+    costs more than anything else we do per entry. So we render in worker
+    processes while this process reads entries and inserts rendered ones.
+
+    :param rows: batches of dicts, as for `entry_cache.render_rows`.
+    """
+    tasks = ((slug, batch) for batch in rows)
+    if processes == 1:
+        yield from map(_render_batch, tasks)
+        return
+
+    # `Pool.imap` would read every batch into memory up front, so we keep only
+    # a few batches per worker in flight.
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(
+        processes, initializer=_init_forked_worker, initargs=(engine,)
+    ) as pool:
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_render_batch, (task,)))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def _progress(slug: str, num_entries: int, start: float) -> str:
+    elapsed = time.monotonic() - start
+    rate = num_entries / elapsed if elapsed else 0
+    return f"{slug}: added {num_entries} entries in {elapsed:.1f}s ({rate:.0f}/s)"
+
+
+def create_from_scratch(
+    engine, slug: str, title: str, generator, processes: int | None = None
+) -> int:
+    """Replace a dictionary with the entries in `generator`.
+
+    :param generator: yields (key, value) pairs, where `value` is the entry's
+        XML.
+    :param processes: the number of processes that render entries. If not set,
+        use one per CPU. If 1, render in this process.
+    :return: the number of entries that we added.
+    """
+    processes = processes or os.cpu_count() or 1
     with Session(engine) as session:
+        # Pick the version before deleting so that it's newer than the old one.
+        version = content_versions.next_version(session, db.Dictionary)
         delete_existing_dict(session, slug)
 
-        dictionary = create_dict(session, slug=slug, title=title)
+        dictionary = create_dict(session, slug=slug, title=title, version=version)
         dictionary_id = dictionary.id
         assert dictionary_id
 
-    entries = db.DictionaryEntry.__table__
-    ins = entries.insert()
+    rows = (
+        [
+            {"dictionary_id": dictionary_id, "key": key, "value": value}
+            for key, value in batch
+        ]
+        for batch in batches(generator, BATCH_SIZE)
+    )
+    ins = db.DictionaryEntry.__table__.insert()
+    num_entries = 0
+    start = time.monotonic()
     with engine.begin() as conn:
-        for i, batch in enumerate(batches(generator, BATCH_SIZE)):
-            items = []
-            for key, value in batch:
-                items.append(
-                    {"dictionary_id": dictionary.id, "key": key, "value": value}
-                )
-            conn.execute(ins, items)
-            logging.info(BATCH_SIZE * (i + 1))
+        for batch in _iter_rendered(engine, slug, rows, processes):
+            conn.execute(ins, batch)
+            num_entries += len(batch)
+            logging.info(_progress(slug, num_entries, start))
+    print(_progress(slug, num_entries, start))
+
+    if slug in reverse_search.GLOSS_DICTIONARIES:
+        reverse_search.update_index(engine, [slug])
+    return num_entries
@@ -1,7 +1,10 @@
+import contextlib
 import hashlib
-import io
 import os
 import zipfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
 
 import requests
 from sqlalchemy import create_engine
@@ -9,6 +12,7 @@ from sqlalchemy import create_engine
 import config
 from ambuda import database as db
 from ambuda.seed.utils.itihasa_utils import CACHE_DIR
+from ambuda.utils import compression
 
 
 def fetch_text(url: str, read_from_cache: bool = True) -> str:
@@ -64,15 +68,48 @@ def fetch_bytes(url: str, read_from_cache: bool = True) -> bytes:
     return resp.content
 
 
-def unzip_and_read(zip_bytes: bytes, filepath: str) -> str:
-    """Open a ZIP archive and read plain-text data from one of its files.
+def fetch_file(url: str, read_from_cache: bool = True) -> Path:
+    """Fetch a large file against a simple cache and return its path.
 
-    :param zip_bytes: the ZIP file payload
+    Unlike `fetch_bytes`, this streams the response to disk, so the file is
+    never fully in memory.
+
+    :param url: the URL to fetch.
+    :param read_from_cache: if true, check the cache before fetching over the
+        network.
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    code = hashlib.sha256(url.encode()).hexdigest()
+    path = CACHE_DIR / code
+
+    if path.exists() and read_from_cache:
+        return path
+
+    # Write to a temporary file first so that an interrupted download doesn't
+    # leave a truncated file in the cache.
+    tmp = path.with_name(path.name + ".tmp")
+    with requests.get(url, stream=True) as resp:
+        resp.raise_for_status()
+        with open(tmp, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+    os.replace(tmp, path)
+    return path
+
+
+@contextlib.contextmanager
+def open_zip_member(zip_path: Path, filepath: str) -> Iterator[IO[bytes]]:
+    """Open one file in a ZIP archive for streaming reads.
+
+    The file is decompressed as it's read, so it's never fully in memory.
+
+    :param zip_path: the path to the ZIP file
     :param filepath: the filepath within the ZIP file that we should read
     """
-    with zipfile.ZipFile(io.BytesIO(zip_bytes), "r") as ref:
+    with zipfile.ZipFile(zip_path, "r") as ref:
         with ref.open(filepath) as f:
-            return f.read()
+            yield f
 
 
 def create_db():
@@ -80,6 +117,7 @@ def create_db():
     flask_env = os.environ["FLASK_ENV"]
     conf = config.load_config_object(flask_env)
     engine = create_engine(conf.SQLALCHEMY_DATABASE_URI)
+    compression.attach(engine)
 
     db.Base.metadata.create_all(engine)
     return engine
@@ -11,6 +11,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 import ambuda.database as db
+from ambuda.utils import content_versions
 
 load_dotenv()
 PROJECT_DIR = Path(__file__).parent.parent.parent
@@ -107,7 +108,12 @@ def write_kandas(
     xml_id_prefix: str,
 ):
     with Session(engine) as session:
-        text = db.Text(slug=text_slug, title=text_title, header=tei_header)
+        text = db.Text(
+            slug=text_slug,
+            title=text_title,
+            header=tei_header,
+            version=content_versions.next_version(session, db.Text),
+        )
         session.add(text)
         session.flush()
 
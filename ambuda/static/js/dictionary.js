@@ -1,3 +1,5 @@
+/* global Sanscript */
+
 import {
   transliterateElement, transliterateHTMLString, $,
 } from './core.ts';
@@ -26,6 +28,8 @@ export default () => ({
   history: [],
   // If true, show the source selection widget.
   showSourceSelector: false,
+  // Headwords that start with the current query.
+  suggestions: [],
 
   init() {
     // URL settings take priority.
@@ -100,6 +104,25 @@ export default () => ({
     }
   },
 
+  /** Fetch headword suggestions for the current query. */
+  async fetchSuggestions() {
+    const { query } = this;
+    if (!query) {
+      this.suggestions = [];
+      return;
+    }
+
+    const resp = await fetch(Routes.ajaxDictionaryComplete(this.sources, query));
+    // Ignore the response if the user has kept typing.
+    if (!resp.ok || query !== this.query) {
+      return;
+    }
+    const { results } = await resp.json();
+    this.suggestions = results.map(({ text }) => (
+      this.script === 'devanagari' ? text : Sanscript.t(text, 'devanagari', this.script)
+    ));
+  },
+
   // Search with the given query.
   async searchFor(q) {
     this.query = q;
@@ -54,6 +54,31 @@ export function getBlockSlug(blockID) {
   return blockID.split('.').slice(1).join('.');
 }
 
+/**
+ * Render the entries for one word from our batch dictionary API.
+ *
+ * This mirrors the markup of `htmx/dictionary-results.html`.
+ *
+ * @param dictionaries maps each source slug to its title.
+ * @param entries maps each source slug to a list of entry HTML strings.
+ */
+export function renderDictionaryEntries(dictionaries, entries) {
+  const slugs = Object.keys(entries);
+  const sections = slugs.map((slug) => {
+    let header = '';
+    if (slugs.length > 1) {
+      const $title = document.createElement('h1');
+      $title.textContent = dictionaries[slug];
+      header = `<header class="my-0.5 rounded p-1 text-sky-600 bg-sky-100 text-xs font-bold uppercase">${$title.outerHTML}</header>`;
+    }
+    const body = entries[slug].length
+      ? `<ul>${entries[slug].join('')}</ul>`
+      : '<p>No results found.</p>';
+    return `<div>${header}<div class="my-4">${body}</div></div>`;
+  });
+  return `<div class="mt-8">${sections.join('')}</div>`;
+}
+
 /* Alpine code
  * ===========
  */
@@ -99,10 +124,15 @@ export default () => ({
     blocks: [],
     prev_url: null,
     next_url: null,
+    // Long sections arrive in pages. If set, the URL for the next page.
+    next_page_url: null,
   },
 
   // The current dictionary response.
   dictionaryResponse: null,
+  // Dictionary responses for the lemmas of parsed blocks, keyed by the
+  // Devanagari lemma. We fetch these in one batch when we load a parse.
+  dictionaryCache: {},
   // Analysis of a word clicked by the user.
   wordAnalysis: {
     // The inflected form
@@ -128,6 +158,7 @@ export default () => ({
   init() {
     this.loadSettings();
     this.data = JSON.parse(document.getElementById('payload').textContent);
+    this.fetchRemainingBlocks();
   },
 
   // Settings
@@ -196,6 +227,27 @@ export default () => ({
     }
   },
 
+  /**
+   * Fetch the rest of a long section one page at a time.
+   *
+   * The server inlines only the first page of blocks, so we append each
+   * remaining page as it arrives.
+   */
+  async fetchRemainingBlocks() {
+    while (this.data.next_page_url) {
+      // eslint-disable-next-line no-await-in-loop
+      const resp = await fetch(this.data.next_page_url);
+      if (!resp.ok) {
+        // Loading failed -- readers can still use the server-side content.
+        return;
+      }
+      // eslint-disable-next-line no-await-in-loop
+      const page = await resp.json();
+      this.data.blocks.push(...page.blocks);
+      this.data.next_page_url = page.next_page_url;
+    }
+  },
+
   /** Query the dictionary and populate the sidebar. */
   async searchDictionary() {
     if (!this.dictQuery || this.dictSources.length === 0) {
@@ -211,6 +263,41 @@ export default () => ({
     }
   },
 
+  /**
+   * Fetch dictionary entries for every lemma in the given parse HTML.
+   *
+   * We look up all of the lemmas with one request, so clicking a word in
+   * the parse shows its entries without another round trip.
+   */
+  async prefetchDictionary(parseHTML) {
+    if (this.dictSources.length === 0) {
+      return;
+    }
+    const $parse = document.createElement('div');
+    $parse.innerHTML = parseHTML;
+    const lemmas = new Set();
+    $parse.querySelectorAll('[lemma]').forEach(($word) => {
+      lemmas.add(Sanscript.t($word.getAttribute('lemma'), Script.SLP1, Script.Devanagari));
+    });
+    const words = [...lemmas].filter((w) => !(w in this.dictionaryCache));
+    if (words.length === 0) {
+      return;
+    }
+
+    const resp = await fetch(Routes.ajaxDictionaryBatch(this.dictSources, words));
+    if (!resp.ok) {
+      return;
+    }
+    const { dictionaries, results } = await resp.json();
+    Object.entries(results).forEach(([word, entries]) => {
+      // Let `searchDictionary` handle misses, since it can suggest
+      // similar headwords.
+      if (Object.values(entries).some((xs) => xs.length)) {
+        this.dictionaryCache[word] = renderDictionaryEntries(dictionaries, entries);
+      }
+    });
+  },
+
   async fetchBlockParse(blockSlug) {
     const textSlug = Routes.getTextSlug();
     const url = Routes.parseData(textSlug, blockSlug);
@@ -323,6 +410,7 @@ export default () => ({
     if (ok) {
       block.parse = html;
       block.showParse = true;
+      this.prefetchDictionary(html);
 
       // FIXME: move to alpine
       const $container = $('#parse--response');
@@ -342,7 +430,11 @@ export default () => ({
     const parse = $word.getAttribute('parse');
 
     this.dictQuery = Sanscript.t(lemma, Script.SLP1, this.script);
-    await this.searchDictionary();
+    if (lemma in this.dictionaryCache) {
+      this.dictionaryResponse = this.dictionaryCache[lemma];
+    } else {
+      await this.searchDictionary();
+    }
 
     this.wordAnalysis = { form, lemma, parse };
     this.showSidebar = true;
@@ -363,6 +455,8 @@ export default () => ({
     // selector is not visible, this method is best left as a no-op.
     if (this.showDictSourceSelector) {
       this.saveSettings();
+      // Cached responses are for the old sources.
+      this.dictionaryCache = {};
       this.searchDictionary();
       this.showDictSourceSelector = false;
     }
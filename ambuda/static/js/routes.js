@@ -7,6 +7,17 @@ export default {
     return `/api/dictionaries/${sourcesStr}/${query}`;
   },
 
+  ajaxDictionaryComplete: (sources, query) => {
+    const sourcesStr = sources.join(',');
+    return `/api/dictionaries/${sourcesStr}/complete?q=${encodeURIComponent(query)}`;
+  },
+
+  ajaxDictionaryBatch: (sources, words) => {
+    const sourcesStr = sources.join(',');
+    const params = new URLSearchParams(words.map((w) => ['q', w]));
+    return `/api/dictionaries/${sourcesStr}/batch?${params}`;
+  },
+
   ajaxBharatiQuery: (query) => `/api/bharati/query/${query}`,
 
   dictionaryQuery: (sources, query) => {
@@ -0,0 +1,247 @@
+"""Pre-render ("bake") reader pages to static files.
+
+For anonymous readers, every reader page is a pure function of the database. So
+we can render every section ahead of time and let nginx serve the result
+directly, which is much cheaper than running Flask on each request.
+
+For each section, we write two files::
+
+    <out_dir>/texts/<text-slug>/<section-slug>.html      (`texts.section`)
+    <out_dir>/api/texts/<text-slug>/<section-slug>.json  (`texts.reader_json`)
+
+These paths mirror our URLs, so nginx can serve them with e.g.
+`try_files $uri.html @flask` and `try_files $uri.json @flask`.
+
+Baking is incremental. We record what we baked in `<out_dir>/manifest.json`,
+and on the next run we re-render a text only if its content version changed
+(see `ambuda.utils.content_versions`). If our templates, assets, or XML rules
+change, we re-render everything.
+
+We render pages with Flask's test client as an anonymous user, so baked pages
+are byte-identical to the pages we serve dynamically.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import select
+
+import ambuda
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import etags, xml
+
+#: The number of sections that a worker renders per task. Large texts (e.g. the
+#: Mahabharata) have thousands of sections, so we split them across workers.
+CHUNK_SIZE = 50
+
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class BakeResult:
+    #: The number of texts that we rendered.
+    num_texts: int = 0
+    #: The number of sections that we rendered.
+    num_sections: int = 0
+    #: The number of texts that were already up to date.
+    num_skipped: int = 0
+    #: URLs that we couldn't render.
+    errors: list[str] = field(default_factory=list)
+
+
+def _app_version() -> str:
+    """Return a fingerprint of everything besides content that pages use."""
+    return f"{etags.asset_version()}:{xml.TEI_XML_VERSION}"
+
+
+def _load_manifest(out_dir: Path) -> dict:
+    try:
+        manifest = json.loads((out_dir / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"app_version": None, "texts": {}}
+    if manifest.get("app_version") != _app_version():
+        # Every page is stale, but keep the list of sections so that we can
+        # clean up sections that no longer exist.
+        for entry in manifest["texts"].values():
+            entry["version"] = None
+    return manifest
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write `data` so that readers never see a partially written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _section_paths(out_dir: Path, text_slug: str, section_slug: str):
+    return (
+        out_dir / "texts" / text_slug / f"{section_slug}.html",
+        out_dir / "api" / "texts" / text_slug / f"{section_slug}.json",
+    )
+
+
+# Per-worker state, set by `_init_worker`.
+_app = None
+_client = None
+_out_dir = None
+
+
+def _init_worker(out_dir: Path):
+    global _client, _out_dir
+    _client = _app.test_client()
+    _out_dir = out_dir
+
+
+def _init_forked_worker(out_dir: Path):
+    # Forked workers inherit the parent's connection pool, which they must not
+    # share. (`close=False` leaves the parent's connections alone.)
+    q.get_engine().dispose(close=False)
+    _init_worker(out_dir)
+
+
+def _bake_chunk(task: tuple[str, list[str]]) -> tuple[str, int, list[str]]:
+    """Render some of a text's sections.
+
+    :return: the text slug, the number of sections rendered, and any URLs that
+        we couldn't render.
+    """
+    text_slug, section_slugs = task
+    num_ok = 0
+    errors = []
+    for section_slug in section_slugs:
+        html_path, json_path = _section_paths(_out_dir, text_slug, section_slug)
+        html_url = f"/texts/{text_slug}/{section_slug}"
+        json_url = f"/api/texts/{text_slug}/{section_slug}"
+
+        ok = True
+        for url, path in [(html_url, html_path), (json_url, json_path)]:
+            resp = _client.get(url)
+            if resp.status_code == 200:
+                _write_atomic(path, resp.data)
+            else:
+                errors.append(url)
+                ok = False
+        num_ok += ok
+    return text_slug, num_ok, errors
+
+
+def _remove_section(out_dir: Path, text_slug: str, section_slug: str):
+    for path in _section_paths(out_dir, text_slug, section_slug):
+        path.unlink(missing_ok=True)
+
+
+def _remove_text(out_dir: Path, text_slug: str):
+    for path in [out_dir / "texts" / text_slug, out_dir / "api" / "texts" / text_slug]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def bake(
+    engine,
+    out_dir: Path,
+    config_env: str,
+    *,
+    text_slugs: list[str] | None = None,
+    processes: int | None = None,
+    force: bool = False,
+) -> BakeResult:
+    """Bake reader pages for the given texts.
+
+    :param engine: the engine to read texts and sections from.
+    :param out_dir: the directory to write pages to.
+    :param config_env: the Flask config to render pages with.
+    :param text_slugs: the texts to bake. If not set, bake all texts and
+        delete pages for texts that no longer exist.
+    :param processes: the number of worker processes. If not set, use one
+        per CPU. If 1, render in this process.
+    :param force: if true, re-render even texts that are up to date.
+    """
+    out_dir = Path(out_dir)
+    manifest = _load_manifest(out_dir)
+    baked = manifest["texts"]
+
+    with engine.connect() as conn:
+        stmt = select(db.Text.id, db.Text.slug, db.Text.version)
+        if text_slugs:
+            stmt = stmt.where(db.Text.slug.in_(text_slugs))
+        texts = conn.execute(stmt).all()
+
+        stmt = select(db.TextSection.text_id, db.TextSection.slug).order_by(
+            db.TextSection.id
+        )
+        sections = {}
+        for text_id, slug in conn.execute(stmt):
+            sections.setdefault(text_id, []).append(slug)
+
+    result = BakeResult()
+    tasks = []
+    pending = {}
+    for text_id, slug, version in texts:
+        section_slugs = sections.get(text_id, [])
+        old = baked.get(slug)
+        if not force and old and old["version"] == version:
+            result.num_skipped += 1
+            continue
+
+        if old:
+            for section_slug in set(old["sections"]) - set(section_slugs):
+                _remove_section(out_dir, slug, section_slug)
+        baked.pop(slug, None)
+        pending[slug] = {"version": version, "sections": section_slugs}
+        for i in range(0, len(section_slugs), CHUNK_SIZE):
+            tasks.append((slug, section_slugs[i : i + CHUNK_SIZE]))
+
+    if not text_slugs:
+        existing = {slug for _, slug, _ in texts}
+        for slug in set(baked) - existing:
+            _remove_text(out_dir, slug)
+            del baked[slug]
+
+    # Create the app here rather than in each worker so that startup errors
+    # (bad config, etc.) fail once and loudly. Workers inherit it on fork.
+    global _app
+    _app = ambuda.create_app(config_env)
+
+    failed = set()
+    if processes == 1:
+        _init_worker(out_dir)
+        results = map(_bake_chunk, tasks)
+        pool = None
+    else:
+        ctx = multiprocessing.get_context("fork")
+        pool = ctx.Pool(processes, initializer=_init_forked_worker, initargs=(out_dir,))
+        results = pool.imap_unordered(_bake_chunk, tasks)
+
+    try:
+        for slug, num_ok, errors in results:
+            result.num_sections += num_ok
+            if errors:
+                failed.add(slug)
+                result.errors.extend(errors)
+                logging.warning(f"Could not bake: {errors}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # Record only the texts that we baked completely, so that we retry the
+    # others on the next run.
+    for slug, entry in pending.items():
+        if slug in failed:
+            baked[slug] = {"version": None, "sections": entry["sections"]}
+        else:
+            baked[slug] = entry
+            result.num_texts += 1
+
+    manifest["app_version"] = _app_version()
+    _write_atomic(
+        out_dir / MANIFEST_NAME, json.dumps(manifest, indent=1).encode("utf-8")
+    )
+    return result
@@ -0,0 +1,120 @@
+"""A persistent cache of rendered HTML for text blocks.
+
+Transforming a block's XML into HTML is cheap, but a large section can have
+hundreds of blocks, and we render every one of them on every page view. So, we
+store each block's rendered HTML in `TextBlock.html`.
+
+Each cached value is tagged with a cache key (`TextBlock.html_key`) that
+combines a hash of the block's XML with a fingerprint of our TEI transform
+rules. If either of these changes, the key changes too, and we treat the cached
+HTML as stale. So the cache never needs to be cleared by hand.
+
+The cache is filled lazily as readers request blocks. To fill it ahead of time
+for a whole text, use `warm_text` (or `cli.py warm-block-cache`).
+"""
+
+import hashlib
+import logging
+from collections.abc import Iterable
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import OperationalError
+
+import ambuda.database as db
+from ambuda.utils import xml
+
+#: The number of blocks to render and write at one time when warming the cache.
+BATCH_SIZE = 1000
+
+
+def html_key(blob: str | bytes) -> str:
+    """Return the cache key for a block with the given XML."""
+    if isinstance(blob, str):
+        blob = blob.encode("utf-8")
+    digest = hashlib.sha1(blob).hexdigest()
+    return f"{xml.TEI_XML_VERSION}:{digest}"
+
+
+def _save(engine, rows: list[dict]):
+    """Write freshly rendered HTML to the cache.
+
+    :param rows: dicts with keys `block_id`, `html`, and `html_key`.
+    """
+    table = db.TextBlock.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("block_id"))
+        .values(html=bindparam("new_html"), html_key=bindparam("new_html_key"))
+    )
+    params = [
+        {"block_id": r["block_id"], "new_html": r["html"], "new_html_key": r["key"]}
+        for r in rows
+    ]
+    with engine.begin() as conn:
+        conn.execute(stmt, params)
+
+
+def render_blocks(engine, blocks: Iterable[db.TextBlock]) -> list[str]:
+    """Render the given blocks to HTML, using cached HTML where possible.
+
+    Any blocks we need to render are written back to the cache. Writes are
+    best-effort: if the database is busy, we skip the write and try again on
+    some later request.
+
+    :param engine: the engine to use when writing to the cache.
+    :param blocks: the blocks to render. These can be `TextBlock` objects or
+        any rows with the same `id`, `xml`, `html`, and `html_key` fields
+        (e.g. from `queries.section_blocks`). We read them in one pass.
+    :return: the HTML for each block, in the same order as `blocks`.
+    """
+    results = []
+    stale = []
+    for i, block in enumerate(blocks):
+        key = html_key(block.xml)
+        if block.html is not None and block.html_key == key:
+            results.append(block.html)
+        else:
+            results.append(None)
+            stale.append({"block_id": block.id, "i": i, "key": key, "xml": block.xml})
+
+    if stale:
+        # Render all stale blocks together, which is much faster than
+        # rendering them one at a time.
+        htmls = xml.transform_text_blocks([r.pop("xml") for r in stale])
+        for row, html in zip(stale, htmls):
+            results[row.pop("i")] = row["html"] = html
+        try:
+            _save(engine, stale)
+        except OperationalError as e:
+            logging.warning(f"Could not write block cache: {e}")
+    return results
+
+
+def warm_text(engine, text_id: int) -> int:
+    """Fill the cache for all blocks in the given text.
+
+    :return: the number of blocks that we (re-)rendered.
+    """
+    stmt = (
+        select(
+            db.TextBlock.id, db.TextBlock.xml, db.TextBlock.html, db.TextBlock.html_key
+        )
+        .filter_by(text_id=text_id)
+        .order_by(db.TextBlock.id)
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(stmt).all()
+
+    stale = []
+    for block_id, blob, html, old_key in rows:
+        key = html_key(blob)
+        if html is None or old_key != key:
+            stale.append({"block_id": block_id, "blob": blob, "key": key})
+
+    for i in range(0, len(stale), BATCH_SIZE):
+        batch = stale[i : i + BATCH_SIZE]
+        htmls = xml.transform_text_blocks([row.pop("blob") for row in batch])
+        for row, html in zip(batch, htmls):
+            row["html"] = html
+        _save(engine, batch)
+    return len(stale)
@@ -0,0 +1,57 @@
+"""Sandhi- and orthography-insensitive keys for the lines of a block.
+
+Different editions of a text (and different typists) write the same verse in
+slightly different ways: with an anusvara or with a homorganic nasal, with or
+without a final visarga, with "tt" or "t", and so on. To match the same line
+across these variants, we reduce each line to a *key* that ignores these
+differences.
+
+We store the key of every line in `text_block_keys` (see
+`ambuda.utils.search`), so that we can find a verse with an index lookup.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+
+from vidyut.lipi import Scheme, transliterate
+
+from ambuda.utils import lipi
+
+
+def make_block_key(raw: str) -> str:
+    """Reduce the given SLP1 text to its key."""
+    # Keep letters, ignoring H due to common typos in the source text.
+    key = re.sub(r"([^a-zA-GI-Z])", "", raw)
+    # Normalize inconsistent anusvara/parasavarna usage
+    key = re.sub("[NYRnm]", "M", key)
+    # Normalize certain double consonants
+    key = re.sub("tt", "t", key)
+    return key
+
+
+def line_keys(blob: str) -> list[str]:
+    """Return the key for each line in the given block XML.
+
+    Lines are `<l>` elements, so a block with no lines (e.g. a paragraph) has
+    no keys.
+    """
+    try:
+        root = ET.fromstring(blob)
+    except ET.ParseError:
+        return []
+
+    keys = []
+    for line in root.iter("l"):
+        # Each line is different, so skip the transliteration cache in `lipi`.
+        slp1 = transliterate("".join(line.itertext()), Scheme.Devanagari, Scheme.Slp1)
+        if key := make_block_key(slp1):
+            keys.append(key)
+    return keys
+
+
+def query_key(query: str) -> str:
+    """Return the key for a line that a user typed in any script."""
+    query = query.strip()
+    if not query:
+        return ""
+    return make_block_key(lipi.to_slp1(query))
@@ -0,0 +1,391 @@
+"""Transparent compression for our largest text columns.
+
+Most of our database is XML (`TextBlock.xml` and `DictionaryEntry.value`) and
+the HTML we pre-render from it (`TextBlock.html` and `DictionaryEntry.html`).
+Each row is short, so compressing rows one at a time gains little on its own.
+But rows in the same column share most of their markup and much of their
+vocabulary, so we compress each row with a *preset dictionary* that we train
+once per column ("corpus"). With a good dictionary, even a short row compresses
+well.
+
+We use `zlib` with a preset dictionary (`zdict`), which needs nothing beyond
+the standard library.
+
+Compression is optional and transparent:
+
+- Columns declared with `CompressedText` accept and return `str` as usual.
+- If a corpus has no dictionary, we store plain text, just as before.
+- Once a corpus has a dictionary, we store new values as compressed `bytes`
+  (a BLOB) whenever that saves space. Old rows stay readable as-is, and
+  `rewrite_corpus` compresses them in batches.
+
+We store dictionaries in the `compression_dictionaries` table and never change
+or delete them, since existing rows refer to them by ID. To train a new one, use
+`train_corpus` (or `./cli.py compress`).
+
+Each process keeps dictionaries per database (by URL), since dictionary IDs
+are meaningful only within one database. Column types see only the engine's
+dialect, so an engine must be *attached* (see `attach`) before its
+`CompressedText` columns compress anything. An attached engine loads any new
+dictionaries each time it checks out a connection, which costs one small
+query. So running workers pick up new dictionaries on their next request,
+without a restart.
+"""
+
+import logging
+import random
+import struct
+import weakref
+import zlib
+
+from sqlalchemy import Text as _Text
+from sqlalchemy import (
+    bindparam,
+    column,
+    event,
+    func,
+    insert,
+    select,
+    table,
+    update,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.types import TypeDecorator
+
+#: Marks a value as compressed. No XML document contains a null byte, so this
+#: prefix is never ambiguous.
+MAGIC = b"\x00z"
+#: MAGIC, then the dictionary ID as a 32-bit unsigned int.
+HEADER = struct.Struct(">2sI")
+#: zlib can refer back at most 32 KiB, so a larger dictionary is useless.
+DICTIONARY_SIZE = 32 * 1024
+#: The number of rows that `rewrite_corpus` reads and updates at a time.
+BATCH_SIZE = 1000
+
+#: Maps a corpus name to the table and column that it compresses.
+CORPORA = {
+    "text_blocks": ("text_blocks", "xml"),
+    "text_blocks_html": ("text_blocks", "html"),
+    "dictionary_entries": ("dictionary_entries", "value"),
+    "dictionary_entries_html": ("dictionary_entries", "html"),
+}
+
+dictionaries_table = table(
+    "compression_dictionaries",
+    column("id"),
+    column("corpus"),
+    column("data"),
+)
+#: The same query as `Dictionaries.load`, for a raw DBAPI connection. (We use
+#: only SQLite, so we use its parameter style.)
+_LOAD_SQL = (
+    "SELECT id, corpus, data FROM compression_dictionaries WHERE id > ? ORDER BY id"
+)
+
+
+class UnknownDictionaryError(Exception):
+    """Raised if a value refers to a dictionary that its database doesn't have."""
+
+
+class Dictionaries:
+    """The compression dictionaries that we've loaded from one database."""
+
+    def __init__(self):
+        #: Maps a dictionary ID to its data.
+        self.data: dict[int, bytes] = {}
+        #: Maps a corpus name to the ID of its newest dictionary.
+        self.current: dict[str, int] = {}
+
+    def register(self, id: int, corpus: str, data: bytes):
+        """Make the given dictionary available for compression and
+        decompression.
+        """
+        self.data[id] = data
+        if id >= self.current.get(corpus, 0):
+            self.current[corpus] = id
+
+    def is_enabled(self, corpus: str) -> bool:
+        """Return whether we compress new values in the given corpus."""
+        return corpus in self.current
+
+    def compress(self, text: str, corpus: str) -> str | bytes:
+        """Compress `text` with the corpus's current dictionary.
+
+        :return: the compressed value, or `text` itself if the corpus has no
+            dictionary or if compression wouldn't save space.
+        """
+        dict_id = self.current.get(corpus)
+        if dict_id is None:
+            return text
+
+        raw = text.encode("utf-8")
+        c = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=self.data[dict_id])
+        blob = HEADER.pack(MAGIC, dict_id) + c.compress(raw) + c.flush()
+        if len(blob) >= len(raw):
+            return text
+        return blob
+
+    def decompress(self, value: str | bytes) -> str:
+        """Reverse `compress`."""
+        if isinstance(value, str):
+            return value
+
+        dict_id = dictionary_id(value)
+        if dict_id is None:
+            # Plain text that was stored as UTF-8 bytes. (Our dictionary seed
+            # scripts used to do this.)
+            return value.decode("utf-8")
+        try:
+            zdict = self.data[dict_id]
+        except KeyError:
+            raise UnknownDictionaryError(
+                f"Compression dictionary {dict_id} is not loaded"
+            ) from None
+        d = zlib.decompressobj(-15, zdict=zdict)
+        raw = d.decompress(value[HEADER.size :]) + d.flush()
+        return raw.decode("utf-8")
+
+    @property
+    def last_id(self) -> int:
+        """The ID of the newest dictionary we've loaded, or 0 if none."""
+        return max(self.data, default=0)
+
+    def load(self, conn):
+        """Load any dictionaries in `conn`'s database that we don't have yet."""
+        t = dictionaries_table
+        stmt = (
+            select(t.c.id, t.c.corpus, t.c.data)
+            .where(t.c.id > self.last_id)
+            .order_by(t.c.id)
+        )
+        try:
+            rows = conn.execute(stmt).all()
+        except DBAPIError:
+            # The table doesn't exist yet, e.g. before we run migrations.
+            return
+        for id, corpus, data in rows:
+            self.register(id, corpus, bytes(data))
+
+
+def dictionary_id(value: bytes) -> int | None:
+    """Return the ID of the dictionary that compressed `value`, or None if
+    `value` isn't compressed.
+    """
+    if not value.startswith(MAGIC):
+        return None
+    _, dict_id = HEADER.unpack_from(value)
+    return dict_id
+
+
+#: Our dictionaries, by database URL.
+_databases: dict[str, Dictionaries] = {}
+#: The same dictionaries, by each attached engine's dialect. Column types see
+#: only the dialect, and this is much cheaper than formatting a URL per row.
+_dialects: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+#: The engines that we've attached to.
+_engines: weakref.WeakSet = weakref.WeakSet()
+
+
+def _get(engine) -> Dictionaries:
+    dictionaries = _dialects.get(engine.dialect)
+    if dictionaries is None:
+        key = str(engine.url)
+        dictionaries = _databases.get(key)
+        if dictionaries is None:
+            dictionaries = _databases[key] = Dictionaries()
+        _dialects[engine.dialect] = dictionaries
+    return dictionaries
+
+
+def attach(engine):
+    """Compress and decompress `CompressedText` values for `engine`.
+
+    Each time `engine` checks out a connection, we load any new dictionaries
+    through it. Attaching the same engine twice has no effect.
+    """
+    if engine in _engines:
+        return
+    _engines.add(engine)
+    errors = engine.dialect.loaded_dbapi.Error
+
+    def load(dbapi_connection, connection_record, connection_proxy):
+        dictionaries = _get(engine)
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(_LOAD_SQL, (dictionaries.last_id,))
+            rows = cursor.fetchall()
+        except errors:
+            # The table doesn't exist yet, e.g. before we run migrations.
+            return
+        finally:
+            cursor.close()
+        for id, corpus, data in rows:
+            dictionaries.register(id, corpus, bytes(data))
+
+    event.listen(engine, "checkout", load)
+
+
+def for_connection(conn) -> Dictionaries:
+    """Return the dictionaries for `conn`'s database, including any new ones.
+
+    This also attaches `conn`'s engine, so that its `CompressedText` columns
+    use the same dictionaries.
+    """
+    attach(conn.engine)
+    dictionaries = _get(conn.engine)
+    dictionaries.load(conn)
+    return dictionaries
+
+
+def clear():
+    """Forget all dictionaries. Attached engines reload them on checkout."""
+    _databases.clear()
+    _dialects.clear()
+
+
+def compress(text: str, corpus: str, conn) -> str | bytes:
+    """Compress `text` with the current dictionary in `conn`'s database."""
+    return for_connection(conn).compress(text, corpus)
+
+
+def decompress(value: str | bytes, conn) -> str:
+    """Decompress a value that we read through `conn`."""
+    dictionaries = _get(conn.engine)
+    try:
+        return dictionaries.decompress(value)
+    except UnknownDictionaryError:
+        # The dictionary is newer than the ones we've loaded.
+        dictionaries.load(conn)
+        return dictionaries.decompress(value)
+
+
+def train(samples: list[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """Build a preset dictionary from sample rows of a corpus.
+
+    A zlib dictionary is just text that compressed values can refer back to,
+    and rows that resemble the rows we'll compress make the best dictionary.
+    So we concatenate random samples until we have `size` bytes.
+    """
+    samples = list(samples)
+    random.Random(0).shuffle(samples)
+    buf = bytearray()
+    for sample in samples:
+        if len(buf) >= size:
+            break
+        buf += sample.encode("utf-8")
+    # zlib favors recent data, so keep the end.
+    return bytes(buf[-size:])
+
+
+class CompressedText(TypeDecorator):
+    """A text column that we compress with the corpus's dictionary, if any."""
+
+    impl = _Text
+    cache_ok = True
+
+    def __init__(self, corpus: str, *args, **kw):
+        super().__init__(*args, **kw)
+        self.corpus = corpus
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        dictionaries = _dialects.get(dialect)
+        if dictionaries is None:
+            # Not attached, so store plain text.
+            return value
+        return dictionaries.compress(value, self.corpus)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        dictionaries = _dialects.get(dialect) or Dictionaries()
+        return dictionaries.decompress(value)
+
+
+def train_corpus(conn, corpus: str, num_samples: int = 5000) -> int | None:
+    """Train and store a new dictionary for `corpus` from its current rows.
+
+    :param conn: a connection in a transaction.
+    :return: the new dictionary's ID, or None if the corpus has no rows.
+    """
+    table_name, column_name = CORPORA[corpus]
+    col = column(column_name)
+    stmt = (
+        select(col)
+        .select_from(table(table_name))
+        .where(col.is_not(None))
+        .order_by(func.random())
+        .limit(num_samples)
+    )
+    samples = [decompress(v, conn) for v in conn.execute(stmt).scalars()]
+    if not samples:
+        return None
+
+    data = train(samples)
+    result = conn.execute(insert(dictionaries_table).values(corpus=corpus, data=data))
+    dict_id = result.lastrowid
+    for_connection(conn).register(dict_id, corpus, data)
+    return dict_id
+
+
+def rewrite_corpus(conn, corpus: str, compress_rows: bool = True) -> int:
+    """Rewrite every row in `corpus` with its current dictionary.
+
+    :param conn: a connection in a transaction.
+    :param compress_rows: if false, store every row as plain text instead.
+    :return: the number of rows we rewrote.
+    """
+    table_name, column_name = CORPORA[corpus]
+    return rewrite_column(
+        conn, table_name, column_name, corpus if compress_rows else None
+    )
+
+
+def rewrite_column(conn, table_name: str, column_name: str, corpus: str | None) -> int:
+    """Rewrite every row in a column with the current dictionary for `corpus`.
+
+    We walk the table by primary key one batch at a time, so memory use stays
+    flat even for large tables. The caller is responsible for committing.
+
+    Unlike `rewrite_corpus`, this doesn't depend on `CORPORA`, so migrations
+    can use it on the columns that exist at their revision.
+
+    :param conn: a connection in a transaction.
+    :param corpus: the corpus whose dictionary we compress with. If None, store
+        every row as plain text instead.
+    :return: the number of rows we rewrote.
+    """
+    t = table(table_name, column("id"), column(column_name))
+    stmt_update = (
+        update(t)
+        .where(t.c.id == bindparam("_id"))
+        .values({column_name: bindparam("_value")})
+    )
+
+    dictionaries = for_connection(conn)
+    last_id = 0
+    num_rows = 0
+    while True:
+        stmt = (
+            select(t.c.id, t.c[column_name])
+            .where(t.c.id > last_id, t.c[column_name].is_not(None))
+            .order_by(t.c.id)
+            .limit(BATCH_SIZE)
+        )
+        rows = conn.execute(stmt).all()
+        if not rows:
+            break
+
+        params = []
+        for id, value in rows:
+            text = decompress(value, conn)
+            new_value = dictionaries.compress(text, corpus) if corpus else text
+            if new_value != value:
+                params.append({"_id": id, "_value": new_value})
+        if params:
+            conn.execute(stmt_update, params)
+        num_rows += len(params)
+        last_id = rows[-1][0]
+        logging.info(f"{table_name}.{column_name}: rewrote rows up to ID {last_id}")
+    return num_rows
@@ -0,0 +1,38 @@
+"""Content versions for texts and dictionaries.
+
+`Text.version` and `Dictionary.version` tell our caches (ETags, cached HTML,
+baked pages, etc.) whether some content has changed: if the version is the
+same, the content is the same. So every code path that changes a text or a
+dictionary must also give it a new version with the functions here.
+
+Versions must never repeat, even if we delete a text and create it again from
+scratch. So a new version is always greater than both the current Unix time (in
+milliseconds) and every version already in the table. (`Integer` is 64-bit on
+SQLite, so we won't run out.)
+"""
+
+import time
+
+from sqlalchemy import func, select, update
+
+import ambuda.database as db
+
+Versioned = type[db.Text] | type[db.Dictionary]
+
+
+def next_version(session, model: Versioned) -> int:
+    """Return a content version that no row of `model` has used before."""
+    latest = session.scalar(select(func.max(model.version))) or 0
+    return max(latest + 1, int(time.time() * 1000))
+
+
+def bump(session, model: Versioned, id: int) -> int:
+    """Give the given text or dictionary a new content version.
+
+    The caller is responsible for committing the session.
+
+    :return: the new version.
+    """
+    version = next_version(session, model)
+    session.execute(update(model).where(model.id == id).values(version=version))
+    return version
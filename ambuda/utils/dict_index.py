@@ -0,0 +1,352 @@
+"""Memory-mapped key indexes for our dictionaries.
+
+Dictionary lookup is our most common query, and `dictionary_entries` has
+hundreds of thousands of rows. So for each dictionary, we write a compact file
+that maps each sorted key to the IDs of its entries. To look up a key, we
+binary-search the file and then fetch just the matching rows by primary key.
+
+We open index files with `mmap`, so every gunicorn worker on a host shares
+one copy of each file through the OS page cache.
+
+An index file has this layout, where every integer is an unsigned 32-bit int
+in native byte order:
+
+- a header (see `HEADER`)
+- `key_offsets`: `num_keys + 1` offsets into `keys`
+- `id_offsets`: `num_keys + 1` offsets into `ids`
+- `ids`: entry IDs, grouped by key
+- `keys`: every key in UTF-8, sorted and concatenated
+
+Index files are named for the dictionary's content version
+(`Dictionary.version`), so a reseeded dictionary never uses a stale index. If a
+dictionary has no current index, lookups fall back to the database. To build
+the index, run `./cli.py build-dictionary-index`.
+
+Next to each index, we also write a *fuzzy index* in the same format, which we
+use to suggest headwords when a lookup finds nothing. This is a SymSpell-style
+deletes index: it maps each folded key (see `fold_key`) and every string we
+can make by deleting one character from it to the positions of its keys in
+the main index. Two keys within one edit of each other share at least one of
+these strings, so we can find near misses with a handful of lookups.
+"""
+
+import bisect
+import heapq
+import itertools
+import logging
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Iterator
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import select
+
+import ambuda.database as db
+
+#: The file header: a magic string, the number of keys, and the number of IDs.
+HEADER = struct.Struct("=4sII")
+MAGIC = b"AKI1"
+
+#: The largest edit distance (after folding) for a fuzzy match.
+MAX_EDIT_DISTANCE = 1
+#: Keys shorter than this (after folding) don't get fuzzy matches, since
+#: almost any short string is within one edit of some headword.
+MIN_FUZZY_LENGTH = 3
+
+#: Maps SLP1 sounds that users often confuse to a common form: vowel length,
+#: the three sibilants, the nasals, and a final visarga.
+_FOLD = str.maketrans(
+    {
+        "A": "a",
+        "I": "i",
+        "U": "u",
+        "F": "f",
+        "X": "x",
+        "S": "s",
+        "z": "s",
+        "N": "n",
+        "Y": "n",
+        "R": "n",
+        "M": "n",
+        "H": None,
+    }
+)
+
+
+def index_dir(upload_folder: str | None = None) -> Path:
+    """Return the directory that holds our index files."""
+    upload_folder = upload_folder or current_app.config["UPLOAD_FOLDER"]
+    return Path(upload_folder) / "dictionary-index"
+
+
+def index_path(out_dir: Path, slug: str, version: int) -> Path:
+    return out_dir / f"{slug}-{version}.idx"
+
+
+def fuzzy_path(out_dir: Path, slug: str, version: int) -> Path:
+    return out_dir / f"{slug}-{version}.fuzzy"
+
+
+def fold_key(key: str) -> str:
+    """Reduce an SLP1 key to a form that ignores common confusions."""
+    return key.translate(_FOLD)
+
+
+def _deletes(s: str) -> set[str]:
+    """Return every string we can make by deleting one character from `s`."""
+    return {s[:i] + s[i + 1 :] for i in range(len(s))}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Return the edit distance between `a` and `b`, where swapping two
+    adjacent characters counts as one edit.
+    """
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (
+                prev2 is not None
+                and j > 1
+                and a[i - 1] == b[j - 2]
+                and a[i - 2] == b[j - 1]
+            ):
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class _Keys:
+    """A sequence view over the keys in an index, for `bisect`."""
+
+    def __init__(self, keys: memoryview, offsets: memoryview):
+        self.keys = keys
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.keys[self.offsets[i] : self.offsets[i + 1]])
+
+
+class KeyIndex:
+    """A read-only, memory-mapped index for one dictionary."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, num_keys, num_ids = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a dictionary index.")
+
+        start = HEADER.size
+        n = num_keys + 1
+        self._key_offsets = view[start : start + 4 * n].cast("I")
+        start += 4 * n
+        self._id_offsets = view[start : start + 4 * n].cast("I")
+        start += 4 * n
+        self._ids = view[start : start + 4 * num_ids].cast("I")
+        start += 4 * num_ids
+        self._keys = _Keys(view[start:], self._key_offsets)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def key(self, i: int) -> str:
+        """Return the key at position `i` in sorted order."""
+        return self._keys[i].decode("utf-8")
+
+    def ids(self, key: str) -> list[int]:
+        """Return the IDs of the entries for `key`, in ascending order."""
+        target = key.encode("utf-8")
+        i = bisect.bisect_left(self._keys, target)
+        if i == len(self._keys) or self._keys[i] != target:
+            return []
+        return self._ids[self._id_offsets[i] : self._id_offsets[i + 1]].tolist()
+
+    def iter_prefix(self, prefix: str) -> Iterator[str]:
+        """Yield every key that starts with `prefix`, in sorted order."""
+        target = prefix.encode("utf-8")
+        for i in range(bisect.bisect_left(self._keys, target), len(self._keys)):
+            key = self._keys[i]
+            if not key.startswith(target):
+                break
+            yield key.decode("utf-8")
+
+
+def _write_index(path: Path, rows) -> int:
+    """Write an index for `rows`, which are (key, id) pairs sorted by key."""
+    key_offsets = array("I", [0])
+    id_offsets = array("I", [0])
+    ids = array("I")
+    keys = bytearray()
+    prev = None
+    for key, id in rows:
+        if key != prev:
+            if prev is not None:
+                key_offsets.append(len(keys))
+                id_offsets.append(len(ids))
+            keys += key.encode("utf-8")
+            prev = key
+        ids.append(id)
+    if prev is not None:
+        key_offsets.append(len(keys))
+        id_offsets.append(len(ids))
+
+    num_keys = len(key_offsets) - 1
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, num_keys, len(ids)))
+        key_offsets.tofile(f)
+        id_offsets.tofile(f)
+        ids.tofile(f)
+        f.write(keys)
+    os.replace(tmp, path)
+    return num_keys
+
+
+def _write_fuzzy_index(path: Path, index: KeyIndex):
+    """Write a fuzzy index for the keys in `index`."""
+    rows = []
+    for i in range(len(index)):
+        folded = fold_key(index.key(i))
+        if len(folded) < MIN_FUZZY_LENGTH:
+            continue
+        rows.extend((variant, i) for variant in _deletes(folded) | {folded})
+    rows.sort()
+    _write_index(path, rows)
+
+
+def build(engine, out_dir: Path, slugs: list[str] | None = None) -> dict[str, int]:
+    """Build an index file for each dictionary and delete stale ones.
+
+    :param slugs: the dictionaries to index. If not set, index all of them.
+    :return: the number of keys in each index we built.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with engine.connect() as conn:
+        stmt = select(db.Dictionary.id, db.Dictionary.slug, db.Dictionary.version)
+        if slugs:
+            stmt = stmt.where(db.Dictionary.slug.in_(slugs))
+        dictionaries = conn.execute(stmt).all()
+
+        result = {}
+        for id, slug, version in dictionaries:
+            e = db.DictionaryEntry
+            # SQLite compares strings bytewise, as `bisect` does on our keys.
+            stmt = (
+                select(e.key, e.id)
+                .where(e.dictionary_id == id)
+                .order_by(e.key, e.id)
+                .execution_options(yield_per=10_000)
+            )
+            path = index_path(out_dir, slug, version)
+            result[slug] = _write_index(path, conn.execute(stmt))
+            fuzzy = fuzzy_path(out_dir, slug, version)
+            _write_fuzzy_index(fuzzy, KeyIndex(path))
+            for old in out_dir.glob(f"{slug}-*"):
+                # Careful: "apte-*" also matches "apte-sh-1.idx".
+                old_slug, _, _ = old.stem.rpartition("-")
+                if old not in (path, fuzzy) and old_slug == slug:
+                    old.unlink()
+            logging.info(f"Indexed {result[slug]} keys in {slug}")
+    return result
+
+
+#: Our open indexes, by dictionary slug. Values are (version, index) pairs.
+_indexes: dict[str, tuple[int, KeyIndex]] = {}
+#: Our open fuzzy indexes, in the same format as `_indexes`.
+_fuzzy_indexes: dict[str, tuple[int, KeyIndex]] = {}
+
+
+def _open(cache: dict, make_path, slug: str, version: int) -> KeyIndex | None:
+    cached = cache.get(slug)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    # Don't cache misses, so that we find new indexes without a restart.
+    try:
+        index = KeyIndex(make_path(index_dir(), slug, version))
+    except (FileNotFoundError, ValueError):
+        return None
+    cache[slug] = (version, index)
+    return index
+
+
+def stamp(slug: str, version: int) -> int | None:
+    """Return when we last built a dictionary's indexes, or None if it has none.
+
+    We write the fuzzy index last, so this is its modification time (in ns).
+    Suggestions change whenever we rebuild, so HTTP caches should use this.
+    """
+    try:
+        return fuzzy_path(index_dir(), slug, version).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get(slug: str, version: int) -> KeyIndex | None:
+    """Return the current index for a dictionary, or None if it has none."""
+    return _open(_indexes, index_path, slug, version)
+
+
+def complete(versions: dict[str, int], prefixes: list[str], limit: int) -> list[str]:
+    """Return the first `limit` keys in the given dictionaries that start with
+    any of the given prefixes, in sorted order and without duplicates.
+
+    :param versions: the version of each dictionary to search, by slug.
+        Dictionaries without a current index are skipped.
+    """
+    iters = []
+    for slug, version in versions.items():
+        index = get(slug, version)
+        if index is not None:
+            iters.extend(index.iter_prefix(p) for p in prefixes if p)
+    # Each iterator is sorted, so we can merge them lazily.
+    keys = (key for key, _ in itertools.groupby(heapq.merge(*iters)))
+    return list(itertools.islice(keys, limit))
+
+
+def suggest(versions: dict[str, int], key: str, limit: int) -> list[str]:
+    """Return headwords that are close to `key`, closest first.
+
+    :param versions: the version of each dictionary to search, by slug.
+        Dictionaries without a current fuzzy index are skipped.
+    :param key: a standardized SLP1 key.
+    """
+    folded = fold_key(key)
+    if len(folded) < MIN_FUZZY_LENGTH:
+        return []
+
+    probes = sorted(_deletes(folded) | {folded})
+    candidates = set()
+    for slug, version in versions.items():
+        index = get(slug, version)
+        fuzzy = _open(_fuzzy_indexes, fuzzy_path, slug, version)
+        if index is None or fuzzy is None:
+            continue
+        for probe in probes:
+            candidates.update(index.key(i) for i in fuzzy.ids(probe))
+
+    ranked = []
+    for candidate in candidates:
+        distance = _edit_distance(folded, fold_key(candidate))
+        if distance <= MAX_EDIT_DISTANCE:
+            # Prefer matches that differ only by a common confusion.
+            ranked.append((distance, _edit_distance(key, candidate), candidate))
+    ranked.sort()
+    return [candidate for *_, candidate in ranked[:limit]]
+
+
+def clear():
+    """Forget all open indexes. (For tests.)"""
+    _indexes.clear()
+    _fuzzy_indexes.clear()
@@ -0,0 +1,88 @@
+"""A per-worker registry of our dictionaries.
+
+Every dictionary request needs to map slugs to IDs, titles, and content
+versions, and there are only a handful of dictionaries. So instead of loading
+them on every request, we keep them in memory.
+
+Content versions only ever increase (see `ambuda.utils.content_versions`), so
+the number of dictionaries and the largest version together tell us whether
+any dictionary was added, removed, or changed. We check these values at most
+once every `CHECK_INTERVAL` seconds and reload the registry if they changed.
+"""
+
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+
+import ambuda.database as db
+
+#: How often (in seconds) we check whether any dictionary has changed.
+CHECK_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class DictionaryMeta:
+    """Just enough data about a dictionary to look up its entries."""
+
+    id: int
+    slug: str
+    title: str
+    version: int
+
+
+@dataclass
+class Registry:
+    #: The number of dictionaries and their largest content version.
+    stamp: tuple[int, int]
+    #: Maps a dictionary's slug to its metadata.
+    by_slug: dict[str, DictionaryMeta]
+    #: Maps a dictionary's ID to its metadata.
+    by_id: dict[int, DictionaryMeta]
+    #: When we last checked `stamp` against the database, per `time.monotonic`.
+    checked_at: float = 0.0
+
+
+def _stamp(session) -> tuple[int, int]:
+    d = db.Dictionary
+    count, version = session.execute(
+        select(func.count(d.id), func.max(d.version))
+    ).one()
+    return count, version or 0
+
+
+def _build(session, stamp: tuple[int, int]) -> Registry:
+    d = db.Dictionary
+    stmt = select(d.id, d.slug, d.title, d.version).order_by(d.id)
+    dicts = [DictionaryMeta(*row) for row in session.execute(stmt)]
+    return Registry(
+        stamp=stamp,
+        by_slug={x.slug: x for x in dicts},
+        by_id={x.id: x for x in dicts},
+    )
+
+
+_registry: Registry | None = None
+
+
+def get(session) -> Registry:
+    """Get the registry, reloading it if any dictionary has changed."""
+    global _registry
+    now = time.monotonic()
+    registry = _registry
+    if registry is not None and now - registry.checked_at < CHECK_INTERVAL:
+        return registry
+
+    # We read the stamp before the dictionaries, so at worst we store newer
+    # dictionaries with an older stamp and reload next time.
+    stamp = _stamp(session)
+    if registry is None or registry.stamp != stamp:
+        registry = _registry = _build(session, stamp)
+    registry.checked_at = now
+    return registry
+
+
+def clear():
+    """Clear the registry."""
+    global _registry
+    _registry = None
@@ -0,0 +1,161 @@
+"""Whole-text downloads in plain text, TEI XML, and JSON.
+
+Large texts (e.g. the Mahabharata) have hundreds of thousands of blocks, so we
+never build a download in memory. Instead, we stream it one section at a time
+with generators that yield one chunk per section.
+
+We also cache each download on disk (see `cache_path`), keyed by the text's
+content version (`Text.version`). The first request for a download streams it from the
+database and writes it to the cache as it goes. Later requests serve the
+cached file directly.
+"""
+
+import itertools
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator
+from pathlib import Path
+
+from flask import current_app
+from markupsafe import escape
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import json_serde, lipi, text_index
+
+#: Increment this whenever the output of this module changes, so that we don't
+#: serve stale downloads.
+DOWNLOAD_VERSION = 1
+
+#: The number of sections whose blocks we fetch with one query. Large texts
+#: have thousands of short sections, so a query per section is slow.
+SECTION_BATCH_SIZE = 500
+
+#: Maps each format we support to its mimetype.
+MIMETYPES = {
+    "txt": "text/plain; charset=utf-8",
+    "xml": "application/xml; charset=utf-8",
+    "json": "application/json",
+}
+
+
+def _iter_sections(text: db.Text) -> Iterator[tuple[text_index.SectionMeta, list]]:
+    """Yield each section of the text with its blocks, one section at a time."""
+    sections = text_index.get(text).sections
+    for i in range(0, len(sections), SECTION_BATCH_SIZE):
+        batch = sections[i : i + SECTION_BATCH_SIZE]
+        rows = q.sections_blocks([s.id for s in batch])
+        groups = itertools.groupby(rows, key=lambda row: row.section_id)
+        # `text_index` orders sections by ID, as does `sections_blocks`. But
+        # some sections might have no blocks.
+        group = next(groups, None)
+        for section in batch:
+            if group and group[0] == section.id:
+                yield section, list(group[1])
+                group = next(groups, None)
+            else:
+                yield section, []
+
+
+def _block_to_txt(blob: str) -> str:
+    try:
+        root = ET.fromstring(blob)
+    except ET.ParseError:
+        return blob
+    lines = list(root.iter("l")) or [root]
+    return "\n".join(" ".join("".join(line.itertext()).split()) for line in lines)
+
+
+def _iter_txt(text: db.Text) -> Iterator[str]:
+    yield lipi.hk_to_devanagari(text.title) + "\n"
+    for section, blocks in _iter_sections(text):
+        title = lipi.hk_to_devanagari(section.title)
+        yield f"\n# {section.slug} {title}\n\n" + "".join(
+            _block_to_txt(b.xml) + "\n\n" for b in blocks
+        )
+
+
+def _iter_xml(text: db.Text) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<TEI xmlns="http://www.tei-c.org/ns/1.0">\n'
+    if text.header:
+        yield text.header + "\n"
+    yield f'<text xml:id="{escape(text.slug)}"><body>\n'
+    for section, blocks in _iter_sections(text):
+        yield (
+            f'<div n="{escape(section.slug)}">\n'
+            + "".join(b.xml + "\n" for b in blocks)
+            + "</div>\n"
+        )
+    yield "</body></text>\n</TEI>\n"
+
+
+def _iter_json(text: db.Text) -> Iterator[str]:
+    title = lipi.hk_to_devanagari(text.title)
+    head = json_serde.dumps({"slug": text.slug, "title": title})
+    # Open the object, then stream the "sections" array inside it.
+    yield head[:-1] + ',"sections":['
+    for i, (section, blocks) in enumerate(_iter_sections(text)):
+        data = {
+            "slug": section.slug,
+            "title": lipi.hk_to_devanagari(section.title),
+            "blocks": [{"slug": b.slug, "xml": b.xml} for b in blocks],
+        }
+        yield ("," if i else "") + json_serde.dumps(data)
+    yield "]}\n"
+
+
+_GENERATORS = {
+    "txt": _iter_txt,
+    "xml": _iter_xml,
+    "json": _iter_json,
+}
+
+
+def cache_dir(text_slug: str) -> Path:
+    return Path(current_app.config["UPLOAD_FOLDER"]) / "downloads" / text_slug
+
+
+def cache_path(text: db.Text, fmt: str) -> Path:
+    """Return where we cache the given download.
+
+    The path is `<UPLOAD_FOLDER>/downloads/<text-slug>/<key>.<fmt>`, where the
+    key combines `DOWNLOAD_VERSION` and the text's content version.
+    """
+    return cache_dir(text.slug) / f"{DOWNLOAD_VERSION}-{text.version}.{fmt}"
+
+
+def _remove_stale(path: Path, fmt: str):
+    for old in path.parent.glob(f"*.{fmt}"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+
+def generate(text: db.Text, fmt: str) -> Iterator[bytes]:
+    """Stream the download for `text` and cache it on disk as we go.
+
+    If the stream is interrupted (e.g. the client disconnects), we discard the
+    partial file.
+
+    :param fmt: a key in `MIMETYPES`.
+    """
+    path = cache_path(text, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent requests may write the same download, so each writes to its
+    # own temporary file. The last to finish wins, which is fine since their
+    # contents are identical.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in _GENERATORS[fmt](text):
+                data = chunk.encode("utf-8")
+                f.write(data)
+                yield data
+        # `mkstemp` makes the file private, but anyone may read a download.
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    _remove_stale(path, fmt)
@@ -0,0 +1,172 @@
+"""Pre-rendered HTML for dictionary entries.
+
+A common headword (e.g. "deva") has dozens of entries, and we used to transform
+every one of them from XML to HTML on every lookup. So instead, we render each
+entry once when we seed its dictionary and store the result in
+`DictionaryEntry.html`.
+
+Each stored value is tagged with the version of our dictionary transform rules
+(`DictionaryEntry.html_version`). If the rules change, we treat the stored HTML
+as stale: lookups render stale entries on the fly (and store the result), and
+`render_all` (or `cli.py render-dictionaries`) re-renders them all at once.
+"""
+
+import logging
+from collections.abc import Iterable
+from xml.etree.ElementTree import ParseError
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import OperationalError
+
+import ambuda.database as db
+from ambuda.utils import xml
+
+#: The number of entries to render and write at one time.
+BATCH_SIZE = 1000
+
+#: The transform rules for each dictionary, by slug. Dictionaries that aren't
+#: listed here use `xml.mw_xml`.
+RULES = {
+    "apte": xml.apte_cologne_xml,
+    "apte-sh": xml.apte_uoh_xml,
+    "shabdartha-kaustubha": xml.vacaspatyam_xml,
+    "mw": xml.mw_xml,
+    "vacaspatyam": xml.vacaspatyam_xml,
+    "amara": xml.amarakosha_xml,
+    "shabdakalpadruma": xml.mw_xml,
+}
+
+
+def html_version() -> str:
+    """Return the version to tag freshly rendered HTML with."""
+    return xml.DICTIONARY_XML_VERSION
+
+
+def transform(slug: str, blob: str | bytes) -> str:
+    """Render one entry from the given dictionary."""
+    return xml.stream_transform(blob, RULES.get(slug, xml.mw_xml))
+
+
+def _transform_batch(slug: str, blobs: list[str | bytes]) -> list[str | None]:
+    """Render many entries at once. Entries we can't render become None."""
+    rules = RULES.get(slug, xml.mw_xml)
+    try:
+        return xml.stream_transform_batch(blobs, rules)
+    except (ParseError, UnicodeError) as e:
+        # Render one at a time to find the bad entries.
+        logging.warning(f"Could not render {slug} batch: {e}")
+
+    results = []
+    for blob in blobs:
+        try:
+            results.append(xml.stream_transform(blob, rules))
+        except (ParseError, UnicodeError) as e:
+            logging.warning(f"Could not render {slug} entry: {e}")
+            results.append(None)
+    return results
+
+
+def _save(engine, rows: list[dict]):
+    """Write rendered HTML for the given entries.
+
+    :param rows: dicts with keys `entry_id` and `html`.
+    """
+    table = db.DictionaryEntry.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("entry_id"))
+        .values(html=bindparam("new_html"), html_version=bindparam("new_version"))
+    )
+    version = html_version()
+    params = [
+        {"entry_id": r["entry_id"], "new_html": r["html"], "new_version": version}
+        for r in rows
+    ]
+    with engine.begin() as conn:
+        conn.execute(stmt, params)
+
+
+def render_entries(
+    engine, slug: str, entries: Iterable[db.DictionaryEntry]
+) -> list[str]:
+    """Return the HTML for the given entries, rendering only stale ones.
+
+    As in `block_cache.render_blocks`, we write freshly rendered HTML back on
+    a best-effort basis.
+
+    :param slug: the slug of the entries' dictionary.
+    :return: the HTML for each entry, in the same order as `entries`.
+    """
+    version = html_version()
+    results = []
+    stale = []
+    for entry in entries:
+        if entry.html is not None and entry.html_version == version:
+            results.append(entry.html)
+        else:
+            html = transform(slug, entry.value)
+            results.append(html)
+            stale.append({"entry_id": entry.id, "html": html})
+
+    if stale:
+        try:
+            _save(engine, stale)
+        except OperationalError as e:
+            logging.warning(f"Could not store dictionary HTML: {e}")
+    return results
+
+
+def render_rows(slug: str, rows: list[dict]) -> list[dict]:
+    """Add `html` and `html_version` to new entries before we insert them.
+
+    :param rows: dicts with at least the key `value`.
+    """
+    version = html_version()
+    htmls = _transform_batch(slug, [row["value"] for row in rows])
+    for row, html in zip(rows, htmls):
+        row["html"] = html
+        row["html_version"] = version if html is not None else None
+    return rows
+
+
+def render_all(engine, slug: str, force: bool = False) -> int:
+    """Render every stale entry in the given dictionary.
+
+    :param force: if true, re-render entries even if they're up to date.
+    :return: the number of entries that we rendered.
+    """
+    e = db.DictionaryEntry
+    with engine.connect() as conn:
+        dictionary_id = conn.scalar(select(db.Dictionary.id).filter_by(slug=slug))
+    if dictionary_id is None:
+        return 0
+
+    version = html_version()
+    num_rendered = 0
+    last_id = 0
+    while True:
+        stmt = (
+            select(e.id, e.value, e.html_version)
+            .where((e.dictionary_id == dictionary_id) & (e.id > last_id))
+            .order_by(e.id)
+            .limit(BATCH_SIZE)
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        stale = [r for r in rows if force or r.html_version != version]
+        if stale:
+            htmls = _transform_batch(slug, [r.value for r in stale])
+            _save(
+                engine,
+                [
+                    {"entry_id": r.id, "html": html}
+                    for r, html in zip(stale, htmls)
+                    if html is not None
+                ],
+            )
+            num_rendered += len(stale)
+    return num_rendered
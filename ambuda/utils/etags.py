@@ -0,0 +1,93 @@
+"""Conditional GET support for our read-heavy routes.
+
+Our reader and dictionary pages are a pure function of a few inputs: the
+content of the text or dictionary, our templates and static assets, our XML
+transform rules, and a bit of per-user state (locale and login). We combine all
+of these into a strong ETag. If the browser (or a cache in front of us) sends
+back a matching `If-None-Match` header, we can return a 304 before we load any
+content or run any XML transforms.
+
+Usage::
+
+    etag = etags.make_etag(xml.TEI_XML_VERSION, text.version, section_slug)
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
+    ...
+    return etags.with_etag(render_template(...), etag)
+
+Content versions come from `Text.version` and `Dictionary.version`.
+"""
+
+import functools
+import hashlib
+from pathlib import Path
+
+from flask import Response, make_response, request
+from flask_babel import get_locale
+from flask_login import current_user
+
+AMBUDA_DIR = Path(__file__).parent.parent
+
+#: Directories whose files affect the HTML we serve.
+ASSET_DIRS = [
+    AMBUDA_DIR / "static",
+    AMBUDA_DIR / "templates",
+    AMBUDA_DIR / "translations",
+]
+
+
+@functools.cache
+def asset_version() -> str:
+    """Return a fingerprint of our templates, static assets, and translations.
+
+    As with `assets.hashed_static`, we compute this at most once per worker
+    deploy.
+    """
+    h = hashlib.sha1()
+    for root in ASSET_DIRS:
+        for path in sorted(root.rglob("*")):
+            if path.is_file():
+                h.update(str(path.relative_to(AMBUDA_DIR)).encode())
+                h.update(path.read_bytes())
+    return h.hexdigest()[:12]
+
+
+def make_etag(*parts) -> str:
+    """Create an ETag for the current request.
+
+    :param parts: anything else the response depends on, such as the XML
+        rules version, content versions, and route parameters. We also add
+        the route itself.
+    """
+    user_id = current_user.get_id() if current_user.is_authenticated else ""
+    key = [
+        asset_version(),
+        request.path,
+        str(get_locale()),
+        user_id or "",
+        *(str(p) for p in parts),
+    ]
+    return hashlib.sha1("\0".join(key).encode()).hexdigest()
+
+
+def is_fresh(etag: str) -> bool:
+    """Return whether the client already has the response for `etag`."""
+    return request.if_none_match.contains(etag)
+
+
+def with_etag(rv, etag: str) -> Response:
+    """Attach `etag` to the given view return value.
+
+    Since our ETags depend on the user's session, we also mark the response as
+    varying by cookie and require caches to revalidate it.
+    """
+    resp = make_response(rv)
+    resp.set_etag(etag)
+    resp.vary.add("Cookie")
+    resp.cache_control.no_cache = True
+    return resp
+
+
+def not_modified(etag: str) -> Response:
+    """Return an empty 304 response for `etag`."""
+    return with_etag(Response(status=304), etag)
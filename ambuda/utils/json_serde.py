@@ -1,12 +1,86 @@
+"""JSON serialization for our API responses and page payloads.
+
+Our reader payloads are trees of small dataclasses (see
+`ambuda.views.reader.schema`). `dataclasses.asdict` deep-copies the entire
+tree before the encoder even starts, so we serialize dataclasses directly
+instead: with orjson if it's installed, and otherwise with the standard
+library and a `default` hook that returns each dataclass's fields without
+copying its children.
+"""
+
 import dataclasses
+import functools
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#: orjson serializes datetimes as ISO 8601, but Flask uses HTTP dates. Pass
+#: them to `_default` so that both paths agree.
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+)
+
+_COMPACT = (",", ":")
+
+
+@functools.cache
+def _field_names(cls) -> tuple[str, ...]:
+    return tuple(f.name for f in dataclasses.fields(cls))
+
+
+def _default(o):
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        # A shallow dict: the encoder visits the field values itself.
+        return {name: getattr(o, name) for name in _field_names(type(o))}
+    return DefaultJSONProvider.default(o)
+
+
+def _orjson_option(kwargs) -> int | None:
+    """Return the orjson option that matches the `json.dumps` `kwargs`, if any.
+
+    Flask passes either `indent=2` or compact `separators`, plus `sort_keys`,
+    and orjson supports all of these.
+    """
+    kwargs = dict(kwargs)
+    option = _ORJSON_OPTIONS
+    if kwargs.pop("sort_keys", False):
+        # orjson writes dataclass fields in definition order even with
+        # OPT_SORT_KEYS, so pass dataclasses to `_default` as dicts.
+        option |= orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+    if kwargs == {"indent": 2}:
+        return option | orjson.OPT_INDENT_2
+    if kwargs in ({}, {"separators": _COMPACT}):
+        return option
+    return None
+
+
+def dumps(obj, **kwargs) -> str:
+    """Serialize `obj`, which may contain dataclasses, to a JSON string.
+
+    Output is compact and not ASCII-escaped. Any `kwargs` (e.g. `indent`) are
+    passed to `json.dumps`, or to orjson if it supports them.
+    """
+    option = _orjson_option(kwargs) if orjson is not None else None
+    if option is not None:
+        return orjson.dumps(obj, default=_default, option=option).decode()
+
+    kwargs.setdefault("default", _default)
+    kwargs.setdefault("ensure_ascii", False)
+    if kwargs.get("indent") is None:
+        kwargs.setdefault("separators", _COMPACT)
+    return json.dumps(obj, **kwargs)
 
-from json import JSONEncoder
 
+class AmbudaJSONProvider(DefaultJSONProvider):
+    """Serialize `jsonify` responses with `dumps`."""
 
-class AmbudaJSONEncoder(JSONEncoder):
-    """Extend Flask's default encoder to support dataclasses."""
+    ensure_ascii = False
 
-    def default(self, o):
-        if dataclasses.is_dataclass(o):
-            return dataclasses.asdict(o)
-        return super().default(o)
+    def dumps(self, obj, **kwargs) -> str:
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return dumps(obj, **kwargs)
@@ -0,0 +1,64 @@
+"""Cached transliteration.
+
+We transliterate the same short strings over and over: text titles, section
+titles, dictionary headwords, and the Sanskrit spans in our XML. So instead of
+calling `vidyut.lipi` directly, code should call `transliterate` here, which
+keeps recent results in a bounded LRU cache.
+
+To check whether the cache is the right size, use `cache_stats`.
+"""
+
+import functools
+
+from vidyut.lipi import Scheme, detect
+from vidyut.lipi import transliterate as _transliterate
+
+#: The maximum number of results to cache. Most cached strings are short, so
+#: even a full cache uses only a few megabytes.
+CACHE_SIZE = 50_000
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def transliterate(text: str, source: Scheme, target: Scheme) -> str:
+    """Transliterate `text` from `source` to `target`, with caching."""
+    return _transliterate(text, source, target)
+
+
+def to_slp1(text: str) -> str:
+    """Transliterate `text` from the scheme it seems to use to SLP1.
+
+    This suits user input such as search queries. If we can't detect a scheme,
+    we return `text` unchanged.
+    """
+    scheme = detect(text)
+    if scheme is None:
+        return text
+    return transliterate(text, scheme, Scheme.Slp1)
+
+
+def slp1_to_devanagari(text: str) -> str:
+    return transliterate(text, Scheme.Slp1, Scheme.Devanagari)
+
+
+def hk_to_devanagari(text: str) -> str:
+    return transliterate(text, Scheme.HarvardKyoto, Scheme.Devanagari)
+
+
+def hk_to_iast(text: str) -> str:
+    return transliterate(text, Scheme.HarvardKyoto, Scheme.Iast)
+
+
+def cache_stats() -> dict[str, int]:
+    """Return the hit and miss counts and the size of the cache."""
+    info = transliterate.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
+
+
+def clear_cache():
+    """Clear the cache and reset its stats."""
+    transliterate.cache_clear()
@@ -0,0 +1,128 @@
+"""A per-worker LRU cache of dictionary lookup results.
+
+Dictionary traffic follows a power law: a few hundred headwords make up most
+lookups. So we keep recent results in memory and skip the database entirely
+for popular words.
+
+Each result is keyed by its sources, its lookup keys, and the content version
+of each source, so a reseeded dictionary never serves stale results. The cache
+is bounded by the approximate memory used by the results it holds
+(`DICTIONARY_CACHE_BYTES` in our config). To check whether that bound is right,
+use `cache_stats`.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from flask import current_app
+
+#: A lookup result: the HTML of each entry, by source slug.
+Result = dict[str, list[str]]
+
+
+def result_size(result: Result) -> int:
+    """Estimate the memory used by a result, in bytes.
+
+    We count each string and container with `sys.getsizeof`, which accounts for
+    Python's per-character storage: HTML with Devanagari uses 2 or 4 bytes per
+    character, not 1. We don't count shared objects like the source slugs.
+    """
+    size = sys.getsizeof(result)
+    for htmls in result.values():
+        size += sys.getsizeof(htmls) + sum(sys.getsizeof(html) for html in htmls)
+    return size
+
+
+class LRUCache:
+    """A thread-safe LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[object], int]):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        """Return the value for `key`, or None if it's not cached."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.num_bytes -= old[1]
+            self._data[key] = (value, size)
+            self.num_bytes += size
+            while self.num_bytes > self.max_bytes:
+                _, (_, old_size) = self._data.popitem(last=False)
+                self.num_bytes -= old_size
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "bytes": self.num_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache: LRUCache | None = None
+
+
+def get_cache() -> LRUCache:
+    """Get the cache, creating it with the app's config if necessary."""
+    global _cache
+    if _cache is None:
+        max_bytes = current_app.config["DICTIONARY_CACHE_BYTES"]
+        _cache = LRUCache(max_bytes, result_size)
+    return _cache
+
+
+def make_key(
+    sources: list[str], keys: list[str], versions: dict[str, int], html_version: str
+) -> tuple:
+    """Create a cache key for a lookup.
+
+    :param sources: the slugs of the dictionaries to search.
+    :param keys: the SLP1 keys to look up.
+    :param versions: the content version of each dictionary, by slug.
+    :param html_version: the version of our entry HTML.
+    """
+    sources = sorted(sources)
+    return (
+        tuple(sources),
+        tuple(sorted(set(keys))),
+        tuple(versions.get(s) for s in sources),
+        html_version,
+    )
+
+
+def cache_stats() -> dict[str, int]:
+    """Return the hit, miss, and eviction counts and the size of the cache."""
+    return get_cache().stats()
+
+
+def clear():
+    """Clear the cache and reset its stats."""
+    global _cache
+    _cache = None
@@ -0,0 +1,266 @@
+"""English-to-Sanskrit search over our dictionary definitions.
+
+To find the Sanskrit word for an English concept, we search the definitions in
+our Sanskrit-English dictionaries. When we index a dictionary, we extract the
+plain English text of each entry (see `gloss_text`) and store it in an SQLite
+FTS5 table (`dictionary_gloss_search`), along with the entry's key. So a search
+reads only the index and never touches the entries themselves.
+
+FTS5 ranks matches with BM25, which favors entries where the query terms make
+up more of a short definition. In practice, this puts the entries whose main
+sense matches the query first. (For very broad queries, see `RANK_LIMIT`.)
+
+As in `ambuda.utils.search`, the index is updated incrementally: we re-index a
+dictionary only if its content version (`Dictionary.version`) differs from the
+version we last indexed. Seeding a dictionary indexes it, and to update the
+index for existing dictionaries, run `./cli.py build-reverse-index`.
+"""
+
+import html
+import logging
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import lipi
+
+#: Dictionaries whose definitions are in English.
+GLOSS_DICTIONARIES = ["mw", "apte"]
+
+#: The number of entries we insert at a time.
+BATCH_SIZE = 1000
+#: Ranking costs a few microseconds per match, so as in `ambuda.utils.search`,
+#: we rank only queries with fewer matches than this. Broader queries (e.g.
+#: "the") return matches in dictionary order.
+RANK_LIMIT = 20_000
+
+#: Elements whose text isn't part of an English definition: Sanskrit text,
+#: headword data, grammatical labels, abbreviations, and citations.
+_SKIP_TAGS = {
+    "h",
+    "tail",
+    "s",
+    "s1",
+    "lex",
+    "vlex",
+    "ab",
+    "ls",
+    "etym",
+    "hom",
+    "info",
+    "pc",
+    "pb",
+    "lbinfo",
+}
+
+#: Snippet markers. We add our HTML markup only after escaping the snippet.
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+
+_INSERT = text(
+    "INSERT INTO dictionary_gloss_search (rowid, gloss, key, dictionary_id) "
+    "VALUES (:id, :gloss, :key, :dictionary_id)"
+)
+_DELETE = text(
+    "DELETE FROM dictionary_gloss_search "
+    "WHERE dictionary_gloss_search MATCH 'dictionary_id : ' || :dictionary_id"
+)
+#: We rank by the definition alone. (`dictionary_id` is indexed only so that
+#: the query can filter on it.)
+_SEARCH = """
+SELECT dictionary_id, key,
+    snippet(dictionary_gloss_search, 0, char(2), char(3), '…', 16)
+FROM dictionary_gloss_search
+WHERE dictionary_gloss_search MATCH :query
+{order_by}
+LIMIT :limit
+"""
+_COUNT = """
+SELECT count(*) FROM (
+    SELECT rowid FROM dictionary_gloss_search
+    WHERE dictionary_gloss_search MATCH :query
+    LIMIT :rank_limit
+)
+"""
+
+
+@dataclass
+class IndexResult:
+    #: The number of dictionaries that we (re-)indexed.
+    num_dictionaries: int = 0
+    #: The number of entries that we indexed.
+    num_entries: int = 0
+    #: The number of dictionaries that were already up to date.
+    num_skipped: int = 0
+
+
+@dataclass
+class ReverseResult:
+    dictionary_slug: str
+    #: The entry's key in SLP1.
+    key: str
+    #: The entry's key in Devanagari.
+    text: str
+    #: An HTML excerpt of the entry's definition, with matches in <mark>.
+    snippet: str
+
+
+def gloss_text(blob: str) -> str:
+    """Extract the plain English text of an entry's definitions."""
+    try:
+        root = ET.fromstring(blob)
+    except ET.ParseError:
+        return ""
+    body = root.find(".//body")
+    if body is None:
+        body = root
+
+    parts = []
+
+    def walk(el):
+        if el.tag not in _SKIP_TAGS:
+            if el.text:
+                parts.append(el.text)
+            for child in el:
+                walk(child)
+        # The tail follows the element, so it's part of the parent's text.
+        if el.tail:
+            parts.append(el.tail)
+
+    walk(body)
+    # The body's own tail is outside of the body.
+    if body.tail:
+        parts.pop()
+    plain = " ".join("".join(parts).split())
+    # Tidy up punctuation left behind by the text we skipped.
+    plain = re.sub(r"\(\s*\)", "", plain)
+    plain = re.sub(r"\s*([;,])(\s*[;,])+", r"\1", plain)
+    plain = re.sub(r"\s+([;,.])", r"\1", plain)
+    return plain.strip(" ;,")
+
+
+def _index_dictionary(engine, dictionary_id: int, version: int) -> int:
+    """(Re-)index one dictionary in its own transaction."""
+    e = db.DictionaryEntry
+    stmt = select(e.id, e.key, e.value).filter_by(dictionary_id=dictionary_id)
+    num_entries = 0
+    with engine.begin() as conn:
+        conn.execute(_DELETE, {"dictionary_id": dictionary_id})
+
+        rows = conn.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+        for batch in rows.partitions():
+            params = []
+            for id, key, value in batch:
+                if gloss := gloss_text(value):
+                    params.append(
+                        {
+                            "id": id,
+                            "gloss": gloss,
+                            "key": key,
+                            "dictionary_id": dictionary_id,
+                        }
+                    )
+            if params:
+                conn.execute(_INSERT, params)
+            num_entries += len(params)
+
+        conn.execute(
+            insert(db.GlossIndexedDictionary)
+            .values(dictionary_id=dictionary_id, version=version)
+            .on_conflict_do_update(
+                index_elements=["dictionary_id"], set_={"version": version}
+            )
+        )
+    return num_entries
+
+
+def update_index(
+    engine, slugs: list[str] | None = None, force: bool = False
+) -> IndexResult:
+    """Index every English dictionary whose content changed since we last
+    indexed it, and remove deleted dictionaries from the index.
+
+    :param slugs: the dictionaries to index. If not set, index every
+        dictionary in `GLOSS_DICTIONARIES` and remove all others from the
+        index.
+    :param force: if true, re-index even dictionaries that are up to date.
+    """
+    d = db.Dictionary
+    g = db.GlossIndexedDictionary
+    with engine.connect() as conn:
+        all_dictionaries = conn.execute(select(d.id, d.slug, d.version)).all()
+        indexed = dict(conn.execute(select(g.dictionary_id, g.version)).all())
+    wanted = set(slugs or GLOSS_DICTIONARIES)
+    dictionaries = [row for row in all_dictionaries if row.slug in wanted]
+
+    result = IndexResult()
+    for dictionary_id, slug, version in dictionaries:
+        if not force and indexed.get(dictionary_id) == version:
+            result.num_skipped += 1
+            continue
+        result.num_entries += _index_dictionary(engine, dictionary_id, version)
+        result.num_dictionaries += 1
+        logging.info(f"Indexed definitions in {slug}")
+
+    # Reseeding a dictionary creates a new one, so this also removes stale
+    # copies of the dictionaries we just indexed.
+    keep = {row.id for row in (dictionaries if not slugs else all_dictionaries)}
+    removed = set(indexed) - keep
+    if removed:
+        with engine.begin() as conn:
+            for dictionary_id in removed:
+                conn.execute(_DELETE, {"dictionary_id": dictionary_id})
+            conn.execute(delete(g).where(g.dictionary_id.in_(removed)))
+    return result
+
+
+def _snippet_to_html(snippet: str) -> str:
+    return (
+        html.escape(snippet)
+        .replace(_MATCH_START, "<mark>")
+        .replace(_MATCH_END, "</mark>")
+    )
+
+
+def search(
+    query: str, dictionaries: dict[int, str], limit: int = 20
+) -> list[ReverseResult]:
+    """Find entries whose definitions match an English query, best first.
+
+    :param query: English words. We match entries that contain every word.
+    :param dictionaries: the dictionaries to search. Maps each dictionary's ID
+        to its slug.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return []
+
+    # Quote each word so that FTS5 doesn't parse it as query syntax. IDs are
+    # ints, so they're safe to inline.
+    terms = " ".join(f'"{w}"' for w in words)
+    ids = " OR ".join(str(int(id)) for id in dictionaries)
+    match = f"gloss : ({terms}) AND dictionary_id : ({ids})"
+    params = {"query": match, "limit": limit, "rank_limit": RANK_LIMIT}
+
+    session = q.get_session()
+    num_matches = session.scalar(text(_COUNT), params)
+    if num_matches < RANK_LIMIT:
+        order_by = "ORDER BY bm25(dictionary_gloss_search, 1.0, 0.0, 0.0)"
+    else:
+        order_by = ""
+    stmt = text(_SEARCH.format(order_by=order_by))
+    rows = session.execute(stmt, params)
+    return [
+        ReverseResult(
+            dictionary_slug=dictionaries[dictionary_id],
+            key=key,
+            text=lipi.slp1_to_devanagari(key),
+            snippet=_snippet_to_html(snippet),
+        )
+        for dictionary_id, key, snippet in rows
+    ]
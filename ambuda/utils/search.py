@@ -0,0 +1,323 @@
+"""Full-text search over every block in our library.
+
+We index the plain text of each `TextBlock` in an SQLite FTS5 table
+(`text_block_search`). Texts use various scripts, and readers search in various
+scripts, so we normalize both the index and the query to SLP1.
+
+The index is updated incrementally: `update_index` re-indexes a text only if
+its content version (`Text.version`) differs from the version we last indexed.
+To build or update the index, run `./cli.py build-search-index`.
+
+Alongside the full-text index, we store a key for every line of every block
+(`text_block_keys`) so that we can find a verse despite differences in sandhi
+and spelling. For details, see `ambuda.utils.block_keys`.
+"""
+
+import html
+import logging
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.sqlite import insert
+from vidyut.lipi import Scheme, transliterate
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import block_keys, lipi
+
+#: The number of blocks we insert at a time.
+BATCH_SIZE = 1000
+#: The trigram tokenizer can't match anything shorter than this.
+MIN_TERM_LENGTH = 3
+#: Ranking costs a few microseconds per match, so we rank only queries with
+#: fewer matches than this. Broader queries return matches in library order.
+RANK_LIMIT = 10_000
+#: Line keys shorter than this match too many lines to search by prefix.
+MIN_KEY_PREFIX_LENGTH = 8
+#: Snippet markers. We add our HTML markup only after transliterating and
+#: escaping the snippet.
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
+
+_INSERT = text(
+    "INSERT INTO text_block_search (rowid, slp1, text_id) VALUES (:id, :slp1, :text_id)"
+)
+_DELETE = text("DELETE FROM text_block_search WHERE text_block_search MATCH :query")
+#: We rank by the block text alone. (`text_id` is indexed only so that the
+#: query can filter on it.)
+_SEARCH = """
+SELECT t.slug, s.slug, b.slug,
+    snippet(text_block_search, 0, char(2), char(3), '…', 32)
+FROM text_block_search
+JOIN text_blocks b ON b.id = text_block_search.rowid
+JOIN text_sections s ON s.id = b.section_id
+JOIN texts t ON t.id = b.text_id
+WHERE text_block_search MATCH :query
+{order_by}
+LIMIT :limit
+"""
+#: We fetch the block text with a subquery because SQLite scans the FTS5 table
+#: if we join it instead.
+_SEARCH_LINES = """
+SELECT DISTINCT t.slug, s.slug, b.slug,
+    (SELECT slp1 FROM text_block_search WHERE rowid = b.id), b.id
+FROM text_block_keys k
+JOIN text_blocks b ON b.id = k.block_id
+JOIN text_sections s ON s.id = b.section_id
+JOIN texts t ON t.id = b.text_id
+WHERE {match} {where}
+ORDER BY b.id
+LIMIT :limit
+"""
+_COUNT = """
+SELECT count(*) FROM (
+    SELECT rowid FROM text_block_search
+    WHERE text_block_search MATCH :query
+    LIMIT :rank_limit
+)
+"""
+
+
+@dataclass
+class IndexResult:
+    #: The number of texts that we (re-)indexed.
+    num_texts: int = 0
+    #: The number of blocks that we indexed.
+    num_blocks: int = 0
+    #: The number of texts that were already up to date.
+    num_skipped: int = 0
+
+
+@dataclass
+class SearchResult:
+    text_slug: str
+    section_slug: str
+    block_slug: str
+    #: An HTML excerpt of the block in Devanagari, with matches in <mark>.
+    snippet: str
+
+
+def block_to_slp1(blob: str) -> str:
+    """Extract a block's plain text and transliterate it to SLP1."""
+    try:
+        parts = ET.fromstring(blob).itertext()
+    except ET.ParseError:
+        parts = re.split(r"<[^>]*>", blob)
+    plain = " ".join(" ".join(parts).split())
+    # Each block is different, so skip the transliteration cache in `lipi`.
+    # Latin text (including any SLP1) passes through unchanged.
+    return transliterate(plain, Scheme.Devanagari, Scheme.Slp1)
+
+
+def query_to_slp1(query: str) -> list[str]:
+    """Split a query in any script into SLP1 terms that we can search for."""
+    query = query.strip()
+    if not query:
+        return []
+    slp1 = lipi.to_slp1(query)
+    return [t for t in slp1.split() if len(t) >= MIN_TERM_LENGTH]
+
+
+def _text_key(text_id: int) -> str:
+    """Return the value we index for `text_id`."""
+    return f"<{int(text_id)}>"
+
+
+def _text_filter(text_id: int) -> str:
+    """Return a query that matches every block in `text_id`.
+
+    The trigram tokenizer matches substrings, so the delimiters in each key
+    ensure that "<12>" doesn't match "<123>".
+    """
+    return f'text_id : "{_text_key(text_id)}"'
+
+
+def _index_text(engine, text_id: int, version: int) -> int:
+    """(Re-)index one text in its own transaction."""
+    stmt = select(db.TextBlock.id, db.TextBlock.xml).filter_by(text_id=text_id)
+    delete_keys = delete(db.TextBlockKey).filter_by(text_id=text_id)
+    text_key = _text_key(text_id)
+    num_blocks = 0
+    with engine.begin() as conn:
+        conn.execute(_DELETE, {"query": _text_filter(text_id)})
+        conn.execute(delete_keys)
+
+        rows = conn.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+        for batch in rows.partitions():
+            params = [
+                {"id": id, "slp1": block_to_slp1(xml), "text_id": text_key}
+                for id, xml in batch
+            ]
+            conn.execute(_INSERT, params)
+            keys = [
+                {"text_id": text_id, "block_id": id, "key": key}
+                for id, xml in batch
+                for key in block_keys.line_keys(xml)
+            ]
+            if keys:
+                conn.execute(insert(db.TextBlockKey), keys)
+            num_blocks += len(params)
+
+        conn.execute(
+            insert(db.SearchIndexedText)
+            .values(text_id=text_id, version=version)
+            .on_conflict_do_update(
+                index_elements=["text_id"], set_={"version": version}
+            )
+        )
+    return num_blocks
+
+
+def update_index(
+    engine, text_slugs: list[str] | None = None, force: bool = False
+) -> IndexResult:
+    """Index every text whose content changed since we last indexed it.
+
+    :param text_slugs: the texts to index. If not set, index all texts and
+        remove texts that no longer exist.
+    :param force: if true, re-index even texts that are up to date.
+    """
+    with engine.connect() as conn:
+        stmt = select(db.Text.id, db.Text.slug, db.Text.version)
+        if text_slugs:
+            stmt = stmt.where(db.Text.slug.in_(text_slugs))
+        texts = conn.execute(stmt).all()
+        stmt = select(db.SearchIndexedText.text_id, db.SearchIndexedText.version)
+        indexed = dict(conn.execute(stmt).all())
+
+    result = IndexResult()
+    for text_id, slug, version in texts:
+        if not force and indexed.get(text_id) == version:
+            result.num_skipped += 1
+            continue
+        result.num_blocks += _index_text(engine, text_id, version)
+        result.num_texts += 1
+        logging.info(f"Indexed {slug}")
+
+    if not text_slugs:
+        removed = set(indexed) - {text_id for text_id, _, _ in texts}
+        with engine.begin() as conn:
+            for text_id in removed:
+                conn.execute(_DELETE, {"query": _text_filter(text_id)})
+            conn.execute(
+                delete(db.TextBlockKey).where(db.TextBlockKey.text_id.in_(removed))
+            )
+            conn.execute(
+                delete(db.SearchIndexedText).where(
+                    db.SearchIndexedText.text_id.in_(removed)
+                )
+            )
+    return result
+
+
+#: SLP1 letters, for widening matches to whole aksharas.
+_CONSONANTS = "kKgGNcCjJYwWqQRtTdDnpPbBmyrlvSzshL"
+_VOWELS = "aAiIuUfFxXeEoO"
+_MARKS = "MH~"
+#: A match that starts after a consonant cluster starts at the cluster.
+_WIDEN_START = re.compile(f"([{_CONSONANTS}]+){_MATCH_START}")
+#: A match that ends on a consonant ends after the rest of its akshara.
+_WIDEN_END = re.compile(
+    f"(?<=[{_CONSONANTS}]){_MATCH_END}([{_CONSONANTS}]*[{_VOWELS}]?[{_MARKS}]*)"
+)
+#: A match that ends on a vowel ends after any anusvara or visarga.
+_WIDEN_MARKS = re.compile(f"{_MATCH_END}([{_MARKS}]+)")
+
+
+def _snippet_to_html(snippet: str) -> str:
+    # Trigrams don't respect syllables, so a match can start or end within an
+    # akshara. Widen each match to whole aksharas so that it renders cleanly.
+    snippet = _WIDEN_START.sub(f"{_MATCH_START}\\1", snippet)
+    snippet = _WIDEN_END.sub(f"\\1{_MATCH_END}", snippet)
+    snippet = _WIDEN_MARKS.sub(f"\\1{_MATCH_END}", snippet)
+    devanagari = transliterate(snippet, Scheme.Slp1, Scheme.Devanagari)
+    return (
+        html.escape(devanagari)
+        .replace(_MATCH_START, "<mark>")
+        .replace(_MATCH_END, "</mark>")
+    )
+
+
+def search(
+    query: str, text_id: int | None = None, limit: int = 20
+) -> list[SearchResult]:
+    """Search all indexed blocks, best matches first (see `RANK_LIMIT`).
+
+    :param query: the query in any script. We match blocks that contain every
+        term in the query, where each term has at least `MIN_TERM_LENGTH`
+        characters.
+    :param text_id: if set, search only this text.
+    """
+    terms = query_to_slp1(query)
+    if not terms:
+        return []
+
+    # Quote each term so that FTS5 doesn't parse it as query syntax.
+    match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    match = f"slp1 : ({match})"
+    if text_id is not None:
+        # Filter within the query so that `RANK_LIMIT` counts only this text.
+        match += f" AND {_text_filter(text_id)}"
+    params = {"query": match, "limit": limit, "rank_limit": RANK_LIMIT}
+
+    session = q.get_session()
+    num_matches = session.scalar(text(_COUNT), params)
+    if num_matches < RANK_LIMIT:
+        order_by = "ORDER BY bm25(text_block_search, 1.0, 0.0)"
+    else:
+        order_by = ""
+    stmt = text(_SEARCH.format(order_by=order_by))
+    rows = session.execute(stmt, params)
+    return [
+        SearchResult(
+            text_slug=text_slug,
+            section_slug=section_slug,
+            block_slug=block_slug,
+            snippet=_snippet_to_html(snippet),
+        )
+        for text_slug, section_slug, block_slug, snippet in rows
+    ]
+
+
+def search_lines(
+    query: str, text_id: int | None = None, limit: int = 20
+) -> list[SearchResult]:
+    """Find blocks with a line that matches the query, in library order.
+
+    Unlike `search`, this ignores differences in sandhi and spelling (see
+    `ambuda.utils.block_keys`), but it matches only from the start of a line.
+
+    :param query: a line, or the start of a line, in any script. If the query
+        has at least `MIN_KEY_PREFIX_LENGTH` key characters, we also match
+        lines that start with it.
+    :param text_id: if set, search only this text.
+    """
+    key = block_keys.query_key(query)
+    if not key:
+        return []
+
+    params = {"key": key, "limit": limit}
+    if len(key) >= MIN_KEY_PREFIX_LENGTH:
+        # Keys contain only ASCII letters, so "~" sorts after every key that
+        # starts with `key`. This lets SQLite use the index on `key`.
+        match = "k.key >= :key AND k.key < :key || '~'"
+    else:
+        match = "k.key = :key"
+    where = ""
+    if text_id is not None:
+        where = "AND k.text_id = :text_id"
+        params["text_id"] = text_id
+
+    stmt = text(_SEARCH_LINES.format(match=match, where=where))
+    rows = q.get_session().execute(stmt, params)
+    return [
+        SearchResult(
+            text_slug=text_slug,
+            section_slug=section_slug,
+            block_slug=block_slug,
+            snippet=_snippet_to_html(slp1),
+        )
+        for text_slug, section_slug, block_slug, slp1, _ in rows
+    ]
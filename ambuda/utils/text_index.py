@@ -0,0 +1,107 @@
+"""A per-worker cache of each text's section structure.
+
+Every reader request needs a text's ordered list of sections: to find the
+previous and next sections, to group sections on the text's title page, and so
+on. Large texts have thousands of sections, so instead of loading and scanning
+them on every request, we keep a small index for each text in memory.
+
+An index is tagged with the text's content version (`Text.version`). If the
+text has a newer version, we rebuild the index on the next request.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+import ambuda.database as db
+import ambuda.queries as q
+
+
+@dataclass(frozen=True)
+class SectionMeta:
+    """Just enough data about a section to link to it."""
+
+    id: int
+    slug: str
+    title: str
+
+
+@dataclass
+class TextIndex:
+    #: The content version of the text this index was built from.
+    version: int
+    #: The text's sections, in order.
+    sections: list[SectionMeta]
+    #: Maps a section's slug to its position in `sections`.
+    positions: dict[str, int]
+    #: Sections grouped by the prefix of their slug (see `group_sections`).
+    groups: dict[str, list[SectionMeta]]
+
+    def prev_cur_next(
+        self, slug: str
+    ) -> tuple[SectionMeta | None, SectionMeta, SectionMeta | None]:
+        """Get the previous, current, and next sections.
+
+        :param slug: the slug for the current section.
+        :raises ValueError: if no section has this slug.
+        """
+        try:
+            i = self.positions[slug]
+        except KeyError:
+            raise ValueError(f"Unknown slug {slug}") from None
+
+        sections = self.sections
+        prev = sections[i - 1] if i > 0 else None
+        next = sections[i + 1] if i < len(sections) - 1 else None
+        return prev, sections[i], next
+
+
+def group_sections(sections: list[SectionMeta]) -> dict[str, list[SectionMeta]]:
+    """Groups section hierarchically according to their slug.
+
+    For example, the sections `[1.1, 1.2, 2.1, 2.2]` will be grouped as::
+
+        { "1": [1.1, 1.2], "2": [2.1, 2.2] }
+    """
+    grouper = {}
+    for s in sections:
+        key, _, _ = s.slug.rpartition(".")
+        if key not in grouper:
+            grouper[key] = []
+        grouper[key].append(s)
+    return grouper
+
+
+def _build(text_id: int, version: int) -> TextIndex:
+    session = q.get_session()
+    stmt = (
+        select(db.TextSection.id, db.TextSection.slug, db.TextSection.title)
+        .filter_by(text_id=text_id)
+        .order_by(db.TextSection.id)
+    )
+    sections = [SectionMeta(*row) for row in session.execute(stmt)]
+    return TextIndex(
+        version=version,
+        sections=sections,
+        positions={s.slug: i for i, s in enumerate(sections)},
+        groups=group_sections(sections),
+    )
+
+
+#: Maps a text ID to its index.
+_cache: dict[int, TextIndex] = {}
+
+
+def get(text: db.Text) -> TextIndex:
+    """Get the index for the given text, building it if necessary."""
+    index = _cache.get(text.id)
+    if index is None or index.version != text.version:
+        # We read `text.version` before we read the sections, so at worst we
+        # store newer sections with an older version and rebuild next time.
+        index = _cache[text.id] = _build(text.id, text.version)
+    return index
+
+
+def clear():
+    """Clear all cached indices."""
+    _cache.clear()
@@ -19,17 +19,33 @@ document, so we handle them with different functions.
 
 Performance
 -----------
-In Python 3, `ElementTree` uses the C implementation by default, so the
-performance penalty for this work is minimal. In the future, we can also cache
-or pre-build common requests.
+We have two equivalent engines for applying our rules. `transform` edits an
+`ElementTree` in place then serializes it, which is simple but makes three
+passes over the document. `stream_transform` instead writes HTML directly from
+the parser's events in a single pass, and it's what we use at serving time. Both
+engines must produce byte-identical output; the unit tests check this, and
+`ambuda.scripts.benchmarks.xml_engines` compares them on real data.
+
+To render many blobs at once (e.g. all blocks in a reader section), use
+`stream_transform_batch`, which parses the whole batch with one parser.
+`ambuda.scripts.benchmarks.section_render` times it against the other engines.
+
+For text blocks, we also cache rendered HTML in the database (see
+`ambuda.utils.block_cache`). That cache is keyed on a fingerprint of our
+transform rules (see `rules_version`) so that it invalidates itself whenever
+those rules change.
 """
 
+import hashlib
 from collections.abc import Callable
 from dataclasses import dataclass
 from typing import NewType
 from xml.etree import ElementTree as ET
+from xml.parsers import expat
 
-from indic_transliteration import sanscript
+import vidyut
+
+from ambuda.utils import lipi
 
 Attributes = NewType("Attributes", dict[str, str])
 
@@ -100,17 +116,21 @@ def text(before="", after="") -> Rule:
     return Rule(None, _overwrite({}), before, after)
 
 
+def _slp1_to_devanagari(s: str) -> str:
+    return lipi.slp1_to_devanagari(s)
+
+
 def sanskrit_text(xml: ET.Element):
     """Transliterate inline elements in-place."""
-    t = sanscript.transliterate
+    t = _slp1_to_devanagari
     xml.tag = "span"
     xml.attrib = {"lang": "sa"}
     for el in xml.iter("*"):
         if el.text:
-            el.text = t(el.text, sanscript.SLP1, sanscript.DEVANAGARI)
+            el.text = t(el.text)
         # Ignore xml.tail
         if el.tail and el is not xml:
-            el.tail = t(el.tail, sanscript.SLP1, sanscript.DEVANAGARI)
+            el.tail = t(el.tail)
 
 
 #: Wrap in parentheses.
@@ -305,34 +325,481 @@ def transform(xml: ET.Element, transforms: dict[str, Rule]) -> str:
     return ET.tostring(xml, encoding="utf-8").decode("utf-8")
 
 
+class _UnsupportedError(Exception):
+    """Raised if `stream_transform` can't exactly reproduce `transform`."""
+
+
+#: The prefix ElementTree uses for names in the `xml:` namespace.
+_XML_NS = "{http://www.w3.org/XML/1998/namespace}"
+#: The code shared by every attribute function that `_overwrite` creates.
+_OVERWRITE_CODE = _overwrite({}).__code__
+
+# How `_StreamingTransform` handles a given tag.
+_KEEP = 0
+_RULE = 1
+_SANSKRIT = 2
+_DROP = 3
+_DELETE = 4
+
+#: Marks the tail of a deleted element, which we never write.
+_DELETED = object()
+
+
+def _open_tag(tag: str, attrib: Attributes) -> str:
+    """Serialize a start tag (without its closing `>`) as ElementTree would."""
+    buf = ["<", tag]
+    for k, v in attrib.items():
+        if k.startswith(_XML_NS):
+            k = "xml:" + k[len(_XML_NS) :]
+        elif k.startswith("{"):
+            # Other namespaces need `xmlns` declarations on the root element,
+            # which we've already written.
+            raise _UnsupportedError(k)
+        buf.append(f' {k}="{ET._escape_attrib(v)}"')
+    return "".join(buf)
+
+
+def _make_plan(name: str, transforms: dict[str, Rule]) -> tuple:
+    """Decide ahead of time how to handle elements with the given tag.
+
+    :return: a tuple `(kind, rule, open_tag, close_tag)`. If `open_tag` is
+        `None` but `close_tag` is set, the start tag depends on the element's
+        attributes.
+    """
+    if "}" in name:
+        # Namespaced tags need `xmlns` declarations and don't match any rules.
+        raise _UnsupportedError(name)
+    if name not in transforms:
+        return (_KEEP, None, None, f"</{name}>")
+
+    fn = transforms[name]
+    if fn is None:
+        return (_DROP, None, None, None)
+    if fn is _delete:
+        return (_DELETE, None, None, None)
+    if fn is sanskrit_text:
+        return (_SANSKRIT, None, _open_tag("span", {"lang": "sa"}), "</span>")
+    if isinstance(fn, Rule):
+        if fn.tag is None:
+            return (_RULE, fn, None, None)
+        open_tag = None
+        if getattr(fn.attrib_fn, "__code__", None) is _OVERWRITE_CODE:
+            open_tag = _open_tag(fn.tag, fn.attrib_fn({}))
+        return (_RULE, fn, open_tag, f"</{fn.tag}>")
+    raise _UnsupportedError(fn)
+
+
+#: Plans for each rule table we've seen, keyed by `id(transforms)`. We also
+#: keep a reference to each table so that its `id` can't be reused.
+_plan_cache: dict[int, tuple[dict, dict]] = {}
+
+
+def _get_plans(transforms: dict[str, Rule]) -> dict[str, tuple]:
+    try:
+        return _plan_cache[id(transforms)][1]
+    except KeyError:
+        plans = {}
+        _plan_cache[id(transforms)] = (transforms, plans)
+        return plans
+
+
+class _Frame:
+    """State for an open element.
+
+    After the element closes, its frame stays in our output as a placeholder
+    for its tail. Usually we know an element's tail as soon as we've read it.
+    But if the element is the last child of a `Rule` with `text_after`, its
+    tail is instead its *parent's* tail plus `text_after` (see
+    `Rule.__call__`), and we won't know the parent's tail until later. So, we
+    resolve all tails once the document is done.
+    """
+
+    __slots__ = (
+        "rule",
+        "open_tag",
+        "close_tag",
+        "depth",
+        "drop_text",
+        "text",
+        "has_children",
+        "tail",
+        "tail_parent",
+        "tail_suffix",
+    )
+
+    def __init__(self, rule, open_tag, close_tag, depth, drop_text):
+        #: The rule for this element, if it's a `Rule`.
+        self.rule = rule
+        #: The start of our output tag (e.g. `<span class="lex"`), if any.
+        self.open_tag = open_tag
+        #: Our closing tag (e.g. `</span>`), if any.
+        self.close_tag = close_tag
+        #: The number of times to transliterate this element's text.
+        self.depth = depth
+        #: If true, drop this element's text (but not its children or tail).
+        self.drop_text = drop_text
+        #: Raw text, which we buffer until we see a child or end tag.
+        self.text = ""
+        #: Whether this element has any child elements.
+        self.has_children = False
+        #: The tail text after this element, or its parent's frame and suffix
+        #: if the tail depends on the parent's tail.
+        self.tail = ""
+        self.tail_parent = None
+        self.tail_suffix = ""
+
+    def resolve_tail(self) -> str:
+        suffixes = []
+        frame = self
+        while frame.tail_parent is not None:
+            suffixes.append(frame.tail_suffix)
+            frame = frame.tail_parent
+        tail = frame.tail
+        if suffixes:
+            tail += "".join(reversed(suffixes))
+        return ET._escape_cdata(tail) if tail else ""
+
+
+class _StreamingTransform:
+    """Writes HTML directly from expat's parser events.
+
+    This class is a single-pass equivalent of `transform`: it applies the same
+    rules with the same quirks and produces byte-identical output, but it never
+    builds an element tree. For the few inputs it can't reproduce exactly (e.g.
+    namespaced tags), it raises `_UnsupportedError`.
+    """
+
+    def __init__(self, transforms: dict[str, Rule], transliterate: Callable):
+        self.transforms = transforms
+        self.plans = _get_plans(transforms)
+        self.transliterate = transliterate
+        self.out = []
+        self.stack = []
+        #: The number of open elements within a deleted element.
+        self.num_deleted = 0
+        #: The element whose tail we're currently reading, if any.
+        self.tail_frame = None
+        self.tail_text = ""
+
+    def run(self, blob: str | bytes) -> str:
+        parser = expat.ParserCreate(namespace_separator="}")
+        parser.buffer_text = True
+        parser.ordered_attributes = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        parser.Parse(blob, True)
+        return "".join(
+            [x if x.__class__ is str else x.resolve_tail() for x in self.out]
+        )
+
+    def _transliterate(self, text: str, depth: int) -> str:
+        for _ in range(depth):
+            text = self.transliterate(text)
+        return text
+
+    def _element_text(self, frame: _Frame) -> str | None:
+        if frame.drop_text:
+            return None
+        text = frame.text
+        if text and frame.depth:
+            text = self._transliterate(text, frame.depth)
+        rule = frame.rule
+        if rule is not None:
+            if rule.text_before:
+                text = rule.text_before + text
+            if rule.text_after and not frame.has_children:
+                text += rule.text_after
+        return text
+
+    def _write_open(self, frame: _Frame, text: str | None):
+        """Write the element's start tag and text."""
+        if frame.open_tag is None:
+            if text:
+                self.out.append(ET._escape_cdata(text))
+        elif text or frame.has_children:
+            self.out.append(frame.open_tag + ">")
+            if text:
+                self.out.append(ET._escape_cdata(text))
+        else:
+            self.out.append(frame.open_tag + " />")
+
+    def _flush_tail(self, is_last: bool):
+        """Fill in the tail of the element we most recently closed."""
+        frame = self.tail_frame
+        self.tail_frame = None
+        if frame is _DELETED:
+            return
+
+        parent = self.stack[-1]
+        rule = parent.rule
+        if is_last and rule is not None and rule.text_after:
+            frame.tail_parent = parent
+            frame.tail_suffix = rule.text_after
+        elif self.tail_text:
+            frame.tail = self._transliterate(self.tail_text, parent.depth)
+
+    def start(self, name: str, attrs: list[str]):
+        if self.num_deleted:
+            self.num_deleted += 1
+            return
+        if self.tail_frame is not None:
+            self._flush_tail(is_last=False)
+
+        stack = self.stack
+        if stack:
+            parent = stack[-1]
+            depth = parent.depth
+            if not parent.has_children:
+                parent.has_children = True
+                self._write_open(parent, self._element_text(parent))
+        else:
+            depth = 0
+
+        plan = self.plans.get(name)
+        if plan is None:
+            plan = self.plans[name] = _make_plan(name, self.transforms)
+        kind, rule, open_tag, close_tag = plan
+
+        if kind == _DELETE:
+            self.num_deleted = 1
+            return
+        if kind == _SANSKRIT:
+            depth += 1
+        elif open_tag is None and close_tag is not None and (attrs or rule):
+            # The start tag depends on this element's attributes.
+            attrib = {}
+            for i in range(0, len(attrs), 2):
+                key = attrs[i]
+                if "}" in key:
+                    key = "{" + key
+                attrib[key] = attrs[i + 1]
+            if rule is None:
+                open_tag = _open_tag(name, attrib)
+            else:
+                open_tag = _open_tag(rule.tag, rule.attrib_fn(attrib))
+        elif kind == _KEEP:
+            open_tag = "<" + name
+
+        stack.append(_Frame(rule, open_tag, close_tag, depth, kind == _DROP))
+
+    def end(self, name: str):
+        if self.num_deleted:
+            self.num_deleted -= 1
+            if not self.num_deleted:
+                self.tail_frame = _DELETED
+                self.tail_text = ""
+            return
+        if self.tail_frame is not None:
+            self._flush_tail(is_last=True)
+
+        frame = self.stack.pop()
+        out = self.out
+        if frame.has_children:
+            if frame.close_tag is not None:
+                out.append(frame.close_tag)
+        else:
+            text = self._element_text(frame)
+            self._write_open(frame, text)
+            if text and frame.close_tag is not None:
+                out.append(frame.close_tag)
+
+        out.append(frame)
+        self.tail_frame = frame
+        self.tail_text = ""
+
+    def data(self, text: str):
+        if self.num_deleted:
+            return
+        if self.tail_frame is not None:
+            self.tail_text += text
+        elif self.stack:
+            self.stack[-1].text += text
+
+
+def stream_transform(blob: str | bytes, transforms: dict[str, Rule]) -> str:
+    """Transform an XML blob in a single pass.
+
+    This function is a faster equivalent of `transform(ET.fromstring(blob))`
+    with byte-identical output. If the blob is malformed or uses features that
+    the streaming engine doesn't support, we fall back to `transform`.
+    """
+    try:
+        return _StreamingTransform(transforms, _slp1_to_devanagari).run(blob)
+    except (_UnsupportedError, expat.ExpatError):
+        return transform(ET.fromstring(blob), transforms)
+
+
+class _BatchTransform(_StreamingTransform):
+    """Transforms a batch of blobs with a single parser.
+
+    We parse all blobs as the children of one synthetic root element, and we
+    cut the output each time one of those children closes. Since adjacent
+    blobs could combine into XML that is valid even if the blobs themselves
+    aren't (e.g. `<a>` followed by `</a>`), we check that each block's element
+    starts and ends within the bytes of its own blob.
+    """
+
+    def __init__(self, transforms: dict[str, Rule], transliterate: Callable):
+        super().__init__(transforms, transliterate)
+        self.parser = None
+        #: The number of open elements, including the synthetic root.
+        self.level = 0
+        #: (start, end) byte offsets for each top-level element.
+        self.spans = []
+        self.results = []
+
+    def run_batch(self, blobs: list[bytes]) -> list[str]:
+        offsets = []
+        pos = len(b"<_>")
+        for blob in blobs:
+            offsets.append(pos)
+            pos += len(blob)
+        offsets.append(pos)
+
+        parser = self.parser = expat.ParserCreate(namespace_separator="}")
+        parser.buffer_text = True
+        parser.ordered_attributes = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        parser.Parse(b"".join([b"<_>", *blobs, b"</_>"]), True)
+
+        if len(self.spans) != len(blobs):
+            raise _UnsupportedError
+        for i, (start, end) in enumerate(self.spans):
+            if not (offsets[i] <= start <= end < offsets[i + 1]):
+                raise _UnsupportedError
+        return self.results
+
+    def start(self, name: str, attrs: list[str]):
+        level = self.level
+        self.level += 1
+        if level == 0:
+            return
+        super().start(name, attrs)
+        if level == 1:
+            if self.num_deleted:
+                raise _UnsupportedError
+            self.block_start = self.parser.CurrentByteIndex
+
+    def end(self, name: str):
+        self.level -= 1
+        if self.level == 0:
+            return
+        super().end(name)
+        if self.level == 1:
+            self.spans.append((self.block_start, self.parser.CurrentByteIndex))
+            self.results.append(
+                "".join(
+                    [x if x.__class__ is str else x.resolve_tail() for x in self.out]
+                )
+            )
+            self.out.clear()
+            # `ET.fromstring` ignores text after the root element.
+            self.tail_frame = _DELETED
+
+    def data(self, text: str):
+        if self.level == 1:
+            # Text outside of an element is malformed in a standalone blob.
+            if not text.isspace():
+                raise _UnsupportedError
+            return
+        super().data(text)
+
+
+def stream_transform_batch(
+    blobs: list[str | bytes], transforms: dict[str, Rule]
+) -> list[str]:
+    """Transform a batch of XML blobs in a single pass.
+
+    This function is equivalent to calling `stream_transform` on each blob,
+    but it shares one parser and one transliteration cache across the whole
+    batch, which saves a lot of per-blob overhead for large batches.
+
+    If any blob is malformed or unsupported, we fall back to transforming each
+    blob separately, which raises the same errors as `stream_transform`.
+
+    :return: the HTML for each blob, in the same order as `blobs`.
+    """
+    if not blobs:
+        return []
+
+    cache = {}
+
+    def transliterate(s: str) -> str:
+        try:
+            return cache[s]
+        except KeyError:
+            cache[s] = ret = _slp1_to_devanagari(s)
+            return ret
+
+    encoded = [b.encode("utf-8") if isinstance(b, str) else b for b in blobs]
+    try:
+        return _BatchTransform(transforms, transliterate).run_batch(encoded)
+    except (_UnsupportedError, expat.ExpatError):
+        return [stream_transform(b, transforms) for b in blobs]
+
+
+#: Bump this whenever you change how we render XML in a way that the rule
+#: tables don't show, e.g. in an attribute function or in the code that applies
+#: the rules. This invalidates all cached HTML.
+RULES_REVISION = 2
+
+
+def _describe(value) -> str:
+    """Describe a rule (or a part of a rule) as a stable string.
+
+    We describe functions by name and by the data they close over (e.g. the
+    attributes that `_overwrite` sets), but not by their code. Changes to
+    code need a new `RULES_REVISION`.
+    """
+    if isinstance(value, Rule):
+        parts = [value.tag, value.attrib_fn, value.text_before, value.text_after]
+        return "Rule(" + ",".join(_describe(x) for x in parts) + ")"
+    if isinstance(value, dict):
+        items = (f"{_describe(k)}:{_describe(v)}" for k, v in value.items())
+        return "{" + ",".join(items) + "}"
+    if callable(value):
+        cells = [_describe(c.cell_contents) for c in value.__closure__ or ()]
+        return f"{value.__qualname__}{cells}"
+    return repr(value)
+
+
+def rules_version(transforms: dict[str, Rule]) -> str:
+    """Return a short fingerprint of the given transform rules.
+
+    The fingerprint changes whenever the rules, `RULES_REVISION`, or our
+    version of vidyut (which transliterates) changes, so we can use it to
+    invalidate cached HTML.
+    """
+    description = f"{RULES_REVISION}:{vidyut.__version__}:{_describe(transforms)}"
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()[:12]
+
+
 def transform_mw(blob: str) -> str:
     """Transform XML for the Monier-Williams dictionary."""
-    xml = ET.fromstring(blob)
-    return transform(xml, mw_xml)
+    return stream_transform(blob, mw_xml)
 
 
 def transform_apte_sanskrit_english(blob: str) -> str:
     """Transform XML for the Apte Sanskrit-English dictionary."""
-    xml = ET.fromstring(blob)
-    return transform(xml, apte_cologne_xml)
+    return stream_transform(blob, apte_cologne_xml)
 
 
 def transform_apte_sanskrit_hindi(blob: str) -> str:
     """Transform XML for the Apte Sanskrit-Hindi dictionary."""
-    xml = ET.fromstring(blob)
-    return transform(xml, apte_uoh_xml)
+    return stream_transform(blob, apte_uoh_xml)
 
 
 def transform_vacaspatyam(blob: str) -> str:
     """Transform XML for the Vacaspatyam."""
-    xml = ET.fromstring(blob)
-    return transform(xml, vacaspatyam_xml)
+    return stream_transform(blob, vacaspatyam_xml)
 
 
 def transform_amarakosha(blob: str) -> str:
     """Transform XML for the Amarakosha."""
-    xml = ET.fromstring(blob)
-    return transform(xml, amarakosha_xml)
+    return stream_transform(blob, amarakosha_xml)
 
 
 def _text_of(xml: ET.Element, path: str, default: str) -> str:
@@ -367,9 +834,8 @@ def parse_tei_header(blob: str | None) -> dict[str, str]:
 
 def transform_sak(blob: str) -> str:
     """Transform XML for the Shabdarthakaustubha."""
-    xml = ET.fromstring(blob)
     # Reuse the Vacaspatyam xml config, since it's close enough.
-    return transform(xml, vacaspatyam_xml)
+    return stream_transform(blob, vacaspatyam_xml)
 
 
 def transform_text_block(block_blob: str) -> str:
@@ -380,5 +846,28 @@ def transform_text_block(block_blob: str) -> str:
     """
     # FIXME: leaky abstraction. We should return just a string blob here and
     # get the XML ID from `database.Block` instead.
-    xml = ET.fromstring(block_blob)
-    return transform(xml, transforms=tei_xml)
+    return stream_transform(block_blob, tei_xml)
+
+
+def transform_text_blocks(block_blobs: list[str]) -> list[str]:
+    """Transform XML for a list of TEI blocks, e.g. all blocks in a section.
+
+    :param block_blobs: the original XML blob for each block.
+    :return: the HTML for each block, in the same order as `block_blobs`.
+    """
+    return stream_transform_batch(block_blobs, tei_xml)
+
+
+#: Fingerprint of the rules used by `transform_text_block`.
+TEI_XML_VERSION = rules_version(tei_xml)
+
+#: Fingerprint of the rules used by our dictionary transforms.
+DICTIONARY_XML_VERSION = rules_version(
+    {
+        "mw": mw_xml,
+        "apte": apte_cologne_xml,
+        "apte-sh": apte_uoh_xml,
+        "vacaspatyam": vacaspatyam_xml,
+        "amara": amarakosha_xml,
+    }
+)
@@ -1,9 +1,28 @@
 """Views for API endpoints.
 
 Other view modules import the `bp` blueprint below and use it to decorate API
-endpoints.
+endpoints. Here, we define only endpoints that don't belong to any one view.
 """
 
-from flask import Blueprint
+from flask import Blueprint, jsonify
+
+from ambuda.utils import lipi, lookup_cache
+from ambuda.utils.auth import admin_required
 
 bp = Blueprint("api", __name__)
+
+
+@bp.route("/stats/caches")
+@admin_required
+def cache_stats():
+    """Show hit rates and sizes for our in-memory caches.
+
+    Each worker has its own caches, so these stats are for whichever worker
+    served the request.
+    """
+    return jsonify(
+        {
+            "dictionary_lookups": lookup_cache.cache_stats(),
+            "transliteration": lipi.cache_stats(),
+        }
+    )
@@ -11,30 +11,66 @@ A source list is valid iff all of the following conditions are met:
 If a source list is invalid, we raise a 404 error.
 """
 
-import functools
-
-from flask import Blueprint, abort, redirect, render_template, request, url_for
+from flask import (
+    Blueprint,
+    abort,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from indic_transliteration import detect, sanscript
 
 import ambuda.queries as q
-from ambuda.utils import xml
+from ambuda.utils import (
+    dict_index,
+    dict_registry,
+    entry_cache,
+    etags,
+    lipi,
+    lookup_cache,
+    reverse_search,
+    xml,
+)
 from ambuda.utils.dict_utils import expand_apte_keys, expand_skd_keys, standardize_key
 from ambuda.views.api import bp as api
 
 bp = Blueprint("dictionaries", __name__)
 
+#: The number of headwords to suggest by default.
+COMPLETE_LIMIT = 10
+#: The largest number of headwords that a client may request.
+MAX_COMPLETE_LIMIT = 50
+#: The largest number of words that a client may look up in one batch.
+MAX_BATCH_SIZE = 100
+#: The number of definition matches to return by default.
+REVERSE_LIMIT = 20
+#: The largest number of definition matches that a client may request.
+MAX_REVERSE_LIMIT = 100
+#: The number of near-miss headwords to suggest when a lookup finds nothing.
+SUGGEST_LIMIT = 5
+
 
-@functools.cache
 def _get_dictionary_data() -> dict[str, str]:
-    return {d.slug: d.title for d in q.dictionaries()}
+    registry = dict_registry.get(q.get_session())
+    return {slug: d.title for slug, d in registry.by_slug.items()}
 
 
-def _create_query_keys(sources: list[str], query: str) -> list[str]:
+def _get_dictionary_versions() -> dict[str, int]:
+    registry = dict_registry.get(q.get_session())
+    return {slug: d.version for slug, d in registry.by_slug.items()}
+
+
+def _to_slp1_key(query: str) -> str:
     query = query.strip()
     input_scheme = detect.detect(query)
     slp1_key = sanscript.transliterate(query, input_scheme, sanscript.SLP1)
+    return standardize_key(slp1_key)
+
 
-    slp1_key = standardize_key(slp1_key)
+def _create_query_keys(sources: list[str], query: str) -> list[str]:
+    slp1_key = _to_slp1_key(query)
     keys = [slp1_key]
 
     if any(x in sources for x in {"apte", "apte-sh"}):
@@ -45,26 +81,72 @@ def _create_query_keys(sources: list[str], query: str) -> list[str]:
     return keys
 
 
-def _fetch_entries(sources: list[str], query: str) -> dict[str, str]:
-    keys = _create_query_keys(sources, query)
-    entries = q.dict_entries(sources, keys)
+def _fetch_entries(sources: list[str], query: str) -> dict[str, list[str]]:
+    return _fetch_entries_batch(sources, [query])[query]
 
-    transforms = {
-        "apte": xml.transform_apte_sanskrit_english,
-        "apte-sh": xml.transform_apte_sanskrit_hindi,
-        "shabdartha-kaustubha": xml.transform_sak,
-        "mw": xml.transform_mw,
-        "vacaspatyam": xml.transform_vacaspatyam,
-        "amara": xml.transform_amarakosha,
-        "shabdakalpadruma": xml.transform_mw,
-    }
+
+def _fetch_entries_batch(
+    sources: list[str], queries: list[str]
+) -> dict[str, dict[str, list[str]]]:
+    """Look up many queries with at most one `dict_entries` call.
+
+    We serve what we can from `lookup_cache` and look up the rest together.
+
+    :return: a map from each query to its results in each source.
+    """
+    cache = lookup_cache.get_cache()
+    versions = _get_dictionary_versions()
+    html_version = entry_cache.html_version()
 
     results = {}
+    misses = {}
+    for query in queries:
+        keys = set(_create_query_keys(sources, query))
+        cache_key = lookup_cache.make_key(sources, keys, versions, html_version)
+        cached = cache.get(cache_key)
+        if cached is None:
+            misses[query] = (keys, cache_key)
+        else:
+            # Cached results may list their sources in a different order.
+            results[query] = {s: cached[s] for s in sources}
+
+    if misses:
+        fetched = _lookup_entries(sources, {k: v[0] for k, v in misses.items()})
+        for query, result in fetched.items():
+            cache.put(misses[query][1], result)
+        results.update(fetched)
+    return {query: results[query] for query in queries}
+
+
+def _lookup_entries(
+    sources: list[str], query_keys: dict[str, set[str]]
+) -> dict[str, dict[str, list[str]]]:
+    """Look up the given keys for each query in the database."""
+    all_keys = sorted(set().union(*query_keys.values()))
+    entries = q.dict_entries(sources, all_keys)
+
+    engine = q.get_engine()
+    rendered = {}
     for source_slug, source_entries in entries.items():
-        fn = transforms.get(source_slug, xml.transform_mw)
-        html_blobs = [fn(e.value) for e in source_entries]
-        results[source_slug] = html_blobs
-    return results
+        htmls = entry_cache.render_entries(engine, source_slug, source_entries)
+        rendered[source_slug] = list(zip((e.key for e in source_entries), htmls))
+
+    return {
+        query: {
+            source_slug: [html for key, html in pairs if key in keys]
+            for source_slug, pairs in rendered.items()
+        }
+        for query, keys in query_keys.items()
+    }
+
+
+def _suggest_keys(sources: list[str], query: str, entries: dict) -> list[str]:
+    """If the lookup found nothing, suggest headwords close to the query."""
+    if any(entries.values()):
+        return []
+    versions = _get_dictionary_versions()
+    versions = {s: versions[s] for s in sources if s in versions}
+    return dict_index.suggest(versions, _to_slp1_key(query), SUGGEST_LIMIT)
 
 
 def _handle_form_submission(
@@ -139,10 +221,120 @@ def entry(sources, query):
         "dictionaries/index.html",
         query=query,
         entries=entries,
+        suggestions=_suggest_keys(sources, query, entries),
         dictionaries=dictionaries,
     )
 
 
+@api.route("/dictionaries/<list:sources>/complete")
+def complete_json(sources):
+    """Suggest headwords that start with the query.
+
+    We read only our key indexes (see `ambuda.utils.dict_index`) and the
+    dictionary registry, so this route rarely touches the database.
+
+    Query parameters:
+
+    - `q`: the start of a headword, in any script.
+    - `limit`: the maximum number of headwords to return.
+    """
+    dictionaries = _get_dictionary_data()
+    sources = [s for s in sources if s in dictionaries]
+    if not sources:
+        abort(404)
+
+    limit = request.args.get("limit", COMPLETE_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_COMPLETE_LIMIT))
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify({"results": []})
+
+    prefix = _to_slp1_key(query)
+    prefixes = [prefix]
+    if prefix.endswith("M"):
+        # `standardize_key` turns an anusvara into the nasal that matches the
+        # next consonant, which the user hasn't typed yet.
+        prefixes.extend(prefix[:-1] + nasal for nasal in "NYRnm")
+
+    versions = _get_dictionary_versions()
+    versions = {s: versions[s] for s in sources if s in versions}
+    keys = dict_index.complete(versions, prefixes, limit)
+    return jsonify(
+        {
+            "results": [
+                {"key": key, "text": lipi.slp1_to_devanagari(key)} for key in keys
+            ]
+        }
+    )
+
+
+@api.route("/dictionaries/reverse")
+def reverse_json():
+    """Find Sanskrit words whose definitions match an English query.
+
+    We read only our definition index (see `ambuda.utils.reverse_search`).
+
+    Query parameters:
+
+    - `q`: English words. We match entries whose definitions have every word.
+    - `sources`: a comma-separated list of dictionaries to search. By
+      default, search all of our English dictionaries.
+    - `limit`: the maximum number of entries to return.
+    """
+    registry = dict_registry.get(q.get_session())
+    sources = request.args.get("sources")
+    sources = sources.split(",") if sources else reverse_search.GLOSS_DICTIONARIES
+    dictionaries = {registry.by_slug[s].id: s for s in sources if s in registry.by_slug}
+    if not dictionaries:
+        abort(404)
+
+    limit = request.args.get("limit", REVERSE_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_REVERSE_LIMIT))
+    results = reverse_search.search(request.args.get("q", ""), dictionaries, limit)
+    return jsonify({"results": results})
+
+
+@api.route("/dictionaries/<list:sources>/batch")
+def batch_json(sources):
+    """Look up many words at once, e.g. every lemma in a verse.
+
+    Query parameters:
+
+    - `q`: a word to look up, in any script. Repeat this parameter for each
+      word.
+
+    We return JSON with each source's title and, for each word, the HTML of
+    each of its entries in each source.
+    """
+    dictionaries = _get_dictionary_data()
+    sources = [s for s in sources if s in dictionaries]
+    if not sources:
+        abort(404)
+
+    queries = list(dict.fromkeys(w for w in request.args.getlist("q") if w.strip()))
+    if len(queries) > MAX_BATCH_SIZE:
+        abort(400)
+
+    versions = _get_dictionary_versions()
+    etag = etags.make_etag(
+        xml.DICTIONARY_XML_VERSION,
+        *(f"{s}:{versions.get(s)}" for s in sources),
+        # Unlike the route, the query string isn't part of `request.path`.
+        *queries,
+    )
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
+
+    results = _fetch_entries_batch(sources, queries) if queries else {}
+    rv = jsonify(
+        {
+            "dictionaries": {s: dictionaries[s] for s in sources},
+            "results": results,
+        }
+    )
+    return etags.with_etag(rv, etag)
+
+
 @api.route("/dictionaries/<list:sources>/<query>")
 def entry_htmx(sources, query):
     dictionaries = _get_dictionary_data()
@@ -150,10 +342,22 @@ def entry_htmx(sources, query):
     if not sources:
         abort(404)
 
+    versions = _get_dictionary_versions()
+    etag = etags.make_etag(
+        xml.DICTIONARY_XML_VERSION,
+        *(f"{s}:{versions.get(s)}" for s in sources),
+        # Rebuilding the indexes changes our "Did you mean" suggestions.
+        *(f"{s}:{dict_index.stamp(s, versions.get(s))}" for s in sources),
+    )
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
+
     entries = _fetch_entries(sources, query)
-    return render_template(
+    rv = render_template(
         "htmx/dictionary-results.html",
         query=query,
         entries=entries,
+        suggestions=_suggest_keys(sources, query, entries),
         dictionaries=dictionaries,
     )
+    return etags.with_etag(rv, etag)
@@ -19,3 +19,14 @@ class Section:
     blocks: list[Block]
     prev_url: str
     next_url: str
+    #: The URL for the next page of blocks, or None if `blocks` has them all.
+    next_page_url: str | None = None
+
+
+@dataclass
+class BlockPage:
+    """A page of blocks from a long section."""
+
+    blocks: list[Block]
+    #: The URL for the next page of blocks, or None if this is the last page.
+    next_page_url: str | None
@@ -1,17 +1,33 @@
 """Views related to texts: title pages, sections, verses, etc."""
 
-import json
-
-from flask import Blueprint, abort, jsonify, render_template, url_for
-from indic_transliteration import sanscript
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    jsonify,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 
 import ambuda.database as db
 import ambuda.queries as q
 from ambuda.consts import TEXT_CATEGORIES
-from ambuda.utils import xml
-from ambuda.utils.json_serde import AmbudaJSONEncoder
+from ambuda.utils import (
+    block_cache,
+    downloads,
+    etags,
+    json_serde,
+    lipi,
+    search,
+    text_index,
+    xml,
+)
+from ambuda.utils.text_index import SectionMeta
 from ambuda.views.api import bp as api
-from ambuda.views.reader.schema import Block, Section
+from ambuda.views.reader.schema import Block, BlockPage, Section
 
 bp = Blueprint("texts", __name__)
 
@@ -32,54 +48,66 @@ HAS_NO_PARSE = {
 #: we just call "all." All such texts are called *single-section texts.*
 SINGLE_SECTION_SLUG = "all"
 
+#: The number of blocks per page. Some sections (and single-section texts) have
+#: thousands of blocks, so we send just the first page with the reader page and
+#: let the client fetch the rest from `reader_blocks_json`. (Readers without
+#: JavaScript follow a link to the next page instead.)
+PAGE_SIZE = 100
+#: The largest page that a client may request.
+MAX_PAGE_SIZE = 500
 
-def _prev_cur_next(sections: list[db.TextSection], slug: str):
-    """Get the previous, current, and next esctions.
-
-    :param sections: all of the sections in this text.
-    :param slug: the slug for the current section.
-    """
-    found = False
-    i = 0
-    for i, s in enumerate(sections):
-        if s.slug == slug:
-            found = True
-            break
-
-    if not found:
-        raise ValueError(f"Unknown slug {slug}")
-
-    prev = sections[i - 1] if i > 0 else None
-    cur = sections[i]
-    next = sections[i + 1] if i < len(sections) - 1 else None
-    return prev, cur, next
+#: The number of search results to return by default.
+SEARCH_LIMIT = 20
+#: The largest number of search results that a client may request.
+MAX_SEARCH_LIMIT = 100
 
 
-def _make_section_url(text: db.Text, section: db.TextSection | None) -> str | None:
+def _make_section_url(text: db.Text, section: SectionMeta | None) -> str | None:
     if section:
         return url_for("texts.section", text_slug=text.slug, section_slug=section.slug)
     else:
         return None
 
 
-def _section_groups(sections: list[db.TextSection]) -> dict[str, list[db.TextSection]]:
-    """Groups section hierarchically according to their slug.
+def _make_page_url(
+    text: db.Text, section: SectionMeta, after: int | None, limit: int | None = None
+) -> str | None:
+    if after is None:
+        return None
+    return url_for(
+        "api.reader_blocks_json",
+        text_slug=text.slug,
+        section_slug=section.slug,
+        after=after,
+        limit=limit or PAGE_SIZE,
+    )
 
-    For example, the sections `[1.1, 1.2, 2.1, 2.2]` will be grouped as::
 
-        { "1": [1.1, 1.2], "2": [2.1, 2.2] }
+def _make_blocks(
+    section: SectionMeta, after: int | None = None, limit: int | None = None
+) -> tuple[list[Block], int | None]:
+    """Render a page of a section's blocks in one batch.
+
+    :param after: if set, start after the block with this `n`.
+    :param limit: the page size. If not set, render all remaining blocks.
+    :return: the blocks, and the `after` value for the next page (or None if
+        this is the last page).
     """
-    grouper = {}
-    for s in sections:
-        key, _, _ = s.slug.rpartition(".")
-        if key not in grouper:
-            grouper[key] = []
-        grouper[key].append(s)
-    return grouper
+    # Fetch one extra row to learn whether there's another page.
+    fetch_limit = limit + 1 if limit is not None else None
+    rows = list(q.section_blocks(section.id, after=after, limit=fetch_limit))
+    next_after = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_after = rows[-1].n
+
+    html_blocks = block_cache.render_blocks(q.get_engine(), rows)
+    blocks = [Block(slug=row.slug, mula=html) for row, html in zip(rows, html_blocks)]
+    return blocks, next_after
 
 
 def _hk_to_dev(s: str) -> str:
-    return sanscript.transliterate(s, sanscript.HK, sanscript.DEVANAGARI)
+    return lipi.hk_to_devanagari(s)
 
 
 @bp.route("/")
@@ -94,18 +122,23 @@ def index():
 @bp.route("/<slug>/")
 def text(slug):
     """Show a text's title page and contents."""
-    text = q.text(slug)
+    text = q.text_without_sections(slug)
     if text is None:
         abort(404)
 
-    section_groups = _section_groups(text.sections)
-    return render_template("texts/text.html", text=text, section_groups=section_groups)
+    index = text_index.get(text)
+    return render_template(
+        "texts/text.html",
+        text=text,
+        sections=index.sections,
+        section_groups=index.groups,
+    )
 
 
 @bp.route("/<slug>/about")
 def text_about(slug):
     """Show a text's metadata."""
-    text = q.text(slug)
+    text = q.text_without_sections(slug)
     if text is None:
         abort(404)
 
@@ -120,22 +153,49 @@ def text_about(slug):
 @bp.route("/<slug>/resources")
 def text_resources(slug):
     """Show a text's downloadable resources."""
-    text = q.text(slug)
+    text = q.text_without_sections(slug)
     if text is None:
         abort(404)
 
     return render_template("texts/text-resources.html", text=text)
 
 
+@bp.route("/<slug>/download.<any(txt, xml, json):fmt>")
+def download(slug, fmt):
+    """Download a whole text as plain text, TEI XML, or JSON."""
+    text = q.text_without_sections(slug)
+    if text is None:
+        abort(404)
+
+    mimetype = downloads.MIMETYPES[fmt]
+    filename = f"{text.slug}.{fmt}"
+    path = downloads.cache_path(text, fmt)
+    if path.exists():
+        return send_file(
+            path, mimetype=mimetype, as_attachment=True, download_name=filename
+        )
+
+    # Not cached yet, so stream it from the database (and cache it as we go).
+    rv = Response(stream_with_context(downloads.generate(text, fmt)), mimetype=mimetype)
+    rv.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return rv
+
+
 @bp.route("/<text_slug>/<section_slug>")
 def section(text_slug, section_slug):
-    """Show a specific section of a text."""
-    text_ = q.text(text_slug)
+    """Show a specific section of a text.
+
+    Query parameters:
+
+    - `after`: show blocks after the block with this `n`. (For readers without
+      JavaScript, who follow the "show more" link at the end of each page.)
+    """
+    text_ = q.text_without_sections(text_slug)
     if text_ is None:
         abort(404)
 
     try:
-        prev, cur, next_ = _prev_cur_next(text_.sections, section_slug)
+        prev, cur, next_ = text_index.get(text_).prev_cur_next(section_slug)
     except ValueError:
         abort(404)
 
@@ -146,84 +206,185 @@ def section(text_slug, section_slug):
         if section_slug != SINGLE_SECTION_SLUG:
             abort(404)
 
-    has_no_parse = text_.slug in HAS_NO_PARSE
-
-    # Fetch with content blocks
-    cur = q.text_section(text_.id, section_slug)
-
-    with q.get_session() as _:
-        _ = cur.blocks
+    after = request.args.get("after", type=int)
+    etag = etags.make_etag(xml.TEI_XML_VERSION, text_.version, after)
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
 
-    blocks = []
-    for block in cur.blocks:
-        blocks.append(
-            Block(
-                slug=block.slug,
-                mula=xml.transform_text_block(block.xml),
-            )
-        )
+    has_no_parse = text_.slug in HAS_NO_PARSE
 
+    # Inline just one page of blocks. The client fetches the rest.
+    blocks, next_after = _make_blocks(cur, after=after, limit=PAGE_SIZE)
     data = Section(
         text_title=_hk_to_dev(text_.title),
         section_title=_hk_to_dev(cur.title),
         blocks=blocks,
         prev_url=_make_section_url(text_, prev),
         next_url=_make_section_url(text_, next_),
+        next_page_url=_make_page_url(text_, cur, next_after),
     )
-    json_payload = json.dumps(data, cls=AmbudaJSONEncoder)
-
-    return render_template(
+    json_payload = json_serde.dumps(data)
+
+    more_url = None
+    if next_after is not None:
+        more_url = url_for(
+            "texts.section",
+            text_slug=text_.slug,
+            section_slug=cur.slug,
+            after=next_after,
+        )
+    rv = render_template(
         "texts/section.html",
         text=text_,
         prev=prev,
         section=cur,
         next=next_,
         json_payload=json_payload,
-        html_blocks=data.blocks,
+        html_blocks=blocks,
+        more_url=more_url,
         has_no_parse=has_no_parse,
         is_single_section_text=is_single_section_text,
     )
+    return etags.with_etag(rv, etag)
 
 
 @api.route("/texts/<text_slug>/blocks/<block_slug>")
 def block_htmx(text_slug, block_slug):
-    text = q.text(text_slug)
+    text = q.text_without_sections(text_slug)
     if text is None:
         abort(404)
 
+    etag = etags.make_etag(xml.TEI_XML_VERSION, text.version)
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
+
     block = q.block(text.id, block_slug)
     if not block:
         abort(404)
 
-    html_block = xml.transform_text_block(block.xml)
-    return render_template(
+    [html_block] = block_cache.render_blocks(q.get_engine(), [block])
+    rv = render_template(
         "htmx/text-block.html",
         slug=block.slug,
         html=html_block,
     )
+    return etags.with_etag(rv, etag)
 
 
 @api.route("/texts/<text_slug>/<section_slug>")
 def reader_json(text_slug, section_slug):
     # NOTE: currently unused, since we bootstrap from a JSON blob in the
     # original request.
-    text_ = q.text(text_slug)
+    text_ = q.text_without_sections(text_slug)
     if text_ is None:
         abort(404)
 
     try:
-        prev, cur, next_ = _prev_cur_next(text_.sections, section_slug)
+        prev, cur, next_ = text_index.get(text_).prev_cur_next(section_slug)
     except ValueError:
         abort(404)
 
-    with q.get_session() as _:
-        html_blocks = [xml.transform_text_block(b.xml) for b in cur.blocks]
+    etag = etags.make_etag(xml.TEI_XML_VERSION, text_.version)
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
+
+    blocks, _ = _make_blocks(cur)
 
     data = Section(
         text_title=_hk_to_dev(text_.title),
         section_title=_hk_to_dev(cur.title),
-        blocks=html_blocks,
-        prev_url=_make_section_url(text, prev),
-        next_url=_make_section_url(text, next_),
+        blocks=blocks,
+        prev_url=_make_section_url(text_, prev),
+        next_url=_make_section_url(text_, next_),
     )
-    return jsonify(data)
+    return etags.with_etag(jsonify(data), etag)
+
+
+@api.route("/texts/<text_slug>/<section_slug>/blocks")
+def reader_blocks_json(text_slug, section_slug):
+    """Return one page of a section's blocks.
+
+    Query parameters:
+
+    - `after`: return blocks after the block with this `n`. (Clients should
+      just follow `next_page_url`.)
+    - `limit`: the maximum number of blocks to return.
+    """
+    text_ = q.text_without_sections(text_slug)
+    if text_ is None:
+        abort(404)
+
+    try:
+        _, cur, _ = text_index.get(text_).prev_cur_next(section_slug)
+    except ValueError:
+        abort(404)
+
+    after = request.args.get("after", type=int)
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    etag = etags.make_etag(xml.TEI_XML_VERSION, text_.version, after, limit)
+    if etags.is_fresh(etag):
+        return etags.not_modified(etag)
+
+    blocks, next_after = _make_blocks(cur, after=after, limit=limit)
+    data = BlockPage(
+        blocks=blocks,
+        next_page_url=_make_page_url(text_, cur, next_after, limit),
+    )
+    return etags.with_etag(jsonify(data), etag)
+
+
+def _search_json(search_fn):
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", SEARCH_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+    text_id = None
+    if text_slug := request.args.get("text"):
+        text_ = q.text_without_sections(text_slug)
+        if text_ is None:
+            abort(404)
+        text_id = text_.id
+
+    results = search_fn(query, text_id=text_id, limit=limit)
+    return jsonify(
+        {
+            "results": [
+                {
+                    "text": r.text_slug,
+                    "block": r.block_slug,
+                    "url": url_for(
+                        "texts.section",
+                        text_slug=r.text_slug,
+                        section_slug=r.section_slug,
+                    ),
+                    "snippet": r.snippet,
+                }
+                for r in results
+            ]
+        }
+    )
+
+
+@api.route("/search")
+def search_json():
+    """Search every block in the library.
+
+    Query parameters:
+
+    - `q`: the query, in any script.
+    - `text`: if set, search only the text with this slug.
+    - `limit`: the maximum number of results to return.
+    """
+    return _search_json(search.search)
+
+
+@api.route("/search/lines")
+def search_lines_json():
+    """Find the blocks that contain a line, ignoring sandhi and spelling.
+
+    Query parameters are as in `search_json`, but `q` is a line or the start
+    of a line.
+    """
+    return _search_json(search.search_lines)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import getpass
+import os
 from pathlib import Path
 
 import click
@@ -9,11 +10,21 @@ from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 
 import ambuda
+import config
 from ambuda import database as db
 from ambuda import queries as q
 from ambuda.seed.utils.data_utils import create_db
 from ambuda.tasks.projects import create_project_inner
 from ambuda.tasks.utils import LocalTaskStatus
+from ambuda.utils import (
+    bake,
+    block_cache,
+    compression,
+    dict_index,
+    entry_cache,
+    reverse_search,
+    search,
+)
 
 engine = create_db()
 
@@ -109,5 +120,153 @@ def create_project(title, pdf_path):
         )
 
 
+@cli.command()
+@click.option("--text", "text_slugs", multiple=True, help="text slug (default: all)")
+def warm_block_cache(text_slugs):
+    """Pre-render and cache the HTML for every block in a text.
+
+    The block cache fills itself as readers request pages, so this command is
+    optional. But it's useful after a reseed or a change to our XML rules.
+    """
+    with Session(engine) as session:
+        stmt = select(db.Text)
+        if text_slugs:
+            stmt = stmt.where(db.Text.slug.in_(text_slugs))
+        texts = [(t.id, t.slug) for t in session.scalars(stmt).all()]
+
+    found = {slug for _, slug in texts}
+    for slug in text_slugs:
+        if slug not in found:
+            raise click.ClickException(f'Text "{slug}" does not exist.')
+
+    for text_id, slug in texts:
+        num_rendered = block_cache.warm_text(engine, text_id)
+        print(f"{slug}: rendered {num_rendered} blocks.")
+
+
+@cli.command("bake")
+@click.option("--out-dir", required=True, help="directory to write pages to")
+@click.option("--text", "text_slugs", multiple=True, help="text slug (default: all)")
+@click.option("--processes", type=int, help="worker processes (default: one per CPU)")
+@click.option("--force", is_flag=True, help="re-render pages that are up to date")
+def bake_texts(out_dir, text_slugs, processes, force):
+    """Pre-render reader pages as static files for anonymous readers.
+
+    Only texts whose content changed since the last run are re-rendered.
+    """
+    result = bake.bake(
+        engine,
+        Path(out_dir),
+        os.environ["FLASK_ENV"],
+        text_slugs=list(text_slugs),
+        processes=processes,
+        force=force,
+    )
+    print(
+        f"Baked {result.num_sections} sections in {result.num_texts} texts "
+        f"({result.num_skipped} texts up to date)."
+    )
+    if result.errors:
+        raise click.ClickException(f"Could not bake: {', '.join(result.errors)}")
+
+
+@cli.command()
+@click.option(
+    "--corpus",
+    "corpora",
+    multiple=True,
+    type=click.Choice(list(compression.CORPORA)),
+    help="corpus to compress (default: all)",
+)
+def compress(corpora):
+    """Train a new compression dictionary and recompress existing rows.
+
+    Run this after a large reseed so that the dictionary matches the data.
+    """
+    for corpus in corpora or compression.CORPORA:
+        with engine.begin() as conn:
+            dict_id = compression.train_corpus(conn, corpus)
+            if dict_id is None:
+                print(f"{corpus}: no rows to compress.")
+                continue
+            num_rows = compression.rewrite_corpus(conn, corpus)
+        print(f"{corpus}: rewrote {num_rows} rows with dictionary {dict_id}.")
+
+
+@cli.command()
+@click.option("--text", "text_slugs", multiple=True, help="text slug (default: all)")
+@click.option("--force", is_flag=True, help="re-index texts that are up to date")
+def build_search_index(text_slugs, force):
+    """Build or update the full-text search index.
+
+    Only texts whose content changed since the last run are re-indexed.
+    """
+    result = search.update_index(engine, text_slugs=list(text_slugs), force=force)
+    print(
+        f"Indexed {result.num_blocks} blocks in {result.num_texts} texts "
+        f"({result.num_skipped} texts up to date)."
+    )
+
+
+@cli.command()
+@click.option(
+    "--dictionary",
+    "slugs",
+    multiple=True,
+    help="dictionary slug (default: all English dictionaries)",
+)
+@click.option("--force", is_flag=True, help="re-index dictionaries that are up to date")
+def build_reverse_index(slugs, force):
+    """Build or update the English-to-Sanskrit definition search index.
+
+    Seeding a dictionary indexes it, so this command is needed only for
+    dictionaries that were seeded before the index existed.
+    """
+    result = reverse_search.update_index(engine, slugs=list(slugs), force=force)
+    print(
+        f"Indexed {result.num_entries} entries in {result.num_dictionaries} "
+        f"dictionaries ({result.num_skipped} dictionaries up to date)."
+    )
+
+
+@cli.command()
+@click.option(
+    "--dictionary", "slugs", multiple=True, help="dictionary slug (default: all)"
+)
+def build_dictionary_index(slugs):
+    """Build the memory-mapped key index for each dictionary.
+
+    Run this after seeding a dictionary. Until then, lookups in that
+    dictionary fall back to the database.
+    """
+    config_spec = config.load_config_object(os.environ["FLASK_ENV"])
+    out_dir = dict_index.index_dir(config_spec.UPLOAD_FOLDER)
+    result = dict_index.build(engine, out_dir, slugs=list(slugs))
+    for slug, num_keys in result.items():
+        print(f"{slug}: indexed {num_keys} keys.")
+
+
+@cli.command()
+@click.option(
+    "--dictionary", "slugs", multiple=True, help="dictionary slug (default: all)"
+)
+@click.option("--force", is_flag=True, help="re-render entries that are up to date")
+def render_dictionaries(slugs, force):
+    """Pre-render the HTML for every dictionary entry.
+
+    Seeding a dictionary renders its entries, so this command is needed only
+    after a change to our dictionary XML rules.
+    """
+    with Session(engine) as session:
+        all_slugs = list(session.scalars(select(db.Dictionary.slug)).all())
+    for slug in slugs:
+        if slug not in all_slugs:
+            raise click.ClickException(f'Dictionary "{slug}" does not exist.')
+
+    for slug in slugs or all_slugs:
+        num_rendered = entry_cache.render_all(engine, slug, force=force)
+        print(f"{slug}: rendered {num_rendered} entries.")
+
+
 if __name__ == "__main__":
     cli()
@@ -88,6 +88,10 @@ class BaseConfig:
 
     VIDYUT_DATA_DIR = _env("VIDYUT_DATA_DIR")
 
+    #: The memory bound (in bytes) for each worker's cache of dictionary
+    #: lookup results. See `ambuda/utils/lookup_cache.py`.
+    DICTIONARY_CACHE_BYTES = int(_env("DICTIONARY_CACHE_BYTES", 64 * 1024 * 1024))
+
     # Extensions
     # ----------
 
@@ -0,0 +1,46 @@
+"""Add sandhi-insensitive keys for block lines
+
+Revision ID: a3c58e0f7d92
+Revises: f2a86d0c4e13
+Create Date: 2026-10-18 20:11:05.204317
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3c58e0f7d92"
+down_revision = "f2a86d0c4e13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "text_block_keys",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("text_id", sa.Integer(), nullable=False),
+        sa.Column("block_id", sa.Integer(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("text_block_keys", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_text_block_keys_key"), ["key"], unique=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_text_block_keys_text_id"), ["text_id"], unique=False
+        )
+
+    # Keys are built with the search index, so mark every text as stale. The
+    # next `./cli.py build-search-index` will re-index them all.
+    op.execute("DELETE FROM search_indexed_texts")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("text_block_keys", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_text_block_keys_text_id"))
+        batch_op.drop_index(batch_op.f("ix_text_block_keys_key"))
+
+    op.drop_table("text_block_keys")
@@ -0,0 +1,32 @@
+"""Add pre-rendered HTML for dictionary entries
+
+Revision ID: b7d3e91f5c28
+Revises: a3c58e0f7d92
+Create Date: 2026-10-18 21:34:52.906114
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d3e91f5c28"
+down_revision = "a3c58e0f7d92"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Entries start without HTML, and lookups render them on the fly. To
+    # render them ahead of time, run `./cli.py render-dictionaries`.
+    with op.batch_alter_table("dictionary_entries") as batch_op:
+        batch_op.add_column(sa.Column("html", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("html_version", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    # This drops any compressed HTML along with the column, so there's nothing
+    # to decompress first.
+    with op.batch_alter_table("dictionary_entries") as batch_op:
+        batch_op.drop_column("html_version")
+        batch_op.drop_column("html")
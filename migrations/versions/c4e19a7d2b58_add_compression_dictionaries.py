@@ -0,0 +1,48 @@
+"""Add compression dictionaries
+
+Revision ID: c4e19a7d2b58
+Revises: 8d4e2a6f1b37
+Create Date: 2026-10-18 16:02:37.418205
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from ambuda.utils import compression
+
+# revision identifiers, used by Alembic.
+revision = "c4e19a7d2b58"
+down_revision = "8d4e2a6f1b37"
+branch_labels = None
+depends_on = None
+
+#: The compressible columns that exist at this revision. (Later revisions add
+#: `dictionary_entries.html`, but their downgrades drop it before ours runs.)
+COLUMNS = [
+    ("text_blocks", "xml"),
+    ("text_blocks", "html"),
+    ("dictionary_entries", "value"),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "compression_dictionaries",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("corpus", sa.String(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # `CompressedText` columns are still TEXT columns, so they need no schema
+    # change. Existing rows stay uncompressed until someone runs
+    # `./cli.py compress`.
+
+
+def downgrade() -> None:
+    # Compressed rows are unreadable without their dictionaries.
+    bind = op.get_bind()
+    for table_name, column_name in COLUMNS:
+        compression.rewrite_column(bind, table_name, column_name, None)
+    compression.clear()
+    op.drop_table("compression_dictionaries")
@@ -0,0 +1,36 @@
+"""Add a search index for English dictionary definitions
+
+Revision ID: c4e9a2d87b15
+Revises: b7d3e91f5c28
+Create Date: 2026-10-18 23:12:40.318276
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4e9a2d87b15"
+down_revision = "b7d3e91f5c28"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gloss_indexed_dictionaries",
+        sa.Column("dictionary_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("dictionary_id"),
+    )
+    # The index starts empty. To fill it, run `./cli.py build-reverse-index`.
+    op.execute(
+        "CREATE VIRTUAL TABLE dictionary_gloss_search USING fts5("
+        "gloss, key UNINDEXED, dictionary_id, "
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE dictionary_gloss_search")
+    op.drop_table("gloss_indexed_dictionaries")
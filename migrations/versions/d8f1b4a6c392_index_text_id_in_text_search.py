@@ -0,0 +1,34 @@
+"""Index text IDs in the text search index
+
+Revision ID: d8f1b4a6c392
+Revises: c4e9a2d87b15
+Create Date: 2026-10-19 10:02:13.204517
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d8f1b4a6c392"
+down_revision = "c4e9a2d87b15"
+branch_labels = None
+depends_on = None
+
+
+def _recreate(text_id_column: str) -> None:
+    # FTS5 tables can't be altered, so we recreate the index empty and mark
+    # every text as unindexed. To fill it, run `./cli.py build-search-index`.
+    op.execute("DROP TABLE text_block_search")
+    op.execute(
+        "CREATE VIRTUAL TABLE text_block_search USING fts5("
+        f"slp1, {text_id_column}, tokenize = 'trigram case_sensitive 1')"
+    )
+    op.execute("DELETE FROM search_indexed_texts")
+
+
+def upgrade() -> None:
+    _recreate("text_id")
+
+
+def downgrade() -> None:
+    _recreate("text_id UNINDEXED")
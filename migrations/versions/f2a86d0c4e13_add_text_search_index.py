@@ -0,0 +1,35 @@
+"""Add a full-text search index for text blocks
+
+Revision ID: f2a86d0c4e13
+Revises: e5b7c3d91a60
+Create Date: 2026-10-18 18:47:21.550839
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f2a86d0c4e13"
+down_revision = "e5b7c3d91a60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "search_indexed_texts",
+        sa.Column("text_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("text_id"),
+    )
+    # The index starts empty. To fill it, run `./cli.py build-search-index`.
+    op.execute(
+        "CREATE VIRTUAL TABLE text_block_search USING fts5("
+        "slp1, text_id UNINDEXED, tokenize = 'trigram case_sensitive 1')"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE text_block_search")
+    op.drop_table("search_indexed_texts")
@@ -9,6 +9,7 @@ from ambuda.consts import BOT_USERNAME, TEXT_CATEGORIES
 from ambuda.queries import get_engine, get_session
 from ambuda.seed.lookup import page_status as page_status_seeding
 from ambuda.seed.lookup import role as role_seeding
+from ambuda.utils import search
 
 
 def _add_dictionaries(session):
@@ -197,6 +198,30 @@ def db_engine(flask_app) -> Engine:
         return get_engine()
 
 
+@pytest.fixture()
+def verse_block(flask_app, db_engine):
+    """Add a verse to section 2 of our test text, and index it for search."""
+    with flask_app.app_context():
+        session = get_session()
+        text = session.scalars(select(db.Text).filter_by(slug="pariksha")).one()
+        stmt = select(db.TextSection).filter_by(text_id=text.id, slug="2")
+        section = session.scalars(stmt).one()
+        block = db.TextBlock(
+            text_id=text.id,
+            section_id=section.id,
+            slug="2.1",
+            xml="<lg><l>अग्निः</l></lg>",
+            n=1,
+        )
+        session.add(block)
+        session.commit()
+        search.update_index(db_engine, force=True)
+        yield block
+        session.delete(block)
+        session.commit()
+        search.update_index(db_engine, force=True)
+
+
 @pytest.fixture()
 def client(flask_app):
     return flask_app.test_client()
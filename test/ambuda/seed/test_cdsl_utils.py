@@ -0,0 +1,95 @@
+import io
+import weakref
+import zipfile
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import ambuda.database as db
+from ambuda.seed.utils import cdsl_utils
+from ambuda.seed.utils.data_utils import open_zip_member
+
+XML = b"""<mw>
+<H1><h><key1>agni</key1><key2>agni</key2></h><body><s>agni</s> fire, sacrificial fire</body></H1>
+<H1><h><key1>deva</key1><key2>deva</key2></h><body><s>deva</s> heavenly, divine</body></H1>
+</mw>"""
+
+
+@pytest.fixture()
+def session(db_engine):
+    with Session(db_engine) as session:
+        yield session
+        cdsl_utils.delete_existing_dict(session, "test-seed")
+
+
+def _entries(session, slug):
+    stmt = (
+        select(db.DictionaryEntry.key, db.DictionaryEntry.html)
+        .join(db.Dictionary)
+        .where(db.Dictionary.slug == slug)
+        .order_by(db.DictionaryEntry.id)
+    )
+    return session.execute(stmt).all()
+
+
+def test_iter_entries_as_strings():
+    entries = list(cdsl_utils.iter_entries_as_strings(XML))
+    assert [key for key, _ in entries] == ["agni", "deva"]
+    key, value = entries[0]
+    assert isinstance(value, str)
+    assert value.startswith("<H1><h><key1>agni</key1>")
+
+
+def test_iter_entries_as_xml__from_zip(tmp_path):
+    zip_path = tmp_path / "test.zip"
+    with zipfile.ZipFile(zip_path, "w") as z:
+        z.writestr("xml/test.xml", XML)
+
+    with open_zip_member(zip_path, "xml/test.xml") as f:
+        keys = [key for key, _ in cdsl_utils.iter_entries_as_xml(f)]
+    assert keys == ["agni", "deva"]
+
+
+def test_iter_entries_as_xml__releases_entries():
+    entry = b"<H1><h><key1>agni</key1></h><body>fire</body></H1>"
+    xml = b"<mw><pb>1</pb>" + entry * 100 + b"</mw>"
+
+    refs = []
+    for _, elem in cdsl_utils.iter_entries_as_xml(io.BytesIO(xml)):
+        # The current entry is intact, and every earlier entry is released.
+        assert elem.find("body").text == "fire"
+        assert all(ref() is None for ref in refs)
+        refs.append(weakref.ref(elem))
+    assert len(refs) == 100
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_create_from_scratch(db_engine, session, processes):
+    generator = cdsl_utils.iter_entries_as_strings(XML)
+    num_entries = cdsl_utils.create_from_scratch(
+        db_engine, "test-seed", "Test", generator, processes=processes
+    )
+    assert num_entries == 2
+
+    entries = _entries(session, "test-seed")
+    assert [key for key, _ in entries] == ["agni", "deva"]
+    assert all(html for _, html in entries)
+
+
+def test_create_from_scratch__replaces_old_entries(db_engine, session):
+    cdsl_utils.create_from_scratch(
+        db_engine, "test-seed", "Test", [("agni", "<div>fire</div>")], processes=1
+    )
+    old = session.scalar(select(db.Dictionary).filter_by(slug="test-seed"))
+    old_version = old.version
+    session.expunge_all()
+
+    cdsl_utils.create_from_scratch(
+        db_engine, "test-seed", "Test", [("deva", "<div>god</div>")], processes=1
+    )
+    new = session.scalar(select(db.Dictionary).filter_by(slug="test-seed"))
+    assert new.version > old_version
+    assert [key for key, _ in _entries(session, "test-seed")] == ["deva"]
+    # Other dictionaries are untouched.
+    assert [key for key, _ in _entries(session, "dict-1")] == ["agni"]
@@ -0,0 +1,70 @@
+import json
+
+from sqlalchemy import select
+
+import ambuda.database as db
+from ambuda.queries import get_session
+from ambuda.utils import bake, content_versions
+
+
+def _bake(engine, out_dir, **kw):
+    return bake.bake(engine, out_dir, "testing", processes=1, **kw)
+
+
+def test_bake(flask_app, db_engine, tmp_path):
+    result = _bake(db_engine, tmp_path)
+    assert result.errors == []
+    assert result.num_sections == 2
+    assert result.num_skipped == 0
+
+    html = (tmp_path / "texts" / "pariksha" / "1.html").read_text()
+    assert "agniH" in html
+    data = json.loads((tmp_path / "api" / "texts" / "pariksha" / "1.json").read_text())
+    assert data["blocks"] == [{"slug": "1.1", "mula": "<section>agniH</section>"}]
+    assert (tmp_path / "texts" / "pariksha" / "2.html").exists()
+
+
+def test_bake__incremental(flask_app, db_engine, tmp_path):
+    first = _bake(db_engine, tmp_path)
+
+    # Nothing changed.
+    result = _bake(db_engine, tmp_path)
+    assert result.num_texts == 0
+    assert result.num_skipped == first.num_texts
+
+    # One text changed.
+    with flask_app.app_context():
+        session = get_session()
+        text_id = session.scalar(select(db.Text.id).filter_by(slug="pariksha"))
+        content_versions.bump(session, db.Text, text_id)
+        session.commit()
+
+    result = _bake(db_engine, tmp_path)
+    assert result.num_texts == 1
+    assert result.num_sections == 2
+
+    # Forced.
+    result = _bake(db_engine, tmp_path, text_slugs=["pariksha"], force=True)
+    assert result.num_texts == 1
+
+
+def test_bake__removes_stale_pages(flask_app, db_engine, tmp_path):
+    _bake(db_engine, tmp_path)
+
+    # Pretend that we baked a section and a text that no longer exist.
+    manifest_path = tmp_path / bake.MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text())
+    manifest["texts"]["pariksha"]["sections"].append("3")
+    manifest["texts"]["pariksha"]["version"] = None
+    manifest["texts"]["deleted"] = {"version": 1, "sections": ["1"]}
+    manifest_path.write_text(json.dumps(manifest))
+    stale_section = tmp_path / "texts" / "pariksha" / "3.html"
+    stale_section.write_text("")
+    stale_text = tmp_path / "texts" / "deleted" / "1.html"
+    stale_text.parent.mkdir()
+    stale_text.write_text("")
+
+    _bake(db_engine, tmp_path)
+    assert not stale_section.exists()
+    assert not stale_text.exists()
+    assert "deleted" not in json.loads(manifest_path.read_text())["texts"]
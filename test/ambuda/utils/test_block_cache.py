@@ -0,0 +1,94 @@
+from sqlalchemy import select
+
+import ambuda.database as db
+import ambuda.queries as queries
+from ambuda.queries import get_engine, get_session
+from ambuda.utils import block_cache, xml
+
+
+def _get_block(slug="1.1") -> db.TextBlock:
+    session = get_session()
+    stmt = select(db.TextBlock).filter_by(slug=slug)
+    block = session.scalars(stmt).first()
+    session.refresh(block)
+    return block
+
+
+def test_html_key():
+    key = block_cache.html_key("<div>agniH</div>")
+    assert key.startswith(xml.TEI_XML_VERSION + ":")
+    assert key == block_cache.html_key(b"<div>agniH</div>")
+    assert key != block_cache.html_key("<div>agnI</div>")
+
+
+def test_render_blocks__fills_cache(flask_app):
+    with flask_app.app_context():
+        block = _get_block()
+        [html] = block_cache.render_blocks(get_engine(), [block])
+        assert html == "<section>agniH</section>"
+
+        block = _get_block()
+        assert block.html == html
+        assert block.html_key == block_cache.html_key(block.xml)
+
+
+def test_render_blocks__ignores_stale_html(flask_app):
+    with flask_app.app_context():
+        block = _get_block()
+        block = db.TextBlock(
+            id=block.id, xml=block.xml, html="<p>stale</p>", html_key="old-key"
+        )
+
+        [html] = block_cache.render_blocks(get_engine(), [block])
+        assert html == "<section>agniH</section>"
+
+
+def test_render_blocks__uses_cached_html(flask_app):
+    with flask_app.app_context():
+        block = _get_block()
+        block = db.TextBlock(
+            id=block.id,
+            xml=block.xml,
+            html="<p>cached</p>",
+            html_key=block_cache.html_key(block.xml),
+        )
+
+        [html] = block_cache.render_blocks(get_engine(), [block])
+        assert html == "<p>cached</p>"
+
+
+def test_warm_text(flask_app):
+    with flask_app.app_context():
+        engine = get_engine()
+        block = _get_block()
+        with engine.begin() as conn:
+            conn.execute(db.TextBlock.__table__.update().values(html_key=None))
+
+        assert block_cache.warm_text(engine, block.text_id) == 1
+        assert block_cache.warm_text(engine, block.text_id) == 0
+
+
+def test_render_blocks__mixed(flask_app):
+    with flask_app.app_context():
+        block = _get_block()
+        key = block_cache.html_key(block.xml)
+        cached = db.TextBlock(id=block.id, xml=block.xml, html="<p>a</p>", html_key=key)
+        stale = db.TextBlock(id=block.id, xml="<lg><l>b</l></lg>", html=None)
+
+        htmls = block_cache.render_blocks(get_engine(), [stale, cached, stale])
+        assert htmls == [
+            "<s-lg><s-l>b</s-l></s-lg>",
+            "<p>a</p>",
+            "<s-lg><s-l>b</s-l></s-lg>",
+        ]
+
+
+def test_render_blocks__section_rows(flask_app):
+    with flask_app.app_context():
+        section_id = _get_block().section_id
+        rows = list(queries.section_blocks(section_id))
+        assert [(r.slug, r.n) for r in rows] == [("1.1", 1)]
+
+        # Rows can be streamed in a single pass.
+        htmls = block_cache.render_blocks(get_engine(), iter(rows))
+        assert htmls == ["<section>agniH</section>"]
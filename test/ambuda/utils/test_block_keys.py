@@ -0,0 +1,41 @@
+import pytest
+
+from ambuda.utils import block_keys
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        ("rAmaH", "rAMa"),
+        # Anusvara and homorganic nasals are the same.
+        ("saMjaya", "saMjaya"),
+        ("saYjaya", "saMjaya"),
+        ("uttama", "utaMa"),
+        ("Darma kzetre .", "DarMakzetre"),
+    ],
+)
+def test_make_block_key(raw, expected):
+    assert block_keys.make_block_key(raw) == expected
+
+
+def test_line_keys():
+    blob = '<lg xml:id="a.1"><l>धर्मक्षेत्रे कुरुक्षेत्रे ।</l><l>समवेता युयुत्सवः</l></lg>'
+    assert block_keys.line_keys(blob) == [
+        "DarMakzetrekurukzetre",
+        "saMavetAyuyutsava",
+    ]
+
+
+def test_line_keys__no_lines():
+    assert block_keys.line_keys("<p>सञ्जयः</p>") == []
+    assert block_keys.line_keys("<lg><l>।</l></lg>") == []
+    assert block_keys.line_keys("<p>") == []
+
+
+def test_query_key():
+    # Different scripts and spellings give the same key.
+    key = block_keys.query_key("dharmakShetre kurukShetre")
+    assert key == "DarMakzetrekurukzetre"
+    assert block_keys.query_key("धर्मक्षेत्रे कुरुक्षेत्रे") == key
+    assert block_keys.query_key("dharmakṣetre kurukṣetre") == key
+    assert block_keys.query_key(" ") == ""
@@ -0,0 +1,188 @@
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+
+import ambuda.database as db
+from ambuda.utils import compression
+
+SAMPLES = [
+    f'<lg xml:id="R.1.1.{i}"><l>rAmo rAmo {i}</l><l>vane vasati</l></lg>'
+    for i in range(200)
+]
+
+
+@pytest.fixture(autouse=True)
+def dictionaries():
+    compression.clear()
+    yield
+    compression.clear()
+
+
+def test_compress__no_dictionary():
+    d = compression.Dictionaries()
+    assert d.compress(SAMPLES[0], "text_blocks") == SAMPLES[0]
+    assert not d.is_enabled("text_blocks")
+
+
+def test_compress_and_decompress():
+    d = compression.Dictionaries()
+    d.register(1, "text_blocks", compression.train(SAMPLES))
+    assert d.is_enabled("text_blocks")
+    assert not d.is_enabled("dictionary_entries")
+
+    value = '<lg xml:id="R.9.9.9"><l>rAmo rAmo 9</l><l>vane vasati</l></lg>'
+    blob = d.compress(value, "text_blocks")
+    assert isinstance(blob, bytes)
+    assert len(blob) < len(value) // 2
+    assert d.decompress(blob) == value
+
+
+def test_compress__non_ascii():
+    d = compression.Dictionaries()
+    d.register(1, "text_blocks", compression.train(SAMPLES))
+    value = "<l>रामो रामो रामः</l>" * 4
+    assert d.decompress(d.compress(value, "text_blocks")) == value
+
+
+def test_compress__incompressible():
+    d = compression.Dictionaries()
+    d.register(1, "text_blocks", compression.train(SAMPLES))
+    # Too short to benefit, so we keep it as-is.
+    assert d.compress("q", "text_blocks") == "q"
+
+
+def test_compress__uses_newest_dictionary():
+    d = compression.Dictionaries()
+    d.register(1, "text_blocks", compression.train(SAMPLES))
+    old = d.compress(SAMPLES[0], "text_blocks")
+    d.register(2, "text_blocks", compression.train(SAMPLES[::-1]))
+    new = d.compress(SAMPLES[0], "text_blocks")
+
+    assert old != new
+    # Old values are still readable.
+    assert d.decompress(old) == SAMPLES[0]
+    assert d.decompress(new) == SAMPLES[0]
+
+
+def test_decompress__unknown_dictionary():
+    d = compression.Dictionaries()
+    d.register(1, "text_blocks", compression.train(SAMPLES))
+    blob = d.compress(SAMPLES[0], "text_blocks")
+    with pytest.raises(compression.UnknownDictionaryError):
+        compression.Dictionaries().decompress(blob)
+
+
+def test_decompress__plain_bytes():
+    d = compression.Dictionaries()
+    value = "<l>रामो रामो रामः</l>"
+    assert d.decompress(value.encode("utf-8")) == value
+
+
+def test_train__size():
+    data = compression.train(SAMPLES * 100)
+    assert len(data) == compression.DICTIONARY_SIZE
+    assert compression.train([]) == b""
+
+
+def test_train_and_rewrite_corpus(db_engine):
+    with db_engine.connect() as conn:
+        old = conn.execute(select(db.TextBlock.id, db.TextBlock.xml)).all()
+        assert compression.train_corpus(conn, "text_blocks")
+
+        num_rows = compression.rewrite_corpus(conn, "text_blocks")
+        assert num_rows == len(old)
+        raw = conn.execute(text("SELECT typeof(xml) FROM text_blocks")).scalars()
+        assert set(raw) == {"blob"}
+        # The column type decompresses transparently.
+        assert conn.execute(select(db.TextBlock.id, db.TextBlock.xml)).all() == old
+
+        compression.rewrite_corpus(conn, "text_blocks", compress_rows=False)
+        raw = conn.execute(text("SELECT typeof(xml) FROM text_blocks")).scalars()
+        assert set(raw) == {"text"}
+        assert conn.execute(select(db.TextBlock.id, db.TextBlock.xml)).all() == old
+        conn.rollback()
+
+
+def _make_engine(path, samples):
+    engine = create_engine(f"sqlite:///{path}")
+    db.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(db.TextBlock),
+            [
+                {"text_id": 1, "section_id": 1, "slug": str(n), "n": n, "xml": x}
+                for n, x in enumerate(samples)
+            ],
+        )
+    return engine
+
+
+def test_read__loads_new_dictionary(tmp_path):
+    engine = _make_engine(tmp_path / "a.db", SAMPLES)
+    with engine.begin() as conn:
+        compression.train_corpus(conn, "text_blocks")
+        compression.rewrite_corpus(conn, "text_blocks")
+
+    # A worker that loaded its dictionaries before we trained this one loads
+    # it when it next checks out a connection.
+    compression.clear()
+    with engine.connect() as conn:
+        stmt = select(db.TextBlock.xml).order_by(db.TextBlock.n)
+        assert conn.execute(stmt).scalars().all() == SAMPLES
+    engine.dispose()
+
+
+def test_write__unattached_engine(tmp_path):
+    engine = _make_engine(tmp_path / "a.db", SAMPLES)
+    with engine.connect() as conn:
+        raw = conn.execute(text("SELECT typeof(xml) FROM text_blocks")).scalars()
+        assert set(raw) == {"text"}
+        stmt = select(db.TextBlock.xml).order_by(db.TextBlock.n)
+        assert conn.execute(stmt).scalars().all() == SAMPLES
+    engine.dispose()
+
+
+def test_read__separate_databases(tmp_path):
+    engines = []
+    for i, samples in enumerate([SAMPLES, SAMPLES[::-1]]):
+        engine = _make_engine(tmp_path / f"{i}.db", samples)
+        with engine.begin() as conn:
+            # Both databases have a dictionary with ID 1.
+            assert compression.train_corpus(conn, "text_blocks") == 1
+            compression.rewrite_corpus(conn, "text_blocks")
+        engines.append((engine, samples))
+
+    for engine, samples in engines:
+        with engine.connect() as conn:
+            stmt = select(db.TextBlock.xml).order_by(db.TextBlock.n)
+            assert conn.execute(stmt).scalars().all() == samples
+        engine.dispose()
+
+
+def test_train_and_rewrite_corpus__html(db_engine):
+    with db_engine.connect() as conn:
+        conn.execute(
+            insert(db.TextBlock),
+            [
+                {
+                    "text_id": 1,
+                    "section_id": 1,
+                    "slug": f"h{n}",
+                    "n": n,
+                    "xml": x,
+                    "html": x if n else None,
+                }
+                for n, x in enumerate(SAMPLES)
+            ],
+        )
+        old = conn.execute(select(db.TextBlock.id, db.TextBlock.html)).all()
+        assert compression.train_corpus(conn, "text_blocks_html")
+
+        # We skip rows without HTML.
+        num_rows = compression.rewrite_corpus(conn, "text_blocks_html")
+        assert num_rows >= len(SAMPLES) - 1
+        raw = conn.execute(
+            text("SELECT slug, typeof(html) FROM text_blocks WHERE slug LIKE 'h%'")
+        ).all()
+        assert {slug: t for slug, t in raw if t != "blob"} == {"h0": "null"}
+        assert conn.execute(select(db.TextBlock.id, db.TextBlock.html)).all() == old
+        conn.rollback()
@@ -0,0 +1,30 @@
+from sqlalchemy import select
+
+import ambuda.database as db
+from ambuda.queries import get_session
+from ambuda.utils import content_versions
+
+
+def _text_version(session, slug="pariksha") -> int:
+    return session.scalar(select(db.Text.version).filter_by(slug=slug))
+
+
+def test_next_version(flask_app):
+    with flask_app.app_context():
+        session = get_session()
+        latest = max(session.scalars(select(db.Text.version)))
+        assert content_versions.next_version(session, db.Text) > latest
+
+
+def test_bump(flask_app):
+    with flask_app.app_context():
+        session = get_session()
+        text_id = session.scalar(select(db.Text.id).filter_by(slug="pariksha"))
+        old = _text_version(session)
+
+        new = content_versions.bump(session, db.Text, text_id)
+        assert new > old
+        assert _text_version(session) == new
+        # A second bump is still newer.
+        assert content_versions.bump(session, db.Text, text_id) > new
+        session.rollback()
@@ -0,0 +1,164 @@
+import pytest
+
+import ambuda.queries as q
+from ambuda.utils import dict_index
+
+
+@pytest.fixture()
+def index_dir(flask_app, db_engine, monkeypatch, tmp_path):
+    monkeypatch.setitem(flask_app.config, "UPLOAD_FOLDER", str(tmp_path))
+    dict_index.clear()
+    yield dict_index.index_dir(str(tmp_path))
+    dict_index.clear()
+
+
+def test_write_index(tmp_path):
+    path = tmp_path / "test.idx"
+    rows = [("agni", 3), ("agni", 7), ("deva", 1), ("indra", 2), ("rAma", 4)]
+    assert dict_index._write_index(path, rows) == 4
+
+    index = dict_index.KeyIndex(path)
+    assert len(index) == 4
+    assert index.ids("agni") == [3, 7]
+    assert index.ids("deva") == [1]
+    assert index.ids("rAma") == [4]
+    # Missing keys, including prefixes and keys before and after every key.
+    for key in ["agn", "agnii", "a", "zzz", "", "Ama"]:
+        assert index.ids(key) == []
+
+
+def test_write_index__empty(tmp_path):
+    path = tmp_path / "test.idx"
+    assert dict_index._write_index(path, []) == 0
+    assert dict_index.KeyIndex(path).ids("agni") == []
+
+
+def test_key_index__bad_file(tmp_path):
+    path = tmp_path / "test.idx"
+    path.write_bytes(b"not an index")
+    with pytest.raises(ValueError):
+        dict_index.KeyIndex(path)
+
+
+def test_build(db_engine, index_dir):
+    # A stale index for dict-1, and an index for a dictionary with a similar
+    # slug, which we should keep.
+    index_dir.mkdir(parents=True)
+    (index_dir / "dict-1-0.idx").write_bytes(b"")
+    (index_dir / "dict-1-extra-1.idx").write_bytes(b"")
+
+    assert dict_index.build(db_engine, index_dir) == {"dict-1": 1, "dict-2": 1}
+    assert sorted(p.name for p in index_dir.iterdir()) == [
+        "dict-1-1.fuzzy",
+        "dict-1-1.idx",
+        "dict-1-extra-1.idx",
+        "dict-2-1.fuzzy",
+        "dict-2-1.idx",
+    ]
+
+
+def test_dict_entries__with_index(flask_app, db_engine, index_dir):
+    dict_index.build(db_engine, index_dir, slugs=["dict-1"])
+    with flask_app.app_context():
+        assert dict_index.get("dict-1", 1) is not None
+        assert dict_index.get("dict-2", 1) is None
+        # dict-1 uses its index, and dict-2 falls back to the database.
+        entries = q.dict_entries(["dict-1", "dict-2"], ["agni", "unknown"])
+        assert [e.value for e in entries["dict-1"]] == ["<div>fire</div>"]
+        assert [e.value for e in entries["dict-2"]] == ["<div>ignis</div>"]
+
+        assert q.dict_entries(["dict-1"], ["unknown"]) == {"dict-1": []}
+
+
+def test_get__stale_version(flask_app, db_engine, index_dir):
+    dict_index.build(db_engine, index_dir)
+    with flask_app.app_context():
+        assert dict_index.get("dict-1", 1) is not None
+        assert dict_index.get("dict-1", 2) is None
+
+
+def test_iter_prefix(tmp_path):
+    path = tmp_path / "test.idx"
+    rows = [("a", 1), ("agnI", 2), ("agni", 3), ("agra", 4), ("deva", 5)]
+    dict_index._write_index(path, rows)
+
+    index = dict_index.KeyIndex(path)
+    assert list(index.iter_prefix("ag")) == ["agnI", "agni", "agra"]
+    assert list(index.iter_prefix("agni")) == ["agni"]
+    assert list(index.iter_prefix("")) == ["a", "agnI", "agni", "agra", "deva"]
+    assert list(index.iter_prefix("x")) == []
+
+
+def test_complete(flask_app, index_dir):
+    index_dir.mkdir(parents=True)
+    rows = [("agni", 1), ("agra", 2), ("deva", 3)]
+    dict_index._write_index(index_dir / "d1-1.idx", rows)
+    rows = [("aNga", 1), ("aYjana", 2), ("agni", 3)]
+    dict_index._write_index(index_dir / "d2-1.idx", rows)
+    with flask_app.app_context():
+        # Merged, sorted, and without duplicates.
+        versions = {"d1": 1, "d2": 1}
+        assert dict_index.complete(versions, ["a"], 10) == [
+            "aNga",
+            "aYjana",
+            "agni",
+            "agra",
+        ]
+        assert dict_index.complete(versions, ["a"], 2) == ["aNga", "aYjana"]
+        assert dict_index.complete({"d1": 1}, ["ag", "de"], 10) == [
+            "agni",
+            "agra",
+            "deva",
+        ]
+        assert dict_index.complete({"unknown": 1}, ["a"], 10) == []
+        # An index for another version is stale.
+        assert dict_index.complete({"d1": 2}, ["a"], 10) == []
+
+
+@pytest.mark.parametrize(
+    "a,b,expected",
+    [
+        ("deva", "deva", 0),
+        ("deva", "devaa", 1),
+        ("deva", "dva", 1),
+        ("deva", "dexa", 1),
+        ("deva", "dvea", 1),
+        ("deva", "vdea", 2),
+        ("", "abc", 3),
+    ],
+)
+def test_edit_distance(a, b, expected):
+    assert dict_index._edit_distance(a, b) == expected
+    assert dict_index._edit_distance(b, a) == expected
+
+
+def test_fold_key():
+    assert dict_index.fold_key("rAmaH") == "rama"
+    assert dict_index.fold_key("SizwaH") == "siswa"
+    assert dict_index.fold_key("kfzRa") == "kfsna"
+
+
+def test_suggest(flask_app, index_dir):
+    index_dir.mkdir(parents=True)
+    keys = ["aga", "agni", "agnI", "deva", "devI", "kfzRa", "rAma", "viSva"]
+    rows = [(key, i) for i, key in enumerate(sorted(keys))]
+    dict_index._write_index(index_dir / "d1-1.idx", rows)
+    dict_index._write_fuzzy_index(
+        index_dir / "d1-1.fuzzy", dict_index.KeyIndex(index_dir / "d1-1.idx")
+    )
+    versions = {"d1": 1}
+    with flask_app.app_context():
+        # Common confusions
+        assert dict_index.suggest(versions, "rama", 5) == ["rAma"]
+        assert dict_index.suggest(versions, "kfsna", 5) == ["kfzRa"]
+        assert dict_index.suggest(versions, "visva", 5) == ["viSva"]
+        # Edits, with the closest unfolded matches first.
+        assert dict_index.suggest(versions, "agnii", 5) == ["agni", "agnI"]
+        assert dict_index.suggest(versions, "agnii", 1) == ["agni"]
+        assert dict_index.suggest(versions, "devi", 5) == ["devI", "deva"]
+        assert dict_index.suggest(versions, "dewa", 5) == ["deva"]
+        assert dict_index.suggest(versions, "rmaa", 5) == ["rAma"]
+        # Too short, too far, or no index.
+        assert dict_index.suggest(versions, "ag", 5) == []
+        assert dict_index.suggest(versions, "indra", 5) == []
+        assert dict_index.suggest({"d1": 2}, "rama", 5) == []
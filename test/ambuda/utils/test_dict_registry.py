@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import update
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import dict_registry
+
+
+@pytest.fixture()
+def registry(flask_app):
+    dict_registry.clear()
+    with flask_app.app_context():
+        yield
+    dict_registry.clear()
+
+
+def test_get(registry):
+    r = dict_registry.get(q.get_session())
+    assert sorted(r.by_slug) == ["dict-1", "dict-2"]
+    d1 = r.by_slug["dict-1"]
+    assert d1.title == "Test Dictionary 1"
+    assert d1.version == 1
+    assert r.by_id[d1.id] is d1
+
+
+def test_get__reloads_on_new_version(registry, monkeypatch):
+    session = q.get_session()
+    r = dict_registry.get(session)
+    assert dict_registry.get(session) is r
+
+    stmt = update(db.Dictionary).where(db.Dictionary.slug == "dict-1")
+    session.execute(stmt.values(version=2))
+    try:
+        # Within the check interval, we keep the old registry.
+        assert dict_registry.get(session) is r
+
+        monkeypatch.setattr(dict_registry, "CHECK_INTERVAL", 0)
+        new_r = dict_registry.get(session)
+        assert new_r is not r
+        assert new_r.by_slug["dict-1"].version == 2
+        # Nothing changed since, so keep the new registry.
+        assert dict_registry.get(session) is new_r
+    finally:
+        session.execute(stmt.values(version=1))
+        session.commit()
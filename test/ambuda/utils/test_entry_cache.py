@@ -0,0 +1,79 @@
+from sqlalchemy import select
+
+import ambuda.database as db
+from ambuda.queries import get_engine, get_session
+from ambuda.utils import entry_cache, xml
+
+
+def _get_entry(dictionary_slug="dict-1") -> db.DictionaryEntry:
+    session = get_session()
+    stmt = (
+        select(db.DictionaryEntry)
+        .join(db.Dictionary)
+        .filter(db.Dictionary.slug == dictionary_slug)
+    )
+    entry = session.scalars(stmt).first()
+    session.refresh(entry)
+    return entry
+
+
+def test_transform():
+    blob = "<div>fire</div>"
+    assert entry_cache.transform("mw", blob) == xml.transform_mw(blob)
+    assert entry_cache.transform("apte", blob) == (
+        xml.transform_apte_sanskrit_english(blob)
+    )
+    # Unknown dictionaries use the MW rules.
+    assert entry_cache.transform("unknown", blob) == xml.transform_mw(blob)
+
+
+def test_render_rows(caplog):
+    rows = [{"key": "agni", "value": b"<div>fire</div>"}, {"key": "x", "value": "<a"}]
+    [ok, bad] = entry_cache.render_rows("mw", rows)
+    assert "Could not render mw batch" in caplog.text
+    assert ok["html"] == xml.transform_mw("<div>fire</div>")
+    assert ok["html_version"] == entry_cache.html_version()
+    assert bad["html"] is None
+    assert bad["html_version"] is None
+
+
+def test_render_entries__stores_html(flask_app):
+    with flask_app.app_context():
+        entry = _get_entry()
+        entry = db.DictionaryEntry(id=entry.id, value=entry.value, html=None)
+        [html] = entry_cache.render_entries(get_engine(), "dict-1", [entry])
+        assert html == xml.transform_mw("<div>fire</div>")
+
+        entry = _get_entry()
+        assert entry.html == html
+        assert entry.html_version == entry_cache.html_version()
+
+
+def test_render_entries__uses_stored_html(flask_app):
+    with flask_app.app_context():
+        entry = _get_entry()
+        fresh = db.DictionaryEntry(
+            id=entry.id,
+            value=entry.value,
+            html="<p>stored</p>",
+            html_version=entry_cache.html_version(),
+        )
+        stale = db.DictionaryEntry(
+            id=entry.id, value=entry.value, html="<p>stale</p>", html_version="old"
+        )
+
+        assert entry_cache.render_entries(get_engine(), "dict-1", [fresh]) == [
+            "<p>stored</p>"
+        ]
+        [html] = entry_cache.render_entries(get_engine(), "dict-1", [stale])
+        assert html == xml.transform_mw("<div>fire</div>")
+
+
+def test_render_all(flask_app, db_engine):
+    assert entry_cache.render_all(db_engine, "dict-2", force=True) == 1
+    assert entry_cache.render_all(db_engine, "dict-2") == 0
+    assert entry_cache.render_all(db_engine, "unknown") == 0
+
+    with flask_app.app_context():
+        entry = _get_entry("dict-2")
+        assert entry.html == xml.transform_mw("<div>ignis</div>")
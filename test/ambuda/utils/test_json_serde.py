@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+
+import pytest
+from flask import jsonify
+
+from ambuda.utils import json_serde
+from ambuda.views.reader.schema import Block, BlockPage
+
+
+def test_dumps__dataclasses():
+    page = BlockPage(
+        blocks=[Block(slug="1.1", mula="<s>अग्निः</s>")], next_page_url=None
+    )
+    blob = json_serde.dumps(page)
+    assert json.loads(blob) == {
+        "blocks": [{"slug": "1.1", "mula": "<s>अग्निः</s>"}],
+        "next_page_url": None,
+    }
+    # Compact and not ASCII-escaped.
+    assert "अग्निः" in blob
+    assert ", " not in blob
+
+
+def test_dumps__kwargs():
+    blob = json_serde.dumps({"a": [Block(slug="1", mula="")]}, indent=2)
+    assert blob.startswith('{\n  "a"')
+
+
+def test_dumps__flask_types():
+    # Same as Flask's default provider.
+    assert json_serde.dumps(datetime(2024, 1, 2)) == '"Tue, 02 Jan 2024 00:00:00 GMT"'
+
+
+def test_jsonify(flask_app):
+    with flask_app.app_context():
+        resp = jsonify(Block(slug="1.1", mula="अ"))
+        assert resp.json == {"slug": "1.1", "mula": "अ"}
+
+
+def test_jsonify__sort_keys(flask_app):
+    # ETags on JSON responses depend on the exact body, so keys are sorted.
+    with flask_app.app_context():
+        resp = jsonify(Block(slug="1.1", mula="अ"))
+        assert resp.get_data(as_text=True) == '{"mula":"अ","slug":"1.1"}\n'
+
+
+class _FakeOrjson:
+    OPT_INDENT_2 = 1
+    OPT_SORT_KEYS = 2
+    OPT_PASSTHROUGH_DATACLASS = 4
+
+    def __init__(self):
+        self.calls = []
+
+    def dumps(self, obj, default, option):
+        self.calls.append(option)
+        indent = 2 if option & self.OPT_INDENT_2 else None
+        sort_keys = bool(option & self.OPT_SORT_KEYS)
+        blob = json.dumps(obj, default=default, indent=indent, sort_keys=sort_keys)
+        return blob.encode()
+
+
+@pytest.mark.parametrize("debug,option", [(False, 6), (True, 7)])
+def test_jsonify__orjson(flask_app, monkeypatch, debug, option):
+    fake = _FakeOrjson()
+    monkeypatch.setattr(json_serde, "orjson", fake)
+    monkeypatch.setattr(json_serde, "_ORJSON_OPTIONS", 0)
+    # In debug mode, Flask asks for indented output.
+    monkeypatch.setattr(flask_app, "debug", debug)
+    with flask_app.app_context():
+        resp = jsonify(Block(slug="1.1", mula="अ"))
+    assert fake.calls == [option]
+    assert resp.json == {"slug": "1.1", "mula": "अ"}
+    body = resp.get_data(as_text=True)
+    assert body.index('"mula"') < body.index('"slug"')
+
+
+def test_dumps__orjson_unsupported_kwargs(monkeypatch):
+    fake = _FakeOrjson()
+    monkeypatch.setattr(json_serde, "orjson", fake)
+    assert json_serde.dumps([1], indent=4) == "[\n    1\n]"
+    assert fake.calls == []
@@ -0,0 +1,32 @@
+from vidyut.lipi import Scheme
+
+from ambuda.utils import lipi
+
+
+def test_transliterate():
+    assert lipi.slp1_to_devanagari("saMskftam") == "संस्कृतम्"
+    assert lipi.hk_to_devanagari("saMskRtam") == "संस्कृतम्"
+    assert lipi.hk_to_iast("saMskRtam") == "saṃskṛtam"
+
+
+def test_to_slp1():
+    assert lipi.to_slp1("संस्कृतम्") == "saMskftam"
+    assert lipi.to_slp1("saṃskṛtam") == "saMskftam"
+    assert lipi.to_slp1("saMskRtam") == "saMskftam"
+    assert lipi.to_slp1("saMskftam") == "saMskftam"
+
+
+def test_cache_stats():
+    lipi.clear_cache()
+    assert lipi.cache_stats()["size"] == 0
+
+    lipi.transliterate("rAma", Scheme.Slp1, Scheme.Devanagari)
+    lipi.transliterate("rAma", Scheme.Slp1, Scheme.Devanagari)
+    # Same text, different schemes.
+    lipi.transliterate("rAma", Scheme.HarvardKyoto, Scheme.Devanagari)
+
+    stats = lipi.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["size"] == 2
+    assert stats["max_size"] == lipi.CACHE_SIZE
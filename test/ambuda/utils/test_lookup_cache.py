@@ -0,0 +1,63 @@
+from ambuda.utils import lookup_cache
+from ambuda.utils.lookup_cache import LRUCache
+
+
+def test_lru_cache():
+    cache = LRUCache(10, len)
+    assert cache.get("a") is None
+    cache.put("a", "1234")
+    cache.put("b", "1234")
+    assert cache.get("a") == "1234"
+
+    # "b" is the least recently used, so we evict it first.
+    cache.put("c", "1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1234"
+    assert cache.get("c") == "1234"
+
+    assert cache.stats() == {
+        "hits": 3,
+        "misses": 2,
+        "evictions": 1,
+        "size": 2,
+        "bytes": 8,
+        "max_bytes": 10,
+    }
+
+
+def test_lru_cache__replace_and_oversize():
+    cache = LRUCache(10, len)
+    cache.put("a", "1234")
+    cache.put("a", "123456")
+    assert cache.stats()["bytes"] == 6
+
+    # Too large to cache at all.
+    cache.put("b", "12345678901")
+    assert cache.get("b") is None
+    assert cache.get("a") == "123456"
+
+
+def test_make_key():
+    versions = {"apte": 1, "mw": 2}
+    key = lookup_cache.make_key(["mw", "apte"], ["deva", "devaH"], versions, "1")
+    assert key == lookup_cache.make_key(
+        ["apte", "mw"], ["devaH", "deva"], versions, "1"
+    )
+    assert key != lookup_cache.make_key(
+        ["apte", "mw"], ["deva", "devaH"], {"apte": 1, "mw": 3}, "1"
+    )
+    assert key != lookup_cache.make_key(
+        ["apte", "mw"], ["deva", "devaH"], versions, "2"
+    )
+
+
+def test_result_size():
+    ascii_html = "<p>agnii</p>" * 10
+    deva_html = "<p>अग्नि</p>" * 10
+    assert len(ascii_html) == len(deva_html)
+
+    ascii_size = lookup_cache.result_size({"mw": [ascii_html]})
+    deva_size = lookup_cache.result_size({"mw": [deva_html]})
+    # Devanagari takes at least 2 bytes per character.
+    assert ascii_size > len(ascii_html)
+    assert deva_size - ascii_size >= len(deva_html)
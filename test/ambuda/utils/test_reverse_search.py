@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import select
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import reverse_search
+
+
+@pytest.fixture()
+def index(db_engine):
+    reverse_search.update_index(db_engine, ["dict-1", "dict-2"], force=True)
+
+
+def _dictionaries(*slugs) -> dict[int, str]:
+    stmt = select(db.Dictionary.id, db.Dictionary.slug)
+    return {id: slug for id, slug in q.get_session().execute(stmt) if slug in slugs}
+
+
+@pytest.mark.parametrize(
+    "blob,expected",
+    [
+        ("<div>fire</div>", "fire"),
+        (
+            "<H1><h><key1>agni</key1></h><body><s>agni</s> <lex>m.</lex> fire, "
+            "sacrificial fire <ls>RV.</ls>; the god of fire (<s>agni</s>)</body>"
+            "<tail><L>1</L></tail></H1>",
+            "fire, sacrificial fire; the god of fire",
+        ),
+        ("<body><s>agni</s> <ls>RV.</ls></body>", ""),
+        ("<body>unclosed", ""),
+    ],
+)
+def test_gloss_text(blob, expected):
+    assert reverse_search.gloss_text(blob) == expected
+
+
+def test_update_index__incremental(flask_app, db_engine, index):
+    result = reverse_search.update_index(db_engine, ["dict-1", "dict-2"])
+    assert result.num_dictionaries == 0
+    assert result.num_skipped == 2
+
+    result = reverse_search.update_index(db_engine, ["dict-1"], force=True)
+    assert result.num_dictionaries == 1
+    assert result.num_entries == 1
+
+
+def test_update_index__removes_deleted_dictionaries(flask_app, db_engine):
+    with flask_app.app_context():
+        session = q.get_session()
+        session.add(db.GlossIndexedDictionary(dictionary_id=9999, version=1))
+        session.commit()
+
+        reverse_search.update_index(db_engine, ["dict-1"])
+        stmt = select(db.GlossIndexedDictionary).filter_by(dictionary_id=9999)
+        assert session.scalars(stmt).first() is None
+
+
+def test_search(flask_app, index):
+    with flask_app.app_context():
+        dictionaries = _dictionaries("dict-1", "dict-2")
+        results = reverse_search.search("fires", dictionaries)
+        assert [(r.dictionary_slug, r.key, r.text) for r in results] == [
+            ("dict-1", "agni", "अग्नि")
+        ]
+        assert results[0].snippet == "<mark>fire</mark>"
+
+        assert reverse_search.search("ignis", dictionaries)[0].key == "agni"
+        assert reverse_search.search("ignis", _dictionaries("dict-1")) == []
+        assert reverse_search.search("water", dictionaries) == []
+        assert reverse_search.search(' "( ', dictionaries) == []
@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy import select, text
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import search
+
+
+@pytest.fixture()
+def index(db_engine):
+    search.update_index(db_engine, force=True)
+
+
+def test_block_to_slp1():
+    blob = '<lg xml:id="a.1"><l>धर्मक्षेत्रे कुरुक्षेत्रे ।</l><l>समवेता</l></lg>'
+    assert search.block_to_slp1(blob) == "Darmakzetre kurukzetre . samavetA"
+
+
+def test_block_to_slp1__malformed():
+    assert search.block_to_slp1("<l>अग्निः<l>") == "agniH"
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("agniH", ["agniH"]),
+        ("अग्निः", ["agniH"]),
+        ("agnim vAyuH", ["agnim", "vAyuH"]),
+        # Too short to search for.
+        ("ab", []),
+        ("  ", []),
+    ],
+)
+def test_query_to_slp1(query, expected):
+    assert search.query_to_slp1(query) == expected
+
+
+def test_update_index__incremental(flask_app, db_engine):
+    search.update_index(db_engine, force=True)
+    result = search.update_index(db_engine)
+    assert result.num_texts == 0
+    assert result.num_skipped > 0
+
+    with flask_app.app_context():
+        session = q.get_session()
+        text = q.text("pariksha")
+        text.version += 1
+        session.commit()
+        try:
+            result = search.update_index(db_engine)
+            assert result.num_texts == 1
+            assert result.num_blocks == 1
+        finally:
+            text.version -= 1
+            session.commit()
+
+
+def test_update_index__removes_deleted_texts(flask_app, db_engine):
+    with flask_app.app_context():
+        session = q.get_session()
+        session.add(db.SearchIndexedText(text_id=9999, version=1))
+        session.commit()
+
+        search.update_index(db_engine)
+        stmt = select(db.SearchIndexedText).filter_by(text_id=9999)
+        assert session.scalars(stmt).first() is None
+
+
+def test_search(flask_app, index):
+    with flask_app.app_context():
+        [result] = search.search("agn")
+        assert result.text_slug == "pariksha"
+        assert result.section_slug == "1"
+        assert result.block_slug == "1.1"
+        # We widen matches to whole aksharas.
+        assert result.snippet == "<mark>अग्निः</mark>"
+
+        assert search.search("अग्निः")
+        assert search.search("agniH", text_id=q.text("pariksha").id)
+        assert not search.search("agniH", text_id=q.text("unknown") or -1)
+        assert not search.search("vAyuH")
+
+
+def test_search__text_filter(db_engine):
+    insert = text(
+        "INSERT INTO text_block_search (rowid, slp1, text_id) "
+        "VALUES (:id, 'kfzRaH', :text_id)"
+    )
+    select_ids = text(
+        "SELECT rowid FROM text_block_search WHERE text_block_search MATCH :query"
+    )
+    with db_engine.connect() as conn:
+        ids = [1, 12, 123]
+        conn.execute(
+            insert,
+            [{"id": 90000 + id, "text_id": search._text_key(id)} for id in ids],
+        )
+        for id in ids:
+            query = f"slp1 : kfzRaH AND {search._text_filter(id)}"
+            assert conn.execute(select_ids, {"query": query}).scalars().all() == [
+                90000 + id
+            ]
+        conn.rollback()
+
+
+def test_update_index__line_keys(flask_app, verse_block):
+    with flask_app.app_context():
+        session = q.get_session()
+        text = q.text("pariksha")
+        stmt = select(db.TextBlockKey.key).filter_by(text_id=text.id)
+        assert "agMi" in session.scalars(stmt).all()
+
+
+def test_search_lines(flask_app, verse_block):
+    with flask_app.app_context():
+        # The key ignores the visarga, so "agni" also matches. Block 1.1 has no
+        # lines, so it doesn't match.
+        [result] = search.search_lines("agni")
+        assert result.text_slug == "pariksha"
+        assert result.section_slug == "2"
+        assert result.block_slug == "2.1"
+        assert result.snippet == "अग्निः"
+
+        assert search.search_lines("अग्निः")
+        assert search.search_lines("agniH", text_id=q.text("pariksha").id)
+        # Short queries must match the whole line.
+        assert not search.search_lines("agn")
+        assert not search.search_lines("")
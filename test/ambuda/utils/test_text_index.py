@@ -0,0 +1,51 @@
+import pytest
+
+import ambuda.queries as q
+from ambuda.utils import text_index
+from ambuda.utils.text_index import SectionMeta
+
+
+def test_group_sections():
+    sections = [
+        SectionMeta(i, slug, "") for i, slug in enumerate(["1.1", "1.2", "2.1"])
+    ]
+    groups = text_index.group_sections(sections)
+    assert {k: [s.slug for s in v] for k, v in groups.items()} == {
+        "1": ["1.1", "1.2"],
+        "2": ["2.1"],
+    }
+
+
+def test_prev_cur_next(flask_app):
+    with flask_app.app_context():
+        text = q.text_without_sections("pariksha")
+        index = text_index.get(text)
+
+        prev, cur, next_ = index.prev_cur_next("1")
+        assert prev is None
+        assert cur.slug == "1"
+        assert cur.title == "adhyAyaH 1"
+        assert next_.slug == "2"
+
+        prev, cur, next_ = index.prev_cur_next("2")
+        assert prev.slug == "1"
+        assert next_ is None
+
+        with pytest.raises(ValueError):
+            index.prev_cur_next("3")
+
+
+def test_get__rebuilds_on_new_version(flask_app):
+    with flask_app.app_context():
+        text = q.text_without_sections("pariksha")
+        index = text_index.get(text)
+        assert text_index.get(text) is index
+
+        text.version += 1
+        try:
+            new_index = text_index.get(text)
+            assert new_index is not index
+            assert new_index.version == text.version
+            assert new_index.sections == index.sections
+        finally:
+            q.get_session().rollback()
@@ -1,5 +1,7 @@
 from xml.etree import ElementTree as ET
 
+import pytest
+
 import ambuda.utils.xml as x
 
 
@@ -122,3 +124,87 @@ def test_parse_tei_header__elements_missing():
 
 def test_parse_tei_header__undefined():
     assert x.parse_tei_header(None) == {}
+
+
+def test_rules_version():
+    assert x.rules_version(x.tei_xml) == x.TEI_XML_VERSION
+    assert x.rules_version(x.tei_xml) != x.rules_version(x.mw_xml)
+
+    changed = dict(x.tei_xml)
+    changed["lg"] = x.elem("s-lg", {"class": "verse"})
+    assert x.rules_version(changed) != x.TEI_XML_VERSION
+
+
+def test_rules_version__closures():
+    version = x.rules_version({"lg": x.elem("s-lg", {"class": "verse"})})
+    assert version == x.rules_version({"lg": x.elem("s-lg", {"class": "verse"})})
+    assert version != x.rules_version({"lg": x.elem("s-lg", {"class": "prose"})})
+
+
+@pytest.mark.parametrize(
+    "blob,transforms",
+    [
+        # Simple renames and attributes
+        ('<lg xml:id="Test"><l>verse</l><lb/><l>two</l></lg>', x.tei_xml),
+        ('<div><foo a="&quot;1&amp;2&quot;" b="x\ty">z</foo></div>', x.tei_xml),
+        ("<div>a &amp; b &lt; c</div>", x.tei_xml),
+        # Deleted elements drop their tails.
+        ("<teiHeader><date>x</date>tail<email>e</email></teiHeader>", x.tei_header_xml),
+        ('<p><ref target="t" n="1">r</ref> after</p>', x.tei_header_xml),
+        # `None` drops the tag and text but keeps children and tails.
+        ("<H1><h><key1>a</key1>b</h><body>c<ab>d</ab></body></H1>", x.mw_xml),
+        # `text_after` on an element with children replaces the last child's
+        # tail (see `Rule.__call__`).
+        ("<body><p>a <b>b</b> c</p> d<p>e</p></body>", x.mw_xml),
+        ("<body><p>a<p>b<i>c</i>d</p>e</p>f</body>", x.mw_xml),
+        ("<body><p>a<pb/>lost</p>kept</body>", x.mw_xml),
+        # Transliteration, including nested elements and tails.
+        ("<body><s>rAma<ab>x</ab>sItA<s>kfzRa</s>y</s>z</body>", x.mw_xml),
+        ("<body><s>a<p>b</p>c</s></body>", x.mw_xml),
+        ('<body><lb/><s>deva</s><lb n="2">x</lb></body>', x.apte_cologne_xml),
+    ],
+)
+def test_stream_transform__matches_transform(blob, transforms):
+    expected = x.transform(ET.fromstring(blob), transforms)
+    assert x.stream_transform(blob, transforms) == expected
+    # Also check that we didn't just fall back to `transform`.
+    streamed = x._StreamingTransform(transforms, x._slp1_to_devanagari).run(blob)
+    assert streamed == expected
+
+
+def test_stream_transform__falls_back_on_namespaces():
+    blob = '<div xmlns="urn:test"><l>a</l></div>'
+    expected = x.transform(ET.fromstring(blob), x.tei_xml)
+    assert x.stream_transform(blob, x.tei_xml) == expected
+
+
+def test_stream_transform__malformed():
+    with pytest.raises(ET.ParseError):
+        x.stream_transform("<div>", x.tei_xml)
+
+
+def test_transform_text_blocks():
+    blobs = [
+        '<lg xml:id="1.1"><l>a</l></lg>',
+        "  <p>b</p>\n",
+        "<lb />",
+        '<lg xml:id="1.2"><l>c</l><l>d</l></lg>',
+    ]
+    expected = [x.transform_text_block(b) for b in blobs]
+    assert x.transform_text_blocks(blobs) == expected
+    assert x.transform_text_blocks([]) == []
+
+
+@pytest.mark.parametrize(
+    "blobs",
+    [
+        # Valid together, but not separately.
+        ["<p>", "</p>"],
+        ["<p>a</p>", "b"],
+        ["<p>a</p><p>b</p>"],
+        [""],
+    ],
+)
+def test_transform_text_blocks__malformed(blobs):
+    with pytest.raises(ET.ParseError):
+        x.transform_text_blocks(blobs)
@@ -1,4 +1,15 @@
+import json
+import re
+import xml.etree.ElementTree as ET
+
+import pytest
 from indic_transliteration import sanscript
+from sqlalchemy import delete
+
+import ambuda.database as db
+import ambuda.queries as q
+from ambuda.utils import search
+from ambuda.views.reader import texts
 
 
 def d(s) -> str:
@@ -40,6 +51,80 @@ def test_resources__missing(client):
     assert resp.status_code == 404
 
 
+@pytest.fixture()
+def download_dir(flask_app, monkeypatch, tmp_path):
+    monkeypatch.setitem(flask_app.config, "UPLOAD_FOLDER", str(tmp_path))
+    return tmp_path / "downloads" / "pariksha"
+
+
+def test_download__txt(client, download_dir):
+    resp = client.get("/texts/pariksha/download.txt")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Disposition"] == "attachment; filename=pariksha.txt"
+    assert resp.text.startswith(d("parIkSA") + "\n")
+    assert "# 1 " + d("adhyAyaH 1") in resp.text
+    assert "agniH\n" in resp.text
+
+    # The download is now cached, and we serve it from disk.
+    [path] = download_dir.glob("*.txt")
+    assert path.read_text() == resp.text
+    resp = client.get("/texts/pariksha/download.txt")
+    assert resp.text == path.read_text()
+    resp.close()
+
+
+def test_download__xml(client, download_dir):
+    resp = client.get("/texts/pariksha/download.xml")
+    assert resp.status_code == 200
+    tei = "{http://www.tei-c.org/ns/1.0}"
+    root = ET.fromstring(resp.data)
+    [div1, div2] = root.findall(f"./{tei}text/{tei}body/{tei}div")
+    assert div1.get("n") == "1"
+    assert div2.get("n") == "2"
+
+
+def test_download__json(client, download_dir):
+    resp = client.get("/texts/pariksha/download.json")
+    assert resp.status_code == 200
+    data = json.loads(resp.data)
+    assert data["slug"] == "pariksha"
+    assert [s["slug"] for s in data["sections"]] == ["1", "2"]
+    assert data["sections"][0]["blocks"] == [{"slug": "1.1", "xml": "<div>agniH</div>"}]
+
+
+def test_download__new_version(flask_app, client, download_dir):
+    assert client.get("/texts/pariksha/download.txt").data
+    [old] = download_dir.glob("*.txt")
+
+    with flask_app.app_context():
+        session = q.get_session()
+        text = q.text("pariksha")
+        text.version += 1
+        session.commit()
+        try:
+            assert client.get("/texts/pariksha/download.txt").data
+        finally:
+            text.version -= 1
+            session.commit()
+
+    [new] = download_dir.glob("*.txt")
+    assert new != old
+
+
+def test_download__interrupted(client, download_dir):
+    resp = client.get("/texts/pariksha/download.txt")
+    # Close the stream before it finishes.
+    assert next(iter(resp.response)) == d("parIkSA").encode() + b"\n"
+    assert list(download_dir.glob("*.tmp"))
+    resp.close()
+    assert not list(download_dir.glob("*"))
+
+
+def test_download__missing(client, download_dir):
+    assert client.get("/texts/unknown-text/download.txt").status_code == 404
+    assert client.get("/texts/pariksha/download.pdf").status_code == 404
+
+
 def test_section(client):
     resp = client.get("/texts/pariksha/1")
     assert resp.status_code == 200
@@ -63,3 +148,192 @@ def test_block_htmx(client):
     # Test is unchanged because we assume that the source text already in
     # Devanagari, so we don't apply transliteration.
     assert "<section>agniH</section>" in resp.text
+
+
+def test_reader_json(client):
+    resp = client.get("/api/texts/pariksha/1")
+    assert resp.status_code == 200
+    data = resp.json
+    assert data["blocks"] == [{"slug": "1.1", "mula": "<section>agniH</section>"}]
+    assert data["prev_url"] is None
+    assert data["next_url"] == "/texts/pariksha/2"
+
+
+def test_reader_json__section_missing(client):
+    resp = client.get("/api/texts/pariksha/3")
+    assert resp.status_code == 404
+
+
+def test_section__etag(client, rama_client):
+    resp = client.get("/texts/pariksha/1")
+    etag = resp.headers["ETag"]
+    assert "Cookie" in resp.headers["Vary"]
+    # The page is streamed, so close it to end its request context.
+    resp.close()
+
+    resp = client.get("/texts/pariksha/1", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.data == b""
+
+    # Other sections and other users get different ETags.
+    resp = client.get("/texts/pariksha/2", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    resp.close()
+    resp = rama_client.get("/texts/pariksha/1", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+
+
+def test_section__etag_changes_with_version(flask_app, client):
+    etag = client.get("/texts/pariksha/1").headers["ETag"]
+
+    with flask_app.app_context():
+        session = q.get_session()
+        text = q.text("pariksha")
+        text.version += 1
+        session.commit()
+        try:
+            resp = client.get("/texts/pariksha/1", headers={"If-None-Match": etag})
+            assert resp.status_code == 200
+            assert resp.headers["ETag"] != etag
+        finally:
+            text.version -= 1
+            session.commit()
+
+
+def test_block_htmx__etag(client):
+    etag = client.get("/api/texts/pariksha/blocks/1.1").headers["ETag"]
+    resp = client.get("/api/texts/pariksha/blocks/1.1", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+
+def test_reader_json__etag(client):
+    etag = client.get("/api/texts/pariksha/1").headers["ETag"]
+    resp = client.get("/api/texts/pariksha/1", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+
+@pytest.fixture()
+def long_section(flask_app):
+    """Add five blocks to section 2 of our test text."""
+    with flask_app.app_context():
+        session = q.get_session()
+        text = q.text("pariksha")
+        section = q.text_section(text.id, "2")
+        for n in range(1, 6):
+            session.add(
+                db.TextBlock(
+                    text_id=text.id,
+                    section_id=section.id,
+                    slug=f"2.{n}",
+                    xml=f"<div>{n}</div>",
+                    n=n,
+                )
+            )
+        session.commit()
+        yield
+        session.execute(delete(db.TextBlock).filter_by(section_id=section.id))
+        session.commit()
+
+
+def test_reader_blocks_json(client):
+    resp = client.get("/api/texts/pariksha/1/blocks")
+    assert resp.status_code == 200
+    assert resp.json == {
+        "blocks": [{"slug": "1.1", "mula": "<section>agniH</section>"}],
+        "next_page_url": None,
+    }
+
+
+def test_reader_blocks_json__pages(client, long_section):
+    url = "/api/texts/pariksha/2/blocks?limit=2"
+    slugs = []
+    while url:
+        data = client.get(url).json
+        assert len(data["blocks"]) <= 2
+        slugs += [b["slug"] for b in data["blocks"]]
+        url = data["next_page_url"]
+    assert slugs == ["2.1", "2.2", "2.3", "2.4", "2.5"]
+
+
+def test_reader_blocks_json__after(client, long_section):
+    data = client.get("/api/texts/pariksha/2/blocks?after=3").json
+    assert [b["slug"] for b in data["blocks"]] == ["2.4", "2.5"]
+    assert data["next_page_url"] is None
+
+
+def test_reader_blocks_json__missing(client):
+    resp = client.get("/api/texts/pariksha/3/blocks")
+    assert resp.status_code == 404
+    resp = client.get("/api/texts/unknown-text/1/blocks")
+    assert resp.status_code == 404
+
+
+def test_reader_blocks_json__etag(client, long_section):
+    etag = client.get("/api/texts/pariksha/2/blocks?after=1").headers["ETag"]
+    resp = client.get(
+        "/api/texts/pariksha/2/blocks?after=1", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == 304
+    # Other pages get different ETags.
+    resp = client.get(
+        "/api/texts/pariksha/2/blocks?after=2", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == 200
+
+
+def test_section__paged(client, long_section, monkeypatch):
+    monkeypatch.setattr(texts, "PAGE_SIZE", 2)
+    resp = client.get("/texts/pariksha/2")
+    assert resp.status_code == 200
+
+    # The payload and the server-side HTML have just the first page ...
+    payload = re.search(
+        r'<script id="payload" type="application/json">(.*?)</script>', resp.text
+    ).group(1)
+    data = json.loads(payload)
+    assert [b["slug"] for b in data["blocks"]] == ["2.1", "2.2"]
+    assert data["next_page_url"] == "/api/texts/pariksha/2/blocks?after=2&limit=2"
+    assert 'data-slug="2.3"' not in resp.text
+
+    # ... and readers without JavaScript follow a link to the next page.
+    assert 'href="/texts/pariksha/2?after=2"' in resp.text
+    resp = client.get("/texts/pariksha/2?after=4")
+    assert 'data-slug="2.5"' in resp.text
+    assert 'data-slug="2.4"' not in resp.text
+    # The last page has no link.
+    assert "/texts/pariksha/2?after=" not in resp.text
+
+
+def test_search_json(client, db_engine):
+    search.update_index(db_engine, force=True)
+    resp = client.get("/api/search?q=agniH")
+    assert resp.status_code == 200
+    [result] = resp.json["results"]
+    assert result["text"] == "pariksha"
+    assert result["block"] == "1.1"
+    assert result["url"] == "/texts/pariksha/1"
+    assert "<mark>" in result["snippet"]
+
+
+def test_search_json__no_results(client, db_engine):
+    search.update_index(db_engine)
+    assert client.get("/api/search?q=vAyuH").json == {"results": []}
+    assert client.get("/api/search").json == {"results": []}
+    assert client.get("/api/search?q=agniH&text=ramayanam").json == {"results": []}
+
+
+def test_search_lines_json(client, verse_block):
+    resp = client.get("/api/search/lines?q=agniH")
+    assert resp.status_code == 200
+    [result] = resp.json["results"]
+    assert result["block"] == "2.1"
+    assert result["url"] == "/texts/pariksha/2"
+
+    assert client.get("/api/search/lines?q=vAyuH").json == {"results": []}
+    resp = client.get("/api/search/lines?q=agniH&text=unknown-text")
+    assert resp.status_code == 404
+
+
+def test_search_json__unknown_text(client):
+    resp = client.get("/api/search?q=agniH&text=unknown-text")
+    assert resp.status_code == 404
@@ -1,3 +1,6 @@
+import ambuda.queries as q
+
+
 def test_admin_index__unauth(client):
     resp = client.get("/admin/")
     assert resp.status_code == 404
@@ -42,3 +45,16 @@ def test_admin_text__admin_only(admin_client, moderator_client):
 def test_admin_text__inactive(deleted_client, banned_client):
     assert deleted_client.get("/admin/text/").status_code == 404
     assert banned_client.get("/admin/text/").status_code == 404
+
+
+def test_admin_text__edit_bumps_version(flask_app, admin_client):
+    with flask_app.app_context():
+        session = q.get_session()
+        text = q.text("pariksha")
+        old_version = text.version
+        data = {"slug": text.slug, "title": text.title}
+        resp = admin_client.post(f"/admin/text/edit/?id={text.id}", data=data)
+        assert resp.status_code == 302
+
+        session.refresh(text)
+        assert text.version > old_version
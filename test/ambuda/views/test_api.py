@@ -0,0 +1,10 @@
+def test_cache_stats(admin_client):
+    resp = admin_client.get("/api/stats/caches")
+    assert resp.status_code == 200
+    assert resp.json["dictionary_lookups"]["max_bytes"] > 0
+    assert "hits" in resp.json["transliteration"]
+
+
+def test_cache_stats__unauth(client, rama_client):
+    assert client.get("/api/stats/caches").status_code == 401
+    assert rama_client.get("/api/stats/caches").status_code == 401
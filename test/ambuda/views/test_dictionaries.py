@@ -1,5 +1,9 @@
+import os
+
 import pytest
 
+from ambuda.utils import dict_index, lookup_cache, reverse_search
+
 
 def test_index(client):
     resp = client.get("/tools/dictionaries/")
@@ -65,6 +69,145 @@ def test_entry_htmx__bad_key(client):
     assert "No results found" in resp.text
 
 
+@pytest.fixture()
+def key_index(flask_app, db_engine, monkeypatch, tmp_path):
+    monkeypatch.setitem(flask_app.config, "UPLOAD_FOLDER", str(tmp_path))
+    dict_index.clear()
+    dict_index.build(db_engine, dict_index.index_dir(str(tmp_path)))
+    yield
+    dict_index.clear()
+
+
+@pytest.mark.parametrize("query", ["ag", "अग्", "ag ", "agni"])
+def test_complete_json(client, key_index, query):
+    resp = client.get(f"/api/dictionaries/dict-1,dict-2/complete?q={query}")
+    assert resp.status_code == 200
+    assert resp.json == {"results": [{"key": "agni", "text": "अग्नि"}]}
+
+
+def test_complete_json__no_results(client, key_index):
+    resp = client.get("/api/dictionaries/dict-1/complete?q=deva")
+    assert resp.json == {"results": []}
+    resp = client.get("/api/dictionaries/dict-1/complete?q=")
+    assert resp.json == {"results": []}
+
+
+def test_complete_json__bad_source(client, key_index):
+    resp = client.get("/api/dictionaries/unknown/complete?q=ag")
+    assert resp.status_code == 404
+
+
+def test_batch_json(client):
+    resp = client.get("/api/dictionaries/dict-1,dict-2/batch?q=agni&q=अग्नि&q=deva")
+    assert resp.status_code == 200
+    assert resp.json == {
+        "dictionaries": {"dict-1": "Test Dictionary 1", "dict-2": "Test Dictionary 2"},
+        "results": {
+            "agni": {"dict-1": ["<div>fire</div>"], "dict-2": ["<div>ignis</div>"]},
+            "अग्नि": {"dict-1": ["<div>fire</div>"], "dict-2": ["<div>ignis</div>"]},
+            "deva": {"dict-1": [], "dict-2": []},
+        },
+    }
+
+
+def test_batch_json__with_index(client, key_index):
+    resp = client.get("/api/dictionaries/dict-1,dict-2/batch?q=agni&q=deva")
+    assert resp.json["results"] == {
+        "agni": {"dict-1": ["<div>fire</div>"], "dict-2": ["<div>ignis</div>"]},
+        "deva": {"dict-1": [], "dict-2": []},
+    }
+
+
+def test_batch_json__no_queries(client):
+    resp = client.get("/api/dictionaries/dict-1/batch")
+    assert resp.json["results"] == {}
+
+
+def test_batch_json__etag(client):
+    resp = client.get("/api/dictionaries/dict-1/batch?q=agni")
+    etag = resp.headers["ETag"].strip('"')
+    resp = client.get(
+        "/api/dictionaries/dict-1/batch?q=agni", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == 304
+    # A different batch has a different ETag.
+    resp = client.get(
+        "/api/dictionaries/dict-1/batch?q=deva", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == 200
+
+
+def test_batch_json__bad_request(client):
+    resp = client.get("/api/dictionaries/unknown/batch?q=agni")
+    assert resp.status_code == 404
+
+    words = "&".join(f"q=word{i}" for i in range(101))
+    resp = client.get(f"/api/dictionaries/dict-1/batch?{words}")
+    assert resp.status_code == 400
+
+
+def test_entry_htmx__cached(client):
+    lookup_cache.clear()
+    client.get("/api/dictionaries/dict-1,dict-2/agni")
+    resp = client.get("/api/dictionaries/dict-2,dict-1/agni")
+    assert "fire" in resp.text
+    # Results from the cache keep the order of the sources in the URL.
+    assert resp.text.index("ignis") < resp.text.index("fire")
+
+    stats = lookup_cache.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    lookup_cache.clear()
+
+
+@pytest.fixture()
+def reverse_index(db_engine):
+    reverse_search.update_index(db_engine, ["dict-1", "dict-2"])
+
+
+def test_reverse_json(client, reverse_index):
+    resp = client.get("/api/dictionaries/reverse?q=fire&sources=dict-1,dict-2")
+    assert resp.status_code == 200
+    assert resp.json == {
+        "results": [
+            {
+                "dictionary_slug": "dict-1",
+                "key": "agni",
+                "text": "अग्नि",
+                "snippet": "<mark>fire</mark>",
+            }
+        ]
+    }
+
+    resp = client.get("/api/dictionaries/reverse?q=&sources=dict-1")
+    assert resp.json == {"results": []}
+
+
+def test_reverse_json__bad_source(client, reverse_index):
+    resp = client.get("/api/dictionaries/reverse?q=fire&sources=unknown")
+    assert resp.status_code == 404
+    # By default, we search only English dictionaries, which the test data
+    # doesn't have.
+    resp = client.get("/api/dictionaries/reverse?q=fire")
+    assert resp.status_code == 404
+
+
+def test_entry__suggestions(client, key_index):
+    resp = client.get("/tools/dictionaries/dict-1/agnI")
+    assert resp.status_code == 200
+    assert "Did you mean" in resp.text
+    assert "/tools/dictionaries/dict-1/agni" in resp.text
+
+
+def test_entry_htmx__suggestions(client, key_index):
+    resp = client.get("/api/dictionaries/dict-1,dict-2/agnii")
+    assert "Did you mean" in resp.text
+    assert "/tools/dictionaries/dict-1,dict-2/agni" in resp.text
+
+    resp = client.get("/api/dictionaries/dict-1/indra")
+    assert "Did you mean" not in resp.text
+
+
 @pytest.mark.parametrize(
     "before,after",
     [
@@ -81,3 +224,25 @@ def test_entry_htmx__bad_key(client):
 def test_handle_form_submission(client, before, after):
     resp = client.get(before)
     assert resp.location == after
+
+
+def test_entry_htmx__etag(client):
+    url = "/api/dictionaries/dict-1,dict-2/agni"
+    etag = client.get(url).headers["ETag"]
+    resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    resp = client.get("/api/dictionaries/dict-1/agni", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+
+
+def test_entry_htmx__etag_index_rebuilt(client, db_engine, key_index, tmp_path):
+    url = "/api/dictionaries/dict-1/agnii"
+    etag = client.get(url).headers["ETag"]
+
+    # Rebuild the index, and make sure that its modification time changes.
+    dict_index.build(db_engine, dict_index.index_dir(str(tmp_path)))
+    for path in dict_index.index_dir(str(tmp_path)).glob("dict-1-*.fuzzy"):
+        os.utime(path, ns=(0, 0))
+    resp = client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
@@ -17,6 +17,11 @@ window.fetch = jest.fn(async (url) => {
   // Special URL so we can test server errors.
   if (url === '/api/dictionaries/mw/error') {
     return { ok: false }
+  } else if (url.includes('/complete?q=')) {
+    return {
+      ok: true,
+      json: async () => ({ results: [{ key: 'deva', text: 'देव' }] }),
+    }
   } else {
     const segments = url.split('/');
     const respText = segments.pop();
@@ -170,3 +175,27 @@ test('onClickOutsideOfSourceSelector is a no-op otherwise', () => {
   d.onClickOutsideOfSourceSelector();
   expect(d.showSourceSelector).toBe(false);
 });
+
+test('fetchSuggestions fetches headwords', async () => {
+  const d = Dictionary();
+  d.query = 'de';
+  await d.fetchSuggestions();
+  expect(window.fetch).toHaveBeenLastCalledWith('/api/dictionaries/mw/complete?q=de');
+  expect(d.suggestions).toEqual(['देव']);
+});
+
+test('fetchSuggestions transliterates to the user\'s script', async () => {
+  const d = Dictionary();
+  d.script = 'iast';
+  d.query = 'de';
+  await d.fetchSuggestions();
+  expect(d.suggestions).toEqual(['देव:iast']);
+});
+
+test('fetchSuggestions clears suggestions for an empty query', async () => {
+  const d = Dictionary();
+  d.suggestions = ['देव'];
+  d.query = '';
+  await d.fetchSuggestions();
+  expect(d.suggestions).toEqual([]);
+});
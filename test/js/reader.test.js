@@ -1,5 +1,5 @@
 import { $ } from '@/core.ts';
-import Reader, { Layout } from '@/reader';
+import Reader, { Layout, renderDictionaryEntries } from '@/reader';
 
 const sampleHTML = `
 <body>
@@ -50,12 +50,33 @@ window.fetch = jest.fn(async (url) => {
         ]
       })
     },
+    '/api/texts/sample-text/1/blocks?after=2&limit=1': {
+      json: async () => ({
+        "blocks": [{ "slug": "1.3", "mula": "<s-lg>verse 3</s-lg>" }],
+        "next_page_url": "/api/texts/sample-text/1/blocks?after=3&limit=1",
+      })
+    },
+    '/api/texts/sample-text/1/blocks?after=3&limit=1': {
+      json: async () => ({
+        "blocks": [{ "slug": "1.4", "mula": "<s-lg>verse 4</s-lg>" }],
+        "next_page_url": null,
+      })
+    },
     "/api/parses/sample-text/1.1": {
       text: async() => "<p>parse for 1.1</p>",
     },
     "/api/dictionaries/mw/padam": {
       text: async () => "<p>entry:padam</p>",
     },
+    "/api/dictionaries/mw/batch?q=deva%3Adevanagari&q=agni%3Adevanagari": {
+      json: async () => ({
+        dictionaries: { mw: "Monier-Williams" },
+        results: {
+          "deva:devanagari": { mw: ["<li>entry:deva</li>"] },
+          "agni:devanagari": { mw: [] },
+        },
+      }),
+    },
   };
 
   if (url in mapping) {
@@ -148,6 +169,25 @@ test("fetchBlocks doesn't throw an error on a bad URL", async () => {
   expect(r.data.blocks).toEqual([]);
 });
 
+test('fetchRemainingBlocks appends each page of blocks', async () => {
+  const r = Reader();
+  r.init();
+  r.data.next_page_url = '/api/texts/sample-text/1/blocks?after=2&limit=1';
+
+  await r.fetchRemainingBlocks();
+  expect(r.data.blocks.map((b) => b.slug)).toEqual(['1.1', '1.2', '1.3', '1.4']);
+  expect(r.data.next_page_url).toBe(null);
+});
+
+test("fetchRemainingBlocks stops on a bad URL", async () => {
+  const r = Reader();
+  r.init();
+  r.data.next_page_url = '/api/texts/sample-text/1/blocks?after=99&limit=1';
+
+  await r.fetchRemainingBlocks();
+  expect(r.data.blocks.map((b) => b.slug)).toEqual(['1.1', '1.2']);
+});
+
 test("searchDictionary works with a valid source and query", async () => {
   const r = Reader();
   r.dictQuery = "padam";
@@ -278,3 +318,39 @@ test('onClickOutsideOfSourceSelector is a no-op otherwise', async () => {
   await r.onClickOutsideOfSourceSelector();
   expect(r.showDictSourceSelector).toBe(false);
 });
+
+test('renderDictionaryEntries renders each source', () => {
+  const dictionaries = { mw: 'Monier-Williams', apte: 'Apte' };
+  const one = renderDictionaryEntries(dictionaries, { mw: ['<li>deva</li>'] });
+  expect(one).toMatch('<ul><li>deva</li></ul>');
+  expect(one).not.toMatch('Monier-Williams');
+
+  const two = renderDictionaryEntries(dictionaries, { mw: ['<li>deva</li>'], apte: [] });
+  expect(two).toMatch('<h1>Monier-Williams</h1>');
+  expect(two).toMatch('No results found.');
+});
+
+test('prefetchDictionary caches entries for each lemma', async () => {
+  const r = Reader();
+  r.dictSources = ['mw'];
+  const parse = '<s-w lemma="deva">devaH</s-w> <s-w lemma="agni">agniH</s-w> <s-w lemma="deva">devam</s-w>';
+
+  await r.prefetchDictionary(parse);
+  expect(r.dictionaryCache['deva:devanagari']).toMatch('entry:deva');
+  // Misses aren't cached, so that `searchDictionary` can handle them.
+  expect('agni:devanagari' in r.dictionaryCache).toBe(false);
+});
+
+test('onClickWord uses cached dictionary entries', async () => {
+  const r = Reader();
+  r.dictionaryCache = { 'deva:devanagari': '<p>cached:deva</p>' };
+  const $word = document.createElement('s-w');
+  $word.textContent = 'devaH';
+  $word.setAttribute('lemma', 'deva');
+  $word.setAttribute('parse', 'pos=n');
+  window.fetch.mockClear();
+
+  await r.onClickWord($word);
+  expect(r.dictionaryResponse).toBe('<p>cached:deva</p>');
+  expect(window.fetch).not.toHaveBeenCalled();
+});
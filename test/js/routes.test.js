@@ -13,6 +13,20 @@ test('ajaxDictionaryQuery', () => {
   expect(Routes.ajaxDictionaryQuery(sources, 'nara')).toBe('/api/dictionaries/apte,mw/nara');
 });
 
+test('ajaxDictionaryComplete', () => {
+  const sources = ['apte', 'mw'];
+  expect(Routes.ajaxDictionaryComplete(sources, 'देव')).toBe(
+    '/api/dictionaries/apte,mw/complete?q=%E0%A4%A6%E0%A5%87%E0%A4%B5',
+  );
+});
+
+test('ajaxDictionaryBatch', () => {
+  const sources = ['apte', 'mw'];
+  expect(Routes.ajaxDictionaryBatch(sources, ['deva', 'agni'])).toBe(
+    '/api/dictionaries/apte,mw/batch?q=deva&q=agni',
+  );
+});
+
 test('dictionaryQuery', () => {
   const sources = ['apte', 'mw'];
   expect(Routes.dictionaryQuery(sources, 'nara')).toBe('/tools/dictionaries/apte,mw/nara');